@@ -0,0 +1,46 @@
+from datetime import datetime
+from sqlalchemy import Select, select, update, exists, func, literal
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from .models import Alert
+from . import counters, events
+
+# Open alerts are unique per (key, entity_type, entity_id) through the partial
+# index ux_alerts_open, so raising an alert that is already open is a no-op.
+# Alerts actually created or resolved are staged as change-feed events, which
+# go out when the caller commits through events.commit().
+
+async def raise_alerts(db: AsyncSession, key: str, entity_type: str, entity_ids: Select, now: datetime) -> int:
+    ids = entity_ids.subquery()
+    stmt = pg_insert(Alert).from_select(
+        ['id', 'key', 'entity_type', 'entity_id', 'status', 'triggered_at'],
+        select(func.gen_random_uuid(), literal(key), literal(entity_type), ids.c[0], literal('open'), literal(now)),
+    ).on_conflict_do_nothing(
+        index_elements=['key', 'entity_type', 'entity_id'],
+        index_where=Alert.status == 'open',
+    ).returning(Alert.id, Alert.entity_id)
+    rows = (await db.execute(stmt)).all()
+    for r in rows:
+        events.stage(db, 'alert.created', {"id": r.id, "key": key, "entity_type": entity_type, "entity_id": r.entity_id,
+                                           "status": 'open', "triggered_at": now})
+    await counters.bump(db, counters.OPEN_ALERTS, key, len(rows))
+    return len(rows)
+
+async def resolve_cleared(db: AsyncSession, key: str, entity_type: str, entity_ids: Select, now: datetime,
+                          where: list = ()) -> int:
+    # Resolve open alerts whose entity is no longer in the still-firing set. `where`
+    # narrows the open alerts considered, e.g. to the vehicle-id range of one chunk.
+    ids = entity_ids.subquery()
+    stmt = (update(Alert)
+            .where(Alert.key == key, Alert.entity_type == entity_type, Alert.status == 'open',
+                   ~exists().where(ids.c[0] == Alert.entity_id), *where)
+            .values(status='resolved', resolved_at=now)
+            .returning(Alert.id, Alert.entity_id, Alert.triggered_at)
+            .execution_options(synchronize_session=False))
+    rows = (await db.execute(stmt)).all()
+    for r in rows:
+        events.stage(db, 'alert.resolved', {"id": r.id, "key": key, "entity_type": entity_type, "entity_id": r.entity_id,
+                                            "status": 'resolved', "triggered_at": r.triggered_at, "resolved_at": now})
+    await counters.bump(db, counters.OPEN_ALERTS, key, -len(rows))
+    return len(rows)
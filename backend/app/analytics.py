@@ -0,0 +1,196 @@
+from datetime import date, datetime, timedelta, timezone
+from typing import Optional
+from fastapi import Response
+from sqlalchemy import select, insert, delete, func, case, cast, Date, Float, Numeric
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from .settings import settings
+from .models import Vehicle, FuelLog, FuelDaily
+from .pagination import encode_cursor, decode_cursor, CURSOR_HEADER
+
+# Fuel economy is computed in one SQL pass with window functions. Consecutive
+# odometer readings per vehicle give miles driven, and MPG is those miles over
+# the gallons added since the previous reading (the full-tank method; fills
+# logged without an odometer are carried into the next reading). Fills from
+# LOOKBACK before `since` are scanned so the first fill in range has a
+# predecessor; the transacted_at bounds keep the scan on the matching monthly
+# partitions.
+#
+# The fleet view pages through vehicles by unit_no and runs that pass only for
+# the page's vehicles. Its fleet totals come from fuel_daily, one row per UTC
+# day: record_fill() adds each new fill's share as it is logged, and
+# refresh_daily() recomputes the last LOOKBACK days nightly (everything when the
+# table is empty), so totals over a year read a few hundred rows.
+
+LOOKBACK = timedelta(days=31)
+DAILY_COLUMNS = ('fills', 'gallons', 'cost', 'miles', 'metered_gallons', 'odometer_regressions', 'over_capacity')
+
+def _round(x, digits: int = 2):
+    return func.round(cast(x, Numeric), digits)
+
+def _day(ts: datetime) -> date:
+    return ts.astimezone(timezone.utc).date()
+
+def _fill_stats(since: datetime, until: datetime, vehicle_ids: list | None = None):
+    # Per-fill miles, gallons used and flags, before the per-vehicle statistics.
+    F, V = FuelLog, Vehicle
+    scoped = [F.vehicle_id.in_(vehicle_ids)] if vehicle_ids is not None else []
+    # seg numbers the odometer readings; a reading and the unmetered fills after it share a seg.
+    base = (select(F.id, F.vehicle_id, F.transacted_at, F.qty_gal, F.odometer,
+                   func.coalesce(F.total_cost, F.qty_gal * F.price_per_gal).label('cost'),
+                   func.count(F.odometer).over(partition_by=F.vehicle_id, order_by=(F.transacted_at, F.id)).label('seg'),
+                   V.tank_capacity_gal)
+            .join(V, V.id == F.vehicle_id)
+            .where(F.transacted_at >= since - LOOKBACK, F.transacted_at < until, *scoped)
+            .subquery())
+
+    b = base.c
+    seg = dict(partition_by=(b.vehicle_id, b.seg))
+    segs = select(b, func.max(b.odometer).over(**seg).label('seg_odometer'),
+                  func.coalesce(func.sum(b.qty_gal).filter(b.odometer.is_(None)).over(**seg), 0).label('seg_unmetered')
+                  ).subquery()
+
+    s = segs.c
+    by_vehicle = dict(partition_by=s.vehicle_id, order_by=(s.transacted_at, s.id))
+    linked = select(s, func.lag(s.seg_odometer).over(**by_vehicle).label('prev_odometer'),
+                    func.lag(s.seg_unmetered).over(**by_vehicle).label('carried_gal')).subquery()
+
+    l = linked.c
+    delta = l.odometer - l.prev_odometer
+    miles = case((delta > 0, delta))
+    gallons = case((l.odometer.isnot(None), l.qty_gal + l.carried_gal))
+    # MPG statistics run in double precision; numeric window aggregates are several times slower.
+    return (select(l.id, l.vehicle_id, l.transacted_at, l.qty_gal, l.cost, l.odometer,
+                   miles.label('miles'),
+                   gallons.label('gallons_used'),
+                   (cast(miles, Float) / func.nullif(gallons, 0, type_=Float)).label('mpg'),
+                   func.coalesce(delta < 0, False).label('odometer_regression'),
+                   func.coalesce(l.qty_gal > l.tank_capacity_gal, False).label('over_capacity'))
+            .where(l.transacted_at >= since)
+            .subquery())
+
+def fuel_fills(since: datetime, until: datetime, vehicle_ids: list | None = None):
+    fills = _fill_stats(since, until, vehicle_ids)
+    f = fills.c
+    rolling = dict(partition_by=f.vehicle_id, order_by=(f.transacted_at, f.id),
+                   rows=(-(settings.fuel_rolling_fills - 1), 0))
+    z = (f.mpg - func.avg(f.mpg).over(partition_by=f.vehicle_id)) / \
+        func.nullif(func.stddev_samp(f.mpg).over(partition_by=f.vehicle_id), 0, type_=Float)
+    return select(f.id, f.vehicle_id, f.transacted_at, f.qty_gal, f.cost, f.odometer, f.miles, f.gallons_used,
+                  _round(f.mpg).label('mpg'),
+                  _round(func.avg(f.mpg).over(**rolling)).label('rolling_mpg'),
+                  _round(z).label('mpg_z'),
+                  func.coalesce(func.abs(z) > settings.fuel_outlier_z, False).label('mpg_outlier'),
+                  f.odometer_regression, f.over_capacity).subquery()
+
+def summarize(fills):
+    # Per-vehicle totals; MPG only counts the gallons behind a usable odometer delta.
+    f = fills.c
+    miles = func.sum(f.miles)
+    return (select(f.vehicle_id,
+                   func.count().label('fills'),
+                   func.sum(f.qty_gal).label('gallons'),
+                   func.sum(f.cost).label('cost'),
+                   miles.label('miles'),
+                   func.round(miles / func.nullif(func.sum(f.gallons_used).filter(f.miles.isnot(None)), 0), 2)
+                       .label('mpg'),
+                   func.round(func.sum(f.cost) / func.nullif(miles, 0), 3).label('cost_per_mile'),
+                   func.count().filter(f.odometer_regression).label('odometer_regressions'),
+                   func.count().filter(f.over_capacity).label('over_capacity'),
+                   func.count().filter(f.mpg_outlier).label('mpg_outliers'))
+            .group_by(f.vehicle_id))
+
+async def vehicle_fuel_analytics(db: AsyncSession, vehicle_id: str, since: datetime, until: datetime) -> dict:
+    fills = fuel_fills(since, until, [vehicle_id])
+    summary = (await db.execute(summarize(fills))).mappings().one_or_none()
+    rows = (await db.execute(select(fills).order_by(fills.c.transacted_at, fills.c.id))).mappings().all()
+    return {"vehicle_id": vehicle_id, "since": since, "until": until,
+            "summary": dict(summary) if summary else None, "fills": [dict(r) for r in rows]}
+
+async def _fleet_totals(db: AsyncSession, first: date, last: date) -> dict:
+    D = FuelDaily
+    t = (await db.execute(select(*[func.coalesce(func.sum(D.__table__.c[c]), 0).label(c) for c in DAILY_COLUMNS])
+                          .where(D.day >= first, D.day <= last))).mappings().one()
+    return {"fills": t['fills'], "gallons": round(t['gallons'], 3), "cost": round(t['cost'], 2),
+            "miles": round(t['miles'], 1),
+            "mpg": round(t['miles'] / t['metered_gallons'], 2) if t['metered_gallons'] else None,
+            "cost_per_mile": round(t['cost'] / t['miles'], 3) if t['miles'] else None,
+            "odometer_regressions": t['odometer_regressions'], "over_capacity": t['over_capacity']}
+
+async def fleet_fuel_analytics(db: AsyncSession, response: Response, since: datetime, until: datetime, limit: int,
+                               cursor: Optional[str] = None, now: datetime | None = None) -> dict:
+    # One page of vehicles by unit_no (X-Next-Cursor for the next), plus fleet
+    # totals over the whole UTC days from since to until.
+    now = now or datetime.now(timezone.utc)
+    V = Vehicle
+    page = select(V.id, V.unit_no).order_by(V.unit_no).limit(limit + 1)
+    if cursor:
+        page = page.where(V.unit_no > decode_cursor(cursor, [V.unit_no])[0])
+    vehicles = (await db.execute(page)).all()
+    if len(vehicles) > limit:
+        vehicles = vehicles[:limit]
+        response.headers[CURSOR_HEADER] = encode_cursor([vehicles[-1].unit_no])
+    rows = []
+    if vehicles:
+        per_vehicle = summarize(fuel_fills(since, until, [v.id for v in vehicles])).subquery()
+        stats = {r['vehicle_id']: r for r in (await db.execute(select(per_vehicle))).mappings()}
+        empty = {c.key: 0 if c.key in ('fills', 'odometer_regressions', 'over_capacity', 'mpg_outliers') else None
+                 for c in per_vehicle.c}
+        rows = [{"unit_no": v.unit_no, **(stats.get(v.id) or empty), "vehicle_id": v.id} for v in vehicles]
+    return {"since": since, "until": until, "fleet": await _fleet_totals(db, _day(since), _day(min(until, now))),
+            "vehicles": rows}
+
+async def _bump(db: AsyncSession, day: date, delta: dict) -> None:
+    D = FuelDaily
+    stmt = pg_insert(D).values(day=day, **{c: delta.get(c, 0) for c in DAILY_COLUMNS})
+    await db.execute(stmt.on_conflict_do_update(
+        index_elements=['day'], set_={c: D.__table__.c[c] + stmt.excluded[c] for c in DAILY_COLUMNS}))
+
+async def record_fill(db: AsyncSession, fill: FuelLog, tank_capacity_gal) -> None:
+    # Adds a newly logged fill (the vehicle's latest) to fuel_daily. Its miles run
+    # from the previous metered fill in LOOKBACK, over its own gallons plus the
+    # unmetered ones since, as in _fill_stats().
+    F = FuelLog
+    qty = float(fill.qty_gal)
+    cost = fill.total_cost if fill.total_cost is not None else \
+        (fill.qty_gal * fill.price_per_gal if fill.price_per_gal is not None else 0)
+    delta = {'fills': 1, 'gallons': qty, 'cost': float(cost),
+             'over_capacity': int(tank_capacity_gal is not None and qty > float(tank_capacity_gal))}
+    if fill.odometer is not None:
+        mine = [F.vehicle_id == fill.vehicle_id, F.transacted_at < fill.transacted_at]
+        prev = (await db.execute(
+            select(F.transacted_at, F.odometer)
+            .where(*mine, F.odometer.isnot(None), F.transacted_at >= fill.transacted_at - LOOKBACK)
+            .order_by(F.transacted_at.desc(), F.id.desc()).limit(1))).first()
+        if prev is not None:
+            miles = float(fill.odometer) - float(prev.odometer)
+            if miles > 0:
+                carried = (await db.execute(select(func.coalesce(func.sum(F.qty_gal), 0)).where(
+                    *mine, F.odometer.is_(None), F.transacted_at > prev.transacted_at))).scalar()
+                delta.update(miles=miles, metered_gallons=qty + float(carried))
+            elif miles < 0:
+                delta['odometer_regressions'] = 1
+    await _bump(db, _day(fill.transacted_at), delta)
+
+async def refresh_daily(db: AsyncSession, now: datetime) -> dict:
+    # Recomputes fuel_daily from the fills: the last LOOKBACK days, or all of it if empty.
+    D = FuelDaily
+    latest = (await db.execute(select(func.max(D.day)))).scalar()
+    if latest is not None:
+        start = min(latest, _day(now)) - LOOKBACK
+    else:
+        first = (await db.execute(select(func.min(FuelLog.transacted_at)))).scalar()
+        if first is None:
+            return {"fuel_days": 0}
+        start = _day(first)
+    since = datetime(start.year, start.month, start.day, tzinfo=timezone.utc)
+    f = _fill_stats(since, now).c
+    day = cast(func.timezone('UTC', f.transacted_at), Date)
+    per_day = select(day, func.count(), func.sum(f.qty_gal), func.coalesce(func.sum(f.cost), 0),
+                     func.coalesce(func.sum(f.miles), 0),
+                     func.coalesce(func.sum(f.gallons_used).filter(f.miles.isnot(None)), 0),
+                     func.count().filter(f.odometer_regression), func.count().filter(f.over_capacity)).group_by(day)
+    await db.execute(delete(D).where(D.day >= start))
+    result = await db.execute(insert(D).from_select(['day', *DAILY_COLUMNS], per_day))
+    return {"fuel_days": result.rowcount}
@@ -0,0 +1,118 @@
+import uuid
+from datetime import datetime
+from typing import Iterable, Optional
+from sqlalchemy import select, update, func, literal, or_
+from sqlalchemy.dialects.postgresql import ARRAY, UUID
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from .models import Vehicle, Driver, VehicleAssignment
+from .cache import cache
+
+# Who drives what. An assignment is open (end_at NULL) while it is current;
+# assigning a vehicle or driver closes whatever they were in at the new start,
+# in the same transaction as the insert, and the two exclusion constraints on
+# vehicle_assignments reject anything that would still overlap. The current
+# assignment is copied onto vehicles.current_driver_id and
+# drivers.current_vehicle_id, so "who is driving unit X" is a primary-key read
+# and availability is a scan of a partial index, however long the history.
+# Write paths call sync_current() for every vehicle and driver they touched; it
+# returns the ids whose pointer changed, by cache namespace. assign() and
+# unassign() first lock every vehicle and driver row whose assignment or pointer
+# they will change, in one fixed order.
+
+LISTS = {'vehicle': 'vehicles', 'driver': 'drivers'}
+
+def _ids(values: Iterable) -> set[uuid.UUID]:
+    return {uuid.UUID(str(v)) for v in values if v is not None}
+
+def _keys(ids: set[uuid.UUID]):
+    return func.unnest(literal(list(ids), ARRAY(UUID(as_uuid=True)))
+                       ).table_valued('k').render_derived(name='keys')
+
+async def sync_current(db: AsyncSession, vehicle_ids: Iterable, driver_ids: Iterable) -> dict[str, list[str]]:
+    A = VehicleAssignment
+    stale: dict[str, list[str]] = {}
+    for ns, model, pointer, own, other, ids in (
+            ('vehicle', Vehicle, Vehicle.current_driver_id, A.vehicle_id, A.driver_id, _ids(vehicle_ids)),
+            ('driver', Driver, Driver.current_vehicle_id, A.driver_id, A.vehicle_id, _ids(driver_ids))):
+        if not ids:
+            continue
+        keys = _keys(ids)
+        held = select(other).where(own == model.id, A.end_at.is_(None)).scalar_subquery()
+        stmt = (update(model).where(model.id == keys.c.k, pointer.is_distinct_from(held))
+                .values({pointer: held}).returning(model.id))
+        stale[ns] = [str(i) for i in (await db.execute(stmt)).scalars()]
+    return stale
+
+async def _lock(db: AsyncSession, vehicle_ids: Iterable, driver_ids: Iterable) -> None:
+    # Vehicles before drivers, each in id order, so writers touching the same
+    # rows always queue for them in the same order.
+    for model, ids in ((Vehicle, _ids(vehicle_ids)), (Driver, _ids(driver_ids))):
+        if ids:
+            await db.execute(select(model.id).where(model.id.in_(sorted(ids))).order_by(model.id).with_for_update())
+
+async def _involved(db: AsyncSession, vehicle_id, driver_id) -> tuple[set, set]:
+    # The vehicle and driver plus whoever they are currently paired with.
+    A = VehicleAssignment
+    rows = (await db.execute(select(A.vehicle_id, A.driver_id).where(
+        A.end_at.is_(None), or_(A.vehicle_id == vehicle_id, A.driver_id == driver_id)))).all()
+    return _ids([vehicle_id, *(r.vehicle_id for r in rows)]), _ids([driver_id, *(r.driver_id for r in rows)])
+
+async def _lock_involved(db: AsyncSession, vehicle_id, driver_id) -> None:
+    # Locks every row whose open assignment or pointer the write will change.
+    # If the pairing moved between the read and the lock, the locks are given
+    # back (savepoint rollback) and the larger set is taken again from the
+    # start, so the order is never broken.
+    vehicles, drivers = await _involved(db, vehicle_id, driver_id)
+    while True:
+        savepoint = await db.begin_nested()
+        await _lock(db, vehicles, drivers)
+        now_v, now_d = await _involved(db, vehicle_id, driver_id)
+        if now_v <= vehicles and now_d <= drivers:
+            await savepoint.commit()
+            return
+        await savepoint.rollback()
+        vehicles |= now_v
+        drivers |= now_d
+
+async def current(db: AsyncSession, vehicle_id, for_update: bool = False) -> Optional[VehicleAssignment]:
+    A = VehicleAssignment
+    stmt = select(A).where(A.vehicle_id == vehicle_id, A.end_at.is_(None))
+    return (await db.execute(stmt.with_for_update() if for_update else stmt)).scalar_one_or_none()
+
+async def assign(db: AsyncSession, vehicle_id, driver_id, start_at: datetime) -> tuple[VehicleAssignment, dict]:
+    # Raises IntegrityError if the new assignment would overlap one that starts
+    # at or after start_at.
+    A = VehicleAssignment
+    await _lock_involved(db, vehicle_id, driver_id)
+    now = await current(db, vehicle_id)
+    if now is not None and str(now.driver_id) == str(driver_id):
+        return now, {}
+    closed = (await db.execute(
+        update(A).where(A.end_at.is_(None), or_(A.vehicle_id == vehicle_id, A.driver_id == driver_id),
+                        A.start_at < start_at)
+        .values(end_at=start_at).returning(A.vehicle_id, A.driver_id))).all()
+    a = A(vehicle_id=vehicle_id, driver_id=driver_id, start_at=start_at)
+    db.add(a)
+    await db.flush()
+    stale = await sync_current(db, [vehicle_id, *(c.vehicle_id for c in closed)],
+                               [driver_id, *(c.driver_id for c in closed)])
+    return a, stale
+
+async def unassign(db: AsyncSession, vehicle_id, end_at: datetime) -> tuple[Optional[VehicleAssignment], dict]:
+    await _lock(db, [vehicle_id], [])
+    a = await current(db, vehicle_id, for_update=True)
+    if a is None:
+        return None, {}
+    await _lock(db, [], [a.driver_id])
+    if end_at < a.start_at:
+        raise ValueError("end_at is before the assignment started")
+    a.end_at = end_at
+    await db.flush()
+    return a, await sync_current(db, [vehicle_id], [a.driver_id])
+
+async def invalidate(stale: dict[str, list[str]]) -> None:
+    for ns, ids in stale.items():
+        if ids:
+            await cache.invalidate(ns, *ids)
+            await cache.invalidate_namespace(LISTS[ns])
@@ -1,16 +1,145 @@
+import asyncio
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
 from datetime import datetime, timedelta, timezone
-from passlib.hash import bcrypt
-from jose import jwt
+from fastapi import HTTPException
+from passlib.context import CryptContext
+from jose import jwt, JWTError
 from .settings import settings
 
 ALGO = "HS256"
 
-def hash_password(p: str) -> str:
-    return bcrypt.hash(p)
+# bcrypt costs 100ms+ of CPU per call, so hashing and verification run on a small
+# dedicated thread pool (bcrypt releases the GIL) instead of the event loop. The
+# pool is bounded: once PASSWORD_HASH_WORKERS are busy and PASSWORD_HASH_QUEUE
+# more calls are waiting, further logins get a 503 with Retry-After rather than
+# piling up behind a login burst. Hashes made with a different BCRYPT_ROUNDS are
+# upgraded on the next successful login.
 
-def verify_password(p: str, h: str) -> bool:
-    return bcrypt.verify(p, h)
+pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto", bcrypt__rounds=settings.bcrypt_rounds)
+
+def _timed(fn, *args):
+    started = time.perf_counter()
+    result = fn(*args)
+    return started, time.perf_counter(), result
+
+class PasswordPool:
+    def __init__(self, workers: int, max_queue: int):
+        self.workers = workers
+        self.max_queue = max_queue
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="pwhash")
+        self.pending = 0
+        self.completed = 0
+        self.rejected = 0
+        self.wait_ms: deque[float] = deque(maxlen=1000)
+        self.run_ms: deque[float] = deque(maxlen=1000)
+
+    async def run(self, fn, *args):
+        if self.pending >= self.workers + self.max_queue:
+            self.rejected += 1
+            raise HTTPException(status_code=503, detail="Too many concurrent logins, retry shortly",
+                                headers={"Retry-After": "1"})
+        queued = time.perf_counter()
+        self.pending += 1
+        try:
+            started, finished, result = await asyncio.get_running_loop().run_in_executor(self.executor, _timed, fn, *args)
+        finally:
+            self.pending -= 1
+        self.completed += 1
+        self.wait_ms.append((started - queued) * 1000)
+        self.run_ms.append((finished - started) * 1000)
+        return result
+
+    def stats(self) -> dict:
+        def pct(samples, q):
+            s = sorted(samples)
+            return round(s[min(len(s) - 1, int(q * len(s)))], 1) if s else None
+        return {
+            "workers": self.workers, "in_flight": min(self.pending, self.workers),
+            "queue_depth": max(0, self.pending - self.workers), "max_queue": self.max_queue,
+            "completed": self.completed, "rejected": self.rejected, "rounds": settings.bcrypt_rounds,
+            "hash_ms": {"p50": pct(self.run_ms, .5), "p95": pct(self.run_ms, .95), "p99": pct(self.run_ms, .99)},
+            "wait_ms": {"p50": pct(self.wait_ms, .5), "p95": pct(self.wait_ms, .95), "p99": pct(self.wait_ms, .99)},
+        }
+
+password_pool = PasswordPool(settings.password_hash_workers, settings.password_hash_queue)
+
+async def hash_password(p: str) -> str:
+    return await password_pool.run(pwd_context.hash, p)
+
+async def verify_password(p: str, h: str) -> tuple[bool, str | None]:
+    # Returns (ok, new_hash); new_hash is set when the stored hash should be replaced.
+    return await password_pool.run(pwd_context.verify_and_update, p, h)
+
+# Tokens are signed with the current key and carry its id in the `kid` header;
+# API_JWT_PREVIOUS_KEYS ("kid:secret,...") keeps retired keys verifiable until
+# their tokens expire. Tokens without a kid predate rotation and use the current key.
+
+def _signing_keys() -> dict[str, str]:
+    keys = dict(k.split(":", 1) for k in settings.api_jwt_previous_keys.split(",") if ":" in k)
+    keys[settings.api_jwt_kid] = settings.api_jwt_secret
+    return keys
+
+KEYS = _signing_keys()
+
+@dataclass(frozen=True, slots=True)
+class Principal:
+    sub: str
+    role: str
+    exp: int
 
 def create_token(sub: str, role: str) -> str:
     exp = datetime.now(timezone.utc) + timedelta(minutes=settings.api_jwt_expires_min)
-    return jwt.encode({"sub": sub, "role": role, "exp": exp}, settings.api_jwt_secret, algorithm=ALGO)
+    return jwt.encode({"sub": sub, "role": role, "exp": exp}, settings.api_jwt_secret, algorithm=ALGO,
+                      headers={"kid": settings.api_jwt_kid})
+
+class TokenCache:
+    # Verified tokens, keyed by the whole token (header, claims and signature) so a
+    # hit proves the exact bytes were verified before; entries lapse at `exp`.
+    def __init__(self, maxsize: int):
+        self.maxsize = maxsize
+        self.data: OrderedDict[str, Principal] = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, token: str) -> Principal | None:
+        p = self.data.get(token)
+        if p is None:
+            return None
+        if p.exp <= time.time():
+            del self.data[token]
+            return None
+        self.data.move_to_end(token)
+        return p
+
+    def put(self, token: str, p: Principal) -> None:
+        self.data[token] = p
+        while len(self.data) > self.maxsize:
+            self.data.popitem(last=False)
+
+    def stats(self) -> dict:
+        return {"entries": len(self.data), "hits": self.hits, "misses": self.misses}
+
+token_cache = TokenCache(settings.auth_token_cache_size)
+
+def decode_token(token: str) -> Principal:
+    try:
+        key = KEYS.get(jwt.get_unverified_header(token).get("kid", settings.api_jwt_kid))
+        if key is None:
+            raise JWTError("unknown kid")
+        claims = jwt.decode(token, key, algorithms=[ALGO])
+        return Principal(sub=claims["sub"], role=claims.get("role"), exp=int(claims["exp"]))
+    except (JWTError, KeyError):
+        raise HTTPException(status_code=401, detail="Invalid token")
+
+def verify_token(token: str) -> Principal:
+    p = token_cache.get(token)
+    if p is not None:
+        token_cache.hits += 1
+        return p
+    token_cache.misses += 1
+    p = decode_token(token)
+    token_cache.put(token, p)
+    return p
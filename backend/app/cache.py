@@ -0,0 +1,128 @@
+import json
+import time
+from collections import OrderedDict, Counter
+from typing import Any, Awaitable, Callable, Optional
+
+from .settings import settings
+
+# Read-through cache for hot vehicle/driver reads and serialized list pages.
+# Entries are keyed "<namespace>:<key>". List pages live under a versioned
+# namespace: invalidate_namespace() bumps the version so every cached page of
+# that list is orphaned at once without scanning keys. The default backend is an
+# in-process LRU with TTL; CACHE_BACKEND=redis shares entries (and invalidation)
+# across API processes. Values must be JSON-serializable.
+
+class MemoryBackend:
+    def __init__(self, maxsize: int):
+        self.maxsize = maxsize
+        self.data: OrderedDict[str, tuple[float, Any]] = OrderedDict()
+        self.versions: Counter[str] = Counter()
+        self.evictions = 0
+
+    async def get(self, key: str) -> Optional[Any]:
+        item = self.data.get(key)
+        if item is None:
+            return None
+        expires, value = item
+        if expires < time.monotonic():
+            del self.data[key]
+            return None
+        self.data.move_to_end(key)
+        return value
+
+    async def set(self, key: str, value: Any, ttl: int) -> None:
+        self.data[key] = (time.monotonic() + ttl, value)
+        self.data.move_to_end(key)
+        while len(self.data) > self.maxsize:
+            self.data.popitem(last=False)
+            self.evictions += 1
+
+    async def delete(self, *keys: str) -> None:
+        for key in keys:
+            self.data.pop(key, None)
+
+    async def version(self, namespace: str) -> int:
+        return self.versions[namespace]
+
+    async def bump(self, namespace: str) -> None:
+        self.versions[namespace] += 1
+
+    def size(self) -> int:
+        return len(self.data)
+
+class RedisBackend:
+    def __init__(self, url: str):
+        from redis import asyncio as aioredis
+        self.client = aioredis.from_url(url)
+        self.evictions = 0
+
+    async def get(self, key: str) -> Optional[Any]:
+        raw = await self.client.get(key)
+        return None if raw is None else json.loads(raw)
+
+    async def set(self, key: str, value: Any, ttl: int) -> None:
+        await self.client.set(key, json.dumps(value), ex=ttl)
+
+    async def delete(self, *keys: str) -> None:
+        await self.client.delete(*keys)
+
+    async def version(self, namespace: str) -> int:
+        return int(await self.client.get(f"cachever:{namespace}") or 0)
+
+    async def bump(self, namespace: str) -> None:
+        await self.client.incr(f"cachever:{namespace}")
+
+    def size(self) -> Optional[int]:
+        return None
+
+class Cache:
+    def __init__(self, backend, ttl: int):
+        self.backend = backend
+        self.ttl = ttl
+        self.hits: Counter[str] = Counter()
+        self.misses: Counter[str] = Counter()
+        self.invalidations: Counter[str] = Counter()
+
+    async def read_through(self, namespace: str, key: str, load: Callable[[], Awaitable[Any]],
+                           versioned: bool = False) -> Any:
+        if self.backend is None:
+            return await load()
+        full = f"{namespace}:v{await self.backend.version(namespace)}:{key}" if versioned else f"{namespace}:{key}"
+        value = await self.backend.get(full)
+        if value is not None:
+            self.hits[namespace] += 1
+            return value
+        self.misses[namespace] += 1
+        value = await load()
+        if value is not None:
+            await self.backend.set(full, value, self.ttl)
+        return value
+
+    async def invalidate(self, namespace: str, *keys: str) -> None:
+        if self.backend is not None and keys:
+            await self.backend.delete(*[f"{namespace}:{key}" for key in keys])
+            self.invalidations[namespace] += len(keys)
+
+    async def invalidate_namespace(self, namespace: str) -> None:
+        if self.backend is not None:
+            await self.backend.bump(namespace)
+            self.invalidations[namespace] += 1
+
+    def stats(self) -> dict:
+        names = sorted(set(self.hits) | set(self.misses) | set(self.invalidations))
+        return {
+            "backend": type(self.backend).__name__ if self.backend else "none",
+            "entries": self.backend.size() if self.backend else 0,
+            "evictions": self.backend.evictions if self.backend else 0,
+            "namespaces": {n: {"hits": self.hits[n], "misses": self.misses[n],
+                               "invalidations": self.invalidations[n]} for n in names},
+        }
+
+def _make_backend():
+    if settings.cache_backend == "redis":
+        return RedisBackend(settings.redis_url)
+    if settings.cache_backend == "memory":
+        return MemoryBackend(settings.cache_max_entries)
+    return None
+
+cache = Cache(_make_backend(), settings.cache_ttl_s)
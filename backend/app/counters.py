@@ -0,0 +1,97 @@
+from datetime import datetime, timedelta, timezone
+from sqlalchemy import select, insert, delete, func, literal
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from .models import Vehicle, WorkOrder, Defect, Alert, StatCounter
+
+# Dashboard counters live in stat_counters as (name, bucket) -> value and are
+# bumped in the same transaction as the write that changes them, so reading the
+# summary is a scan of a few dozen rows regardless of fleet size. recount()
+# rebuilds them from the base tables (nightly, and to repair any drift).
+# OVERDUE_WOS counts open WOs due before the cutoff of the last recount or of
+# migration 0005's seed (kept under OVERDUE_AS_OF): write paths move it when
+# they open or resolve such a WO, and WOs falling due after the cutoff are
+# picked up by the next recount.
+
+VEHICLES = 'vehicles_by_status'
+OPEN_WOS = 'open_wos_by_priority'
+OVERDUE_WOS = 'overdue_wos_by_priority'
+OPEN_ALERTS = 'open_alerts_by_key'
+OPEN_DEFECTS = 'open_defects_by_severity'
+OVERDUE_AS_OF = 'overdue_wos_as_of'  # single row; value is the cutoff in epoch microseconds
+EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+
+CLOSED_WO = ('closed', 'canceled')
+OPEN_DEFECT = ('open', 'in_wo')
+
+def wo_is_open(status: str | None) -> bool:
+    return status not in CLOSED_WO
+
+def _bucket(v) -> str:
+    return 'none' if v is None else str(v)
+
+async def bump(db: AsyncSession, name: str, bucket, delta: int = 1) -> None:
+    await bump_many(db, {(name, bucket): delta})
+
+async def bump_many(db: AsyncSession, deltas: dict[tuple[str, object], int]) -> None:
+    # Several (name, bucket) deltas in one upsert; callers must merge duplicate keys.
+    rows = [{"name": name, "bucket": _bucket(bucket), "value": d} for (name, bucket), d in deltas.items() if d]
+    if not rows:
+        return
+    stmt = pg_insert(StatCounter).values(rows)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=['name', 'bucket'],
+        set_={'value': StatCounter.value + stmt.excluded.value, 'updated_at': func.now()},
+    )
+    await db.execute(stmt)
+
+async def overdue_as_of(db: AsyncSession) -> datetime | None:
+    v = (await db.execute(select(StatCounter.value).where(StatCounter.name == OVERDUE_AS_OF))).scalar()
+    return EPOCH + timedelta(microseconds=v) if v is not None else None
+
+async def bump_overdue(db: AsyncSession, priority, due_at: datetime | None, delta: int) -> None:
+    # delta is the change in the WO's openness; it only counts if the WO was due before the cutoff.
+    if not delta or due_at is None:
+        return
+    as_of = await overdue_as_of(db)
+    if as_of and (due_at if due_at.tzinfo else due_at.replace(tzinfo=timezone.utc)) < as_of:
+        await bump(db, OVERDUE_WOS, priority, delta)
+
+def _sources(now: datetime) -> dict:
+    open_wo = WorkOrder.status.not_in(CLOSED_WO)
+    return {
+        VEHICLES: select(Vehicle.status, func.count()).group_by(Vehicle.status),
+        OPEN_WOS: select(WorkOrder.priority, func.count()).where(open_wo).group_by(WorkOrder.priority),
+        OVERDUE_WOS: (select(WorkOrder.priority, func.count())
+                      .where(open_wo, WorkOrder.due_at < now).group_by(WorkOrder.priority)),
+        OPEN_ALERTS: select(Alert.key, func.count()).where(Alert.status == 'open').group_by(Alert.key),
+        OPEN_DEFECTS: (select(Defect.severity, func.count())
+                       .where(Defect.status.in_(OPEN_DEFECT)).group_by(Defect.severity)),
+    }
+
+async def recount(db: AsyncSession, now: datetime, names: list[str] | None = None) -> None:
+    for name, q in _sources(now).items():
+        if names and name not in names:
+            continue
+        counts = q.subquery()
+        await db.execute(delete(StatCounter).where(StatCounter.name == name))
+        await db.execute(insert(StatCounter).from_select(
+            ['name', 'bucket', 'value'],
+            select(literal(name), func.coalesce(counts.c[0], 'none'), counts.c[1]),
+        ))
+        if name == OVERDUE_WOS:
+            await db.execute(delete(StatCounter).where(StatCounter.name == OVERDUE_AS_OF))
+            await db.execute(insert(StatCounter).values(
+                name=OVERDUE_AS_OF, bucket='epoch', value=(now - EPOCH) // timedelta(microseconds=1)))
+
+async def summary(db: AsyncSession) -> dict:
+    out = {name: {} for name in (VEHICLES, OPEN_WOS, OVERDUE_WOS, OPEN_ALERTS, OPEN_DEFECTS)}
+    overdue_as_of = None
+    for c in (await db.execute(select(StatCounter))).scalars():
+        if c.name == OVERDUE_AS_OF:
+            overdue_as_of = EPOCH + timedelta(microseconds=c.value)
+        if c.name in out and c.value:
+            out[c.name][c.bucket] = c.value
+    totals = {f"{name.split('_by_')[0]}_total": sum(b.values()) for name, b in out.items()}
+    return {**out, **totals, "overdue_as_of": overdue_as_of}
@@ -1,9 +1,62 @@
+import time
+from collections import deque
+from sqlalchemy import exc
 from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
 from sqlalchemy.orm import DeclarativeBase
+from sqlalchemy.pool import AsyncAdaptedQueuePool
 from .settings import settings
 
-engine = create_async_engine(settings.database_url, echo=False, future=True)
+# Pool sizing, recycle, pre-ping and the asyncpg prepared statement cache come
+# from Settings. Reads that can tolerate replica lag (list and get handlers) use
+# ReadSessionLocal, which points at POSTGRES_REPLICA_HOST when one is set and at
+# the primary otherwise. TimedQueuePool records how long each checkout waited so
+# the pool can be sized against the number of API workers (see /internal/stats).
+
+class TimedQueuePool(AsyncAdaptedQueuePool):
+    def __init__(self, *args, **kw):
+        super().__init__(*args, **kw)
+        self.checkouts = 0
+        self.timeouts = 0
+        self.wait_ms: deque[float] = deque(maxlen=1000)
+
+    def _do_get(self):
+        t0 = time.perf_counter()
+        try:
+            conn = super()._do_get()
+        except exc.TimeoutError:
+            self.timeouts += 1
+            raise
+        self.checkouts += 1
+        self.wait_ms.append((time.perf_counter() - t0) * 1000)
+        return conn
+
+    def stats(self) -> dict:
+        waits = sorted(self.wait_ms)
+        pct = lambda q: round(waits[min(len(waits) - 1, int(q * len(waits)))], 2) if waits else None
+        return {
+            "size": self.size(), "checked_out": self.checkedout(), "idle": self.checkedin(),
+            "overflow": self.overflow(), "checkouts": self.checkouts, "timeouts": self.timeouts,
+            "wait_ms": {"p50": pct(.5), "p95": pct(.95), "p99": pct(.99), "max": round(waits[-1], 2) if waits else None},
+        }
+
+def make_engine(url: str):
+    return create_async_engine(
+        url, echo=False, future=True, poolclass=TimedQueuePool,
+        pool_size=settings.db_pool_size, max_overflow=settings.db_max_overflow,
+        pool_timeout=settings.db_pool_timeout, pool_recycle=settings.db_pool_recycle,
+        pool_pre_ping=settings.db_pool_pre_ping,
+        connect_args={"prepared_statement_cache_size": settings.db_statement_cache_size})
+
+engine = make_engine(settings.database_url)
+read_engine = make_engine(settings.read_database_url) if settings.postgres_replica_host else engine
 SessionLocal = async_sessionmaker(engine, expire_on_commit=False)
+ReadSessionLocal = async_sessionmaker(read_engine, expire_on_commit=False)
+
+def pool_stats() -> dict:
+    out = {"primary": engine.sync_engine.pool.stats()}
+    if read_engine is not engine:
+        out["replica"] = read_engine.sync_engine.pool.stats()
+    return out
 
 class Base(DeclarativeBase):
     pass
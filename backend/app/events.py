@@ -0,0 +1,159 @@
+import asyncio
+import json
+import logging
+import time
+from typing import AsyncIterator
+from fastapi.encoders import jsonable_encoder
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from .settings import settings
+
+log = logging.getLogger(__name__)
+
+# Change feed for dashboards. Write paths stage events on their session
+# (stage()) and publish them only once the transaction has committed
+# (commit()), so clients never see a change that was rolled back. Events go to
+# one Redis stream, capped at EVENTS_STREAM_MAXLEN entries; the stream entry id
+# is the SSE event id, so a reconnecting client resumes from Last-Event-ID with
+# one XRANGE. Each API process runs a single Hub that blocks on XREAD and fans
+# new entries out to its connected clients, so open dashboards cost Redis one
+# connection per process rather than one per client.
+
+STREAM = "fleet:events"
+
+_redis = None
+
+def redis():
+    global _redis
+    if _redis is None:
+        from redis import asyncio as aioredis
+        _redis = aioredis.from_url(settings.redis_url)
+    return _redis
+
+def stage(db: AsyncSession, type_: str, data: dict) -> None:
+    db.info.setdefault("events", []).append((type_, data))
+
+async def commit(db: AsyncSession) -> None:
+    await db.commit()
+    await publish(db.info.pop("events", []))
+
+async def publish(events: list[tuple[str, dict]]) -> None:
+    # Best effort: the write has committed, so a Redis outage costs clients a
+    # refetch (they get a reset on reconnect) rather than failing the request.
+    if not events:
+        return
+    try:
+        async with redis().pipeline(transaction=False) as pipe:
+            for type_, data in events:
+                pipe.xadd(STREAM, {"type": type_, "data": json.dumps(jsonable_encoder(data))},
+                          maxlen=settings.events_stream_maxlen, approximate=True)
+            await pipe.execute()
+    except Exception:
+        log.warning("could not publish %d events", len(events), exc_info=True)
+
+def _decode(entry) -> tuple[str, str, str]:
+    id_, fields = entry
+    return id_.decode(), fields[b"type"].decode(), fields[b"data"].decode()
+
+def _after(a: str, b: str) -> bool:
+    # Stream ids are "<ms>-<seq>".
+    return tuple(map(int, a.split("-"))) > tuple(map(int, b.split("-")))
+
+class Hub:
+    def __init__(self):
+        self.subscribers: set[asyncio.Queue] = set()
+        self.task: asyncio.Task | None = None
+        self.dropped = 0
+        self.lock = asyncio.Lock()
+
+    async def subscribe(self) -> asyncio.Queue:
+        q = asyncio.Queue(maxsize=settings.events_client_buffer)
+        self.subscribers.add(q)
+        async with self.lock:
+            if self.task is None or self.task.done():
+                # Start from the current tail, so entries added after this point reach q.
+                tail = await redis().xrevrange(STREAM, "+", "-", count=1)
+                self.task = asyncio.create_task(self._read(_decode(tail[0])[0] if tail else "0-0"))
+        return q
+
+    def unsubscribe(self, q: asyncio.Queue) -> None:
+        self.subscribers.discard(q)
+
+    async def _read(self, last: str):
+        while self.subscribers:
+            try:
+                resp = await redis().xread({STREAM: last}, block=5000, count=500)
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                log.warning("event stream read failed", exc_info=True)
+                await asyncio.sleep(1)
+                continue
+            for _, entries in resp or ():
+                for entry in entries:
+                    event = _decode(entry)
+                    last = event[0]
+                    for q in list(self.subscribers):
+                        try:
+                            q.put_nowait(event)
+                        except asyncio.QueueFull:
+                            # Too slow to keep up: disconnect it; the client resumes from its last id.
+                            self.subscribers.discard(q)
+                            while not q.empty():
+                                q.get_nowait()
+                            q.put_nowait(None)
+                            self.dropped += 1
+
+    async def close(self):
+        if self.task is not None:
+            self.task.cancel()
+
+    def stats(self) -> dict:
+        return {"clients": len(self.subscribers), "dropped": self.dropped}
+
+hub = Hub()
+
+def _frame(id_: str, type_: str, data: str) -> str:
+    return f"id: {id_}\nevent: {type_}\ndata: {data}\n\n"
+
+async def backlog(last_id: str) -> tuple[list, bool]:
+    # Entries after last_id, and whether last_id is older than the capped stream
+    # still holds (the client missed events and must refetch).
+    r = redis()
+    first = await r.xrange(STREAM, "-", "+", count=1)
+    if first and _after(_decode(first[0])[0], last_id):
+        return [], True
+    return [_decode(e) for e in await r.xrange(STREAM, f"({last_id}", "+")], False
+
+async def sse(types: set[str] | None, last_id: str | None, until: float) -> AsyncIterator[str]:
+    # Subscribe before reading the backlog so nothing published in between is
+    # lost; entries the backlog already covered are skipped by id.
+    q = await hub.subscribe()
+    try:
+        yield f"retry: {settings.events_retry_ms}\n\n"
+        sent = last_id
+        if last_id:
+            entries, gap = await backlog(last_id)
+            if gap:
+                # An empty id clears the client's Last-Event-ID; it refetches and follows live.
+                yield "id: \nevent: reset\ndata: {}\n\n"
+            for id_, type_, data in entries:
+                if types is None or type_.split(".")[0] in types:
+                    yield _frame(id_, type_, data)
+                sent = id_
+        while time.time() < until:
+            try:
+                event = await asyncio.wait_for(q.get(), timeout=min(settings.events_heartbeat_s, until - time.time()))
+            except asyncio.TimeoutError:
+                yield ": ping\n\n"
+                continue
+            if event is None:
+                return
+            id_, type_, data = event
+            if sent and not _after(id_, sent):
+                continue
+            if types is None or type_.split(".")[0] in types:
+                yield _frame(id_, type_, data)
+            sent = id_
+    finally:
+        hub.unsubscribe(q)
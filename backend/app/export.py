@@ -0,0 +1,164 @@
+import csv
+import io
+import json
+import zlib
+from datetime import datetime
+from decimal import Decimal
+from typing import AsyncIterator
+from fastapi import HTTPException
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import select, Boolean, DateTime, Float, Integer, Numeric
+
+from .db import ReadSessionLocal
+from .models import FuelLog, WorkOrder, Inspection, MeterReading
+
+# Exports stream from a server-side cursor: BATCH rows are fetched, encoded in a
+# worker thread and handed to the response before the next batch is read, so API
+# memory stays flat however large the export and the event loop keeps serving
+# other requests. The export opens its own (read replica) session since the
+# response body is produced after the request's dependencies have closed.
+# Rows are read in (timestamp, id) index order, so an unfiltered export starts
+# streaming without sorting the table first.
+
+BATCH = 5000
+
+DATASETS = {
+    'fuel_logs': (FuelLog, FuelLog.transacted_at),
+    'work_orders': (WorkOrder, WorkOrder.opened_at),
+    'inspections': (Inspection, Inspection.submitted_at),
+    'meter_readings': (MeterReading, MeterReading.recorded_at),
+}
+MEDIA_TYPES = {'csv': 'text/csv', 'ndjson': 'application/x-ndjson', 'parquet': 'application/vnd.apache.parquet'}
+
+def _plain(v):
+    if isinstance(v, datetime):
+        return v.isoformat()
+    if isinstance(v, Decimal):
+        return float(v)
+    if isinstance(v, (dict, list)):
+        return json.dumps(v)
+    return v if v is None or isinstance(v, (str, int, float, bool)) else str(v)
+
+class CsvEncoder:
+    def __init__(self, table):
+        self.names = [c.name for c in table.columns]
+
+    def begin(self) -> bytes:
+        return self.encode([self.names])
+
+    def encode(self, rows) -> bytes:
+        buf = io.StringIO()
+        csv.writer(buf).writerows([_plain(v) for v in row] for row in rows)
+        return buf.getvalue().encode()
+
+    def end(self) -> bytes:
+        return b""
+
+class NdjsonEncoder:
+    def __init__(self, table):
+        self.names = [c.name for c in table.columns]
+
+    def begin(self) -> bytes:
+        return b""
+
+    def encode(self, rows) -> bytes:
+        return "".join(json.dumps(dict(zip(self.names, map(_plain, row)))) + "\n" for row in rows).encode()
+
+    def end(self) -> bytes:
+        return b""
+
+class _Drain:
+    # Write-only file for ParquetWriter: keeps the running offset the footer
+    # needs while handing written bytes back out after every row group.
+    closed = False
+
+    def __init__(self):
+        self.chunks, self.pos = [], 0
+
+    def write(self, b) -> int:
+        self.chunks.append(bytes(b)); self.pos += len(b)
+        return len(b)
+
+    def tell(self) -> int:
+        return self.pos
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def take(self) -> bytes:
+        out = b"".join(self.chunks); self.chunks = []
+        return out
+
+class ParquetEncoder:
+    # One row group per batch. pyarrow is only needed when parquet is requested.
+    def __init__(self, table):
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise HTTPException(status_code=501, detail="Parquet export requires pyarrow")
+        self.pa = pa
+        self.columns = list(table.columns)
+        self.schema = pa.schema([(c.name, self._arrow_type(c.type)) for c in self.columns])
+        self.sink = _Drain()
+        self.writer = pq.ParquetWriter(pa.PythonFile(self.sink, mode='w'), self.schema, compression='zstd')
+
+    def _arrow_type(self, t):
+        pa = self.pa
+        if isinstance(t, DateTime):
+            return pa.timestamp('us', tz='UTC')
+        if isinstance(t, Float):
+            return pa.float64()
+        if isinstance(t, Numeric):
+            return pa.decimal128(t.precision, t.scale or 0) if t.precision else pa.float64()
+        if isinstance(t, Integer):
+            return pa.int64()
+        if isinstance(t, Boolean):
+            return pa.bool_()
+        return pa.string()
+
+    def begin(self) -> bytes:
+        return b""
+
+    def encode(self, rows) -> bytes:
+        arrays = []
+        for i, field in enumerate(self.schema):
+            values = [row[i] for row in rows]
+            if field.type == self.pa.string():
+                values = [_plain(v) for v in values]
+            arrays.append(self.pa.array(values, type=field.type))
+        self.writer.write_table(self.pa.Table.from_arrays(arrays, schema=self.schema))
+        return self.sink.take()
+
+    def end(self) -> bytes:
+        self.writer.close()
+        return self.sink.take()
+
+ENCODERS = {'csv': CsvEncoder, 'ndjson': NdjsonEncoder, 'parquet': ParquetEncoder}
+
+def export_query(dataset: str, since: datetime | None, until: datetime | None, vehicle_id: str | None):
+    model, ts = DATASETS[dataset]
+    where = []
+    if since: where.append(ts >= since)
+    if until: where.append(ts < until)
+    if vehicle_id: where.append(model.vehicle_id == vehicle_id)
+    return select(model.__table__).where(*where).order_by(ts, model.id)
+
+async def stream_export(query, encoder) -> AsyncIterator[bytes]:
+    yield encoder.begin()
+    async with ReadSessionLocal() as db:
+        result = await db.stream(query.execution_options(yield_per=BATCH))
+        async for rows in result.partitions():
+            yield await run_in_threadpool(encoder.encode, rows)
+    yield encoder.end()
+
+async def gzipped(chunks: AsyncIterator[bytes]) -> AsyncIterator[bytes]:
+    z = zlib.compressobj(wbits=31)
+    async for chunk in chunks:
+        out = z.compress(chunk)
+        if out:
+            yield out
+    yield z.flush()
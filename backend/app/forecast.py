@@ -0,0 +1,114 @@
+from datetime import datetime, timedelta, timezone
+from sqlalchemy import select, func, case, cast, and_, or_, literal, union_all, bindparam, any_, Float, Numeric
+from sqlalchemy.dialects.postgresql import insert as pg_insert, ARRAY, UUID
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from .settings import settings
+from .models import Vehicle, MeterReading, MaintenanceSchedule, MeterRateState
+from .pm import id_range
+
+# Predictive PM. Each vehicle's daily utilization is the slope of a weighted
+# least-squares fit of meter reading against time (in days), with a reading's
+# weight halving every FORECAST_HALF_LIFE_DAYS so the rate follows changes in
+# duty. The fit only needs five running sums per (vehicle, meter type), kept in
+# meter_rate_state: a refresh aggregates the readings recorded since each row's
+# last_recorded_at for the whole range in one statement, decays the stored sums
+# to the refresh time and adds the new ones, so it never rescans history.
+# Vehicles with no state row yet (new, or imported with back-filled history)
+# are read back to the start of the window.
+# Readings that arrive late (recorded before the row's last_recorded_at) are not
+# folded in. The forecast itself joins schedules to the fitted rates and
+# projects every due date in one query.
+
+LOOKBACK_HALF_LIVES = 8  # readings older than this carry < 1/256 weight and are ignored
+METER_FOR_RULE = {'mileage': 'odometer', 'hours': 'hours'}
+
+def _days(ts):
+    return cast(func.extract('epoch', ts), Float) / 86400
+
+def _decay(ts, now: datetime):
+    return func.power(0.5, (now.timestamp() / 86400 - _days(ts)) / settings.forecast_half_life_days)
+
+async def refresh_rates(db: AsyncSession, now: datetime, vehicle_range: tuple | None = None) -> dict:
+    R, M = MeterRateState, MeterReading
+    cutoff = now - timedelta(days=settings.forecast_half_life_days * LOOKBACK_HALF_LIVES)
+    # Nothing before the oldest watermark still in the window is new; the bound
+    # keeps the scan on recent partitions.
+    oldest = (await db.execute(select(func.min(R.last_recorded_at)).where(
+        R.last_recorded_at > cutoff, *id_range(R.vehicle_id, vehicle_range)))).scalar()
+    since = max(cutoff, oldest) if oldest else cutoff
+    cols = (M.vehicle_id, M.type, M.reading, M.recorded_at)
+    readings = select(*cols).where(M.recorded_at > since, M.recorded_at <= now, *id_range(M.vehicle_id, vehicle_range))
+    if since > cutoff:
+        fresh = (await db.execute(select(Vehicle.id).where(
+            *id_range(Vehicle.id, vehicle_range),
+            ~select(R.vehicle_id).where(R.vehicle_id == Vehicle.id).exists()))).scalars().all()
+        if fresh:
+            readings = union_all(readings, select(*cols).where(
+                M.recorded_at > cutoff, M.recorded_at <= since,
+                M.vehicle_id == any_(bindparam('fresh', fresh, type_=ARRAY(UUID(as_uuid=True))))))
+    m = readings.subquery('m')
+    w = _decay(m.c.recorded_at, now)
+    x = _days(m.c.recorded_at)
+    y = cast(m.c.reading, Float)
+    new = (select(m.c.vehicle_id, m.c.type, func.sum(w), func.sum(w * x), func.sum(w * y), func.sum(w * x * x),
+                  func.sum(w * x * y), func.count(), func.max(m.c.recorded_at), literal(now))
+           .outerjoin(R, and_(R.vehicle_id == m.c.vehicle_id, R.type == m.c.type))
+           .where(or_(R.last_recorded_at.is_(None), m.c.recorded_at > R.last_recorded_at))
+           .group_by(m.c.vehicle_id, m.c.type))
+    stmt = pg_insert(R).from_select(['vehicle_id', 'type', 'w', 'wx', 'wy', 'wxx', 'wxy', 'readings',
+                                     'last_recorded_at', 'refreshed_at'], new)
+    # Stored sums are weighted as of refreshed_at; a row idle past the window starts over.
+    keep = case((R.refreshed_at > cutoff, _decay(R.refreshed_at, now)), else_=0.0)
+    ex = stmt.excluded
+    stmt = stmt.on_conflict_do_update(index_elements=['vehicle_id', 'type'], set_={
+        'w': R.w * keep + ex.w, 'wx': R.wx * keep + ex.wx, 'wy': R.wy * keep + ex.wy,
+        'wxx': R.wxx * keep + ex.wxx, 'wxy': R.wxy * keep + ex.wxy,
+        'readings': case((R.refreshed_at > cutoff, R.readings), else_=0) + ex.readings,
+        'last_recorded_at': ex.last_recorded_at, 'refreshed_at': ex.refreshed_at,
+    })
+    result = await db.execute(stmt)
+    return {"rates_refreshed": result.rowcount}
+
+def daily_rates(now: datetime):
+    # Weighted OLS slope per (vehicle, type), in meter units per day. Needs two
+    # readings and at least a day of weighted spread in time to be trusted.
+    R = MeterRateState
+    cov = R.w * R.wxy - R.wx * R.wy
+    var = R.w * R.wxx - R.wx * R.wx
+    cutoff = now - timedelta(days=settings.forecast_half_life_days * LOOKBACK_HALF_LIVES)
+    return (select(R.vehicle_id, R.type, func.greatest(cov / var, 0.0).label('rate'))
+            .where(R.readings >= 2, var >= R.w * R.w, R.last_recorded_at > cutoff)
+            .subquery())
+
+async def pm_forecast(db: AsyncSession, days: int, now: datetime | None = None) -> dict:
+    now = now or datetime.now(timezone.utc)
+    horizon = now + timedelta(days=days)
+    S, V = MaintenanceSchedule, Vehicle
+    r = daily_rates(now)
+    current = case((S.rule_type == 'mileage', V.current_meter), (S.rule_type == 'hours', V.current_hours))
+    remaining = cast(S.last_meter + S.interval_value - current, Float)
+    meter_due = case(
+        (remaining <= 0, literal(now)),
+        # Only project what lands inside the horizon; slow vehicles would overflow the interval.
+        (and_(r.c.rate > 0, remaining <= r.c.rate * days),
+         literal(now) + func.make_interval(0, 0, 0, 0, 0, 0, remaining / r.c.rate * 86400)))
+    due_at = case((S.rule_type == 'date', S.last_completed_at + func.make_interval(0, 0, 0, S.interval_value)),
+                  else_=meter_due)
+    projected = (select(S.id.label('schedule_id'), S.vehicle_id, V.unit_no, S.rule_type, S.interval_value,
+                        due_at.label('due_at'),
+                        case((S.rule_type != 'date', remaining)).label('remaining'),
+                        func.round(cast(r.c.rate, Numeric), 2).label('daily_rate'))
+                 .join(V, V.id == S.vehicle_id)
+                 .outerjoin(r, and_(r.c.vehicle_id == S.vehicle_id,
+                                    r.c.type == case(*[(S.rule_type == k, v) for k, v in METER_FOR_RULE.items()])))
+                 .subquery())
+    p = projected.c
+    rows = (await db.execute(
+        select(projected, (p.due_at <= now).label('overdue'))
+        .where(p.due_at < horizon).order_by(p.due_at, p.schedule_id))).mappings().all()
+    by_day: dict[str, int] = {}
+    for row in rows:
+        day = max(row['due_at'], now).date().isoformat()
+        by_day[day] = by_day.get(day, 0) + 1
+    return {"as_of": now, "days": days, "by_day": by_day, "schedules": [dict(row) for row in rows]}
@@ -0,0 +1,352 @@
+import argparse
+import asyncio
+import io
+import json
+import logging
+import math
+import sys
+import tempfile
+import time
+import uuid
+from datetime import datetime, timezone
+from typing import AsyncIterator, Callable, Iterable, Optional
+from sqlalchemy import select, update, union, union_all, func, or_, bindparam, literal, literal_column
+from sqlalchemy.dialects.postgresql import ARRAY, insert as pg_insert
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from .settings import settings
+from .models import Vehicle, Driver, VehicleAssignment
+from .ingest import iter_records, parse_timestamp, METER_TYPES
+from .assignments import sync_current
+from .cache import cache
+from . import counters
+
+log = logging.getLogger(__name__)
+
+# Bulk onboarding of vehicles, drivers and assignments from CSV or NDJSON. The
+# file is read as a stream and upserted in chunks of IMPORT_CHUNK_SIZE records,
+# each chunk in its own transaction, with INSERT ... ON CONFLICT on the natural
+# keys: vehicles by unit_no (a VIN already on another unit is rejected), drivers
+# by license_no, and assignments by (unit_no, license_no, start_at). An open
+# assignment, imported or existing, ends where the next one for its vehicle or
+# driver starts, and the current-assignment pointers are resynced. Updates
+# only touch rows that change and blank or missing columns keep their current
+# values, so re-running an import is a no-op. Bad rows are reported by line and
+# never fail the rest of the import.
+#   python -m app.importer vehicles fleet.csv
+
+KINDS = ('vehicles', 'drivers', 'assignments')
+MAX_ERRORS = 1000
+SPOOL_BYTES = 8 * 1024 * 1024  # request bodies beyond this are spooled to disk
+
+def _text(row: dict, key: str, size: int, required: bool = False) -> Optional[str]:
+    v = row.get(key)
+    v = None if v is None else str(v).strip() or None
+    if v is None and required:
+        raise ValueError(f"{key} is required")
+    if v is not None and len(v) > size:
+        raise ValueError(f"{key} must be at most {size} characters")
+    return v
+
+def _number(row: dict, key: str, below: float, kind=float):
+    v = row.get(key)
+    if v in (None, ''):
+        return None
+    try:
+        n = kind(v)
+    except (TypeError, ValueError):
+        raise ValueError(f"{key} must be a number")
+    if not math.isfinite(n) or not 0 <= n < below:
+        raise ValueError(f"{key} must be between 0 and {below:g}")
+    return n
+
+def _when(row: dict, key: str, required: bool = False):
+    try:
+        v = parse_timestamp(row.get(key))
+    except ValueError:
+        raise ValueError(f"{key} must be an ISO-8601 timestamp")
+    if v is None and required:
+        raise ValueError(f"{key} is required")
+    return v
+
+def parse_vehicle(row: dict) -> dict:
+    meter_type = _text(row, 'meter_type', 16)
+    if meter_type and meter_type not in METER_TYPES:
+        raise ValueError(f"meter_type must be one of {', '.join(METER_TYPES)}")
+    return {'unit_no': _text(row, 'unit_no', 64, required=True), 'vin': _text(row, 'vin', 64),
+            'make': _text(row, 'make', 64), 'model': _text(row, 'model', 64),
+            'year': _number(row, 'year', 10_000, int), 'class_': _text(row, 'class_' if 'class_' in row else 'class', 64),
+            'status': _text(row, 'status', 32), 'meter_type': meter_type,
+            'current_meter': _number(row, 'current_meter', 1e11), 'current_hours': _number(row, 'current_hours', 1e11),
+            'tank_capacity_gal': _number(row, 'tank_capacity_gal', 1e5),
+            'in_service_on': _when(row, 'in_service_on'), 'out_service_on': _when(row, 'out_service_on')}
+
+def parse_driver(row: dict) -> dict:
+    return {'license_no': _text(row, 'license_no', 64, required=True), 'full_name': _text(row, 'full_name', 200),
+            'email': _text(row, 'email', 320), 'phone': _text(row, 'phone', 50),
+            'license_class': _text(row, 'license_class', 32), 'license_expires_on': _when(row, 'license_expires_on')}
+
+def parse_assignment(row: dict) -> dict:
+    out = {'unit_no': _text(row, 'unit_no', 64, required=True), 'license_no': _text(row, 'license_no', 64, required=True),
+           'start_at': _when(row, 'start_at', required=True), 'end_at': _when(row, 'end_at')}
+    if out['end_at'] and out['end_at'] <= out['start_at']:
+        raise ValueError("end_at must be after start_at")
+    if max(out['start_at'], out['end_at'] or out['start_at']) > datetime.now(timezone.utc):
+        raise ValueError("assignments cannot start or end in the future")
+    return out
+
+def _matching(stmt, col, values):
+    # Rows whose col is in values, as a join against the unnested list: one
+    # parameter however long the chunk, and linear even on a freshly loaded table
+    # the planner has no statistics for yet.
+    keys = func.unnest(literal(list(values), ARRAY(col.type))).table_valued('k').render_derived(name='keys')
+    return stmt.join(keys, col == keys.c.k)
+
+def _merge(rows: list[tuple[int, dict]], key) -> list[tuple[int, dict]]:
+    # One record per natural key (ON CONFLICT cannot touch a row twice in one
+    # statement); later lines fill in or override earlier ones.
+    merged: dict = {}
+    for line, r in rows:
+        k = key(r)
+        if k in merged:
+            merged[k][1].update({c: v for c, v in r.items() if v is not None})
+        else:
+            merged[k] = (line, dict(r))
+    return list(merged.values())
+
+def _batch(model, records: list[dict]):
+    # The chunk as a derived table: one array parameter per column, whatever its length.
+    table, cols = model.__table__, list(records[0])
+    return func.unnest(*[bindparam(c, [r[c] for r in records], type_=ARRAY(table.c[c].type)) for c in cols]
+                       ).table_valued(*cols).render_derived(name='batch')
+
+async def _upsert(db: AsyncSession, model, records: list[dict], conflict: list[str], keep: list[str],
+                  returning: list, index_where=None) -> list:
+    # The chunk goes in as one array parameter per column (INSERT ... SELECT FROM
+    # unnest), so the statement is the same for every chunk and is planned once.
+    # Returns (*returning, inserted) for every row inserted or actually changed.
+    table = model.__table__
+    cols = list(records[0])
+    src = _batch(model, records)
+    stmt = pg_insert(table).from_select(cols, select(*[src.c[c] for c in cols]))
+    new = {c: func.coalesce(stmt.excluded[c], table.c[c]) for c in keep}
+    stmt = stmt.on_conflict_do_update(
+        index_elements=conflict, index_where=index_where, set_=new,
+        where=or_(*[table.c[c].is_distinct_from(v) for c, v in new.items()]))
+    return (await db.execute(stmt.returning(*returning, literal_column('xmax = 0').label('inserted')))).all()
+
+async def upsert_vehicles(db: AsyncSession, rows: list[tuple[int, dict]]) -> tuple[list, list[dict], dict]:
+    rows = _merge(rows, lambda r: r['unit_no'])
+    units = [r['unit_no'] for _, r in rows]
+    vins = [r['vin'] for _, r in rows if r['vin']]
+    cols = select(Vehicle.unit_no, Vehicle.vin, Vehicle.status)
+    existing = (await db.execute(union(_matching(cols, Vehicle.unit_no, units), _matching(cols, Vehicle.vin, vins)))).all()
+    status = {e.unit_no: e.status for e in existing}
+    vin_unit = {e.vin: e.unit_no for e in existing if e.vin}
+    records, errors = [], []
+    for line, r in rows:
+        owner = vin_unit.setdefault(r['vin'], r['unit_no']) if r['vin'] else None
+        if owner and owner != r['unit_no']:
+            errors.append({"line": line, "error": f"vin {r['vin']} belongs to unit {owner}"})
+            continue
+        if r['unit_no'] not in status:
+            r = {**r, 'status': r['status'] or 'in_service', 'meter_type': r['meter_type'] or 'odometer',
+                 'current_meter': r['current_meter'] or 0}
+        records.append({'id': uuid.uuid4(), **r})
+    if not records:
+        return [], errors, {}
+    changed = await _upsert(db, Vehicle, records, ['unit_no'], [c for c in records[0] if c not in ('id', 'unit_no')],
+                            [Vehicle.id, Vehicle.unit_no, Vehicle.status])
+    deltas: dict = {}
+    for c in changed:
+        moves = [(c.status, 1)] if c.inserted else [(c.status, 1), (status.get(c.unit_no), -1)]
+        for bucket, d in moves:
+            deltas[(counters.VEHICLES, bucket)] = deltas.get((counters.VEHICLES, bucket), 0) + d
+    await counters.bump_many(db, deltas)
+    return changed, errors, {'vehicle': [str(c.id) for c in changed if not c.inserted]}
+
+async def upsert_drivers(db: AsyncSession, rows: list[tuple[int, dict]]) -> tuple[list, list[dict], dict]:
+    rows = _merge(rows, lambda r: r['license_no'])
+    known = set((await db.execute(_matching(select(Driver.license_no), Driver.license_no,
+                                            [r['license_no'] for _, r in rows]))).scalars())
+    records, errors = [], []
+    for line, r in rows:
+        if r['full_name'] is None and r['license_no'] not in known:
+            errors.append({"line": line, "error": "full_name is required for a new driver"})
+            continue
+        records.append({'id': uuid.uuid4(), **r})
+    if not records:
+        return [], errors, {}
+    changed = await _upsert(db, Driver, records, ['license_no'], [c for c in records[0] if c not in ('id', 'license_no')],
+                            [Driver.id], index_where=Driver.license_no.isnot(None))
+    return changed, errors, {'driver': [str(c.id) for c in changed if not c.inserted]}
+
+def _spans(records: list[dict]):
+    return _batch(VehicleAssignment, [{k: r[k] for k in ('vehicle_id', 'driver_id', 'start_at')} for r in records])
+
+async def _next_starts(db: AsyncSession, records: list[dict]) -> dict:
+    # (vehicle_id, driver_id, start_at) -> start of the next existing assignment of
+    # that vehicle or driver; joined once per side so each uses its (id, start_at) index.
+    A = VehicleAssignment
+    src = _spans(records)
+    later = union_all(*[select(src.c.vehicle_id, src.c.driver_id, src.c.start_at, A.start_at.label('next_at'))
+                        .join(A, col == src.c[col.key]).where(A.start_at > src.c.start_at)
+                        for col in (A.vehicle_id, A.driver_id)]).subquery()
+    k = later.c
+    return {(v, d, s): e for v, d, s, e in (await db.execute(
+        select(k.vehicle_id, k.driver_id, k.start_at, func.min(k.next_at))
+        .group_by(k.vehicle_id, k.driver_id, k.start_at))).all()}
+
+async def _cut_existing(db: AsyncSession, records: list[dict]) -> list:
+    # Existing assignments of a chunk row's vehicle or driver that are still running
+    # when it starts end there (the earliest such start). The range test is what
+    # the exclusion constraints' GiST indexes answer.
+    A = VehicleAssignment
+    src = _spans(records)
+    running = func.tstzrange(A.start_at, A.end_at).op('@>')(src.c.start_at)
+    cut = union_all(*[select(A.id, src.c.start_at).join(src, col == src.c[col.key])
+                      .where(running, A.start_at < src.c.start_at)
+                      for col in (A.vehicle_id, A.driver_id)]).subquery()
+    ends = select(cut.c.id, func.min(cut.c.start_at).label('end_at')).group_by(cut.c.id).subquery()
+    return (await db.execute(update(A).where(A.id == ends.c.id).values(end_at=ends.c.end_at)
+                             .returning(A.vehicle_id, A.driver_id))).all()
+
+async def upsert_assignments(db: AsyncSession, rows: list[tuple[int, dict]]) -> tuple[list, list[dict], dict]:
+    rows = _merge(rows, lambda r: (r['unit_no'], r['license_no'], r['start_at']))
+    vehicles = dict((await db.execute(_matching(select(Vehicle.unit_no, Vehicle.id), Vehicle.unit_no,
+                                                {r['unit_no'] for _, r in rows}))).all())
+    drivers = dict((await db.execute(_matching(select(Driver.license_no, Driver.id), Driver.license_no,
+                                               {r['license_no'] for _, r in rows}))).all())
+    records, errors = [], []
+    for line, r in rows:
+        if r['unit_no'] not in vehicles:
+            errors.append({"line": line, "error": f"unknown unit_no {r['unit_no']}"})
+        elif r['license_no'] not in drivers:
+            errors.append({"line": line, "error": f"unknown license_no {r['license_no']}"})
+        else:
+            records.append({'id': uuid.uuid4(), 'vehicle_id': vehicles[r['unit_no']],
+                            'driver_id': drivers[r['license_no']], 'start_at': r['start_at'], 'end_at': r['end_at']})
+    if not records:
+        return [], errors, {}
+    # A row without end_at runs until the next existing or chunk row of its vehicle or driver starts.
+    open_ = [r for r in records if r['end_at'] is None]
+    if open_:
+        nxt = await _next_starts(db, open_)
+        for r in open_:
+            r['end_at'] = nxt.get((r['vehicle_id'], r['driver_id'], r['start_at']))
+    open_ids = {id(r) for r in open_}
+    records.sort(key=lambda r: r['start_at'])
+    last: dict = {}
+    for r in records:
+        for k in (('vehicle', r['vehicle_id']), ('driver', r['driver_id'])):
+            prev = last.get(k)
+            if prev is not None and id(prev) in open_ids and prev['start_at'] < r['start_at'] \
+                    and (prev['end_at'] is None or prev['end_at'] > r['start_at']):
+                prev['end_at'] = r['start_at']
+            last[k] = r
+    cut = await _cut_existing(db, records)
+    changed = await _upsert(db, VehicleAssignment, records, ['vehicle_id', 'driver_id', 'start_at'], ['end_at'],
+                            [VehicleAssignment.id])
+    stale = await sync_current(db, [r['vehicle_id'] for r in records] + [c.vehicle_id for c in cut],
+                               [r['driver_id'] for r in records] + [c.driver_id for c in cut])
+    return changed, errors, stale
+
+# kind -> (parser, upsert, cached-list namespaces). upsert returns the changed
+# rows, per-line errors and the ids of cached rows it made stale, by namespace.
+IMPORTERS: dict[str, tuple[Callable, Callable, tuple[str, ...]]] = {
+    'vehicles': (parse_vehicle, upsert_vehicles, ('vehicles',)),
+    'drivers': (parse_driver, upsert_drivers, ('drivers',)),
+    'assignments': (parse_assignment, upsert_assignments, ('vehicles', 'drivers')),
+}
+
+async def run_import(Session: async_sessionmaker, kind: str, records: Iterable[tuple[int, Optional[dict], Optional[str]]],
+                     chunk_size: int | None = None, progress: Callable[[dict], None] | None = None) -> dict:
+    parse, upsert, lists = IMPORTERS[kind]
+    size = chunk_size or settings.import_chunk_size
+    stats = {"kind": kind, "rows": 0, "inserted": 0, "updated": 0, "unchanged": 0, "rejected": 0, "chunks": 0}
+    errors: list[dict] = []
+    t0 = time.perf_counter()
+
+    def reject(new: list[dict]) -> None:
+        stats["rejected"] += len(new)
+        errors.extend(new[:MAX_ERRORS - len(errors)])
+
+    async def flush(chunk: list[tuple[int, dict]]) -> None:
+        async with Session() as db:
+            try:
+                changed, bad, stale = await upsert(db, chunk)
+                await db.commit()
+            except IntegrityError as e:
+                # A concurrent writer took one of the keys; report the chunk rather than abort the import.
+                await db.rollback()
+                changed, bad, stale = [], [{"line": line, "error": f"chunk rolled back: {e.orig}"}
+                                           for line, _ in chunk], {}
+        inserted = sum(1 for c in changed if c.inserted)
+        stats["inserted"] += inserted
+        stats["updated"] += len(changed) - inserted
+        reject(bad)
+        stats["chunks"] += 1
+        for ns, ids in stale.items():
+            if ids:
+                await cache.invalidate(ns, *ids)
+        if changed or any(stale.values()):
+            for ns in lists:
+                await cache.invalidate_namespace(ns)
+        done = {**stats, "seconds": round(time.perf_counter() - t0, 2)}
+        log.info("import progress: %s", done)
+        if progress:
+            progress(done)
+
+    chunk: list[tuple[int, dict]] = []
+    for line, row, error in records:
+        stats["rows"] += 1
+        if error is None:
+            try:
+                chunk.append((line, parse(row)))
+            except ValueError as e:
+                error = str(e)
+        if error:
+            reject([{"line": line, "error": error}])
+        if len(chunk) >= size:
+            await flush(chunk)
+            chunk = []
+    if chunk:
+        await flush(chunk)
+    stats["unchanged"] = stats["rows"] - stats["rejected"] - stats["inserted"] - stats["updated"]
+    errors.sort(key=lambda e: e["line"])
+    return {**stats, "seconds": round(time.perf_counter() - t0, 2), "errors": errors}
+
+async def import_stream(Session: async_sessionmaker, kind: str, body: AsyncIterator[bytes], is_csv: bool) -> dict:
+    # Request bodies are spooled (to disk past SPOOL_BYTES) and then read line by line.
+    with tempfile.SpooledTemporaryFile(max_size=SPOOL_BYTES) as spool:
+        async for part in body:
+            spool.write(part)
+        spool.seek(0)
+        lines = io.TextIOWrapper(spool, encoding='utf-8-sig', newline='')
+        try:
+            return await run_import(Session, kind, iter_records(lines, is_csv))
+        finally:
+            lines.detach()
+
+def _print_progress(s: dict) -> None:
+    print(f"{s['kind']}: {s['rows']} rows, {s['inserted']} inserted, {s['updated']} updated, "
+          f"{s['rejected']} rejected ({s['seconds']:.1f}s)", file=sys.stderr)
+
+def main():
+    from .db import SessionLocal
+    p = argparse.ArgumentParser(description="Bulk-import vehicles, drivers or assignments")
+    p.add_argument("kind", choices=KINDS)
+    p.add_argument("path", help="CSV or NDJSON file; - reads stdin")
+    p.add_argument("--format", choices=("csv", "ndjson"), help="default: csv if the file name ends in .csv")
+    p.add_argument("--chunk-size", type=int)
+    a = p.parse_args()
+    is_csv = (a.format or ('csv' if a.path.endswith('.csv') else 'ndjson')) == 'csv'
+    f = open(sys.stdin.fileno(), encoding='utf-8-sig', newline='', closefd=False) if a.path == '-' \
+        else open(a.path, encoding='utf-8-sig', newline='')
+    with f:
+        result = asyncio.run(run_import(SessionLocal, a.kind, iter_records(f, is_csv), a.chunk_size, _print_progress))
+    print(json.dumps(result))
+
+if __name__ == "__main__":
+    main()
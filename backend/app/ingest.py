@@ -0,0 +1,143 @@
+import csv
+import io
+import json
+import math
+import uuid
+from datetime import datetime, timedelta, timezone
+from typing import Iterable, Iterator, Optional
+from sqlalchemy import select, update, insert, func, bindparam, any_, cast, Float, Numeric
+from sqlalchemy.dialects.postgresql import ARRAY, UUID
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from .settings import settings
+from .models import Vehicle, MeterReading
+
+# Batch meter ingestion for telematics gateways: parse NDJSON or CSV, validate
+# every row, COPY the good ones into meter_readings and roll the per-vehicle
+# maxima into Vehicle.current_meter / current_hours with one UPDATE ... FROM unnest.
+# Vehicle ids and maxima go in as array parameters, so a batch is a few bind
+# parameters however many vehicles it touches (asyncpg allows 32767 per statement).
+# Bad rows are reported by line number and never fail the rest of the batch.
+
+METER_TYPES = ('odometer', 'hours')
+MAX_ROWS = 50_000
+COPY_COLUMNS = ['id', 'vehicle_id', 'type', 'reading', 'recorded_at', 'source']
+
+def iter_records(lines: Iterable[str], is_csv: bool) -> Iterator[tuple[int, Optional[dict], Optional[str]]]:
+    # (line, row, None) per record, or (line, None, error) for a line that does not parse.
+    if is_csv:
+        reader = csv.DictReader(lines)
+        for row in reader:
+            yield reader.line_num, row, None
+        return
+    for line, raw in enumerate(lines, start=1):
+        if not raw.strip():
+            continue
+        try:
+            row = json.loads(raw)
+        except ValueError as e:
+            yield line, None, f"Invalid JSON: {e}"
+            continue
+        if not isinstance(row, dict):
+            yield line, None, "Expected a JSON object"
+            continue
+        yield line, row, None
+
+def parse_rows(body: bytes, content_type: str) -> tuple[list[tuple[int, dict]], list[dict]]:
+    rows, errors = [], []
+    text = body.decode('utf-8-sig')
+    lines = io.StringIO(text, newline='') if 'csv' in content_type else text.splitlines()
+    for line, row, error in iter_records(lines, 'csv' in content_type):
+        if error:
+            errors.append({"line": line, "error": error})
+        else:
+            rows.append((line, row))
+    return rows, errors
+
+def parse_timestamp(v, default: Optional[datetime] = None) -> Optional[datetime]:
+    if v in (None, ''):
+        return default
+    ts = datetime.fromisoformat(str(v).replace('Z', '+00:00'))
+    return ts if ts.tzinfo else ts.replace(tzinfo=timezone.utc)
+
+def check_recorded_at(ts: datetime, now: datetime) -> datetime:
+    # A reading from the future would sit in the DEFAULT partition and block its month from being created.
+    if ts > now + timedelta(seconds=settings.max_clock_skew_s):
+        raise ValueError("recorded_at is in the future")
+    return ts
+
+def validate_meter(row: dict, now: datetime) -> tuple:
+    try:
+        vehicle_id = uuid.UUID(str(row.get('vehicle_id')))
+    except ValueError:
+        raise ValueError("vehicle_id must be a UUID")
+    kind = row.get('type') or 'odometer'
+    if kind not in METER_TYPES:
+        raise ValueError(f"type must be one of {', '.join(METER_TYPES)}")
+    try:
+        reading = float(row.get('reading'))
+    except (TypeError, ValueError):
+        raise ValueError("reading must be a number")
+    if not math.isfinite(reading) or reading < 0:
+        raise ValueError("reading must be a non-negative number")
+    try:
+        recorded_at = parse_timestamp(row.get('recorded_at'), now)
+    except ValueError:
+        raise ValueError("recorded_at must be an ISO-8601 timestamp")
+    check_recorded_at(recorded_at, now)
+    return (uuid.uuid4(), vehicle_id, kind, reading, recorded_at, row.get('source') or 'telematics')
+
+async def _write(db: AsyncSession, records: list[tuple]) -> None:
+    conn = await db.connection()
+    raw = (await conn.get_raw_connection()).driver_connection
+    if hasattr(raw, 'copy_records_to_table'):
+        await raw.copy_records_to_table('meter_readings', records=records, columns=COPY_COLUMNS)
+    else:
+        await db.execute(insert(MeterReading), [dict(zip(COPY_COLUMNS, r)) for r in records])
+
+async def _roll_up_current(db: AsyncSession, records: list[tuple]) -> list[uuid.UUID]:
+    top: dict[uuid.UUID, list] = {}
+    for _, vehicle_id, kind, reading, _, _ in records:
+        cur = top.setdefault(vehicle_id, [None, None])
+        i = METER_TYPES.index(kind)
+        if cur[i] is None or reading > cur[i]:
+            cur[i] = reading
+    batch = func.unnest(bindparam('vehicle_ids', list(top), type_=ARRAY(UUID(as_uuid=True))),
+                        bindparam('odometer', [v[0] for v in top.values()], type_=ARRAY(Float)),
+                        bindparam('hours', [v[1] for v in top.values()], type_=ARRAY(Float))
+                        ).table_valued('vehicle_id', 'odometer', 'hours').render_derived(name='batch')
+    stmt = (update(Vehicle)
+            .where(Vehicle.id == batch.c.vehicle_id)
+            .values(current_meter=func.greatest(Vehicle.current_meter, cast(batch.c.odometer, Numeric(12,1))),
+                    current_hours=func.greatest(Vehicle.current_hours, cast(batch.c.hours, Numeric(12,1))))
+            .returning(Vehicle.id)
+            .execution_options(synchronize_session=False))
+    return list((await db.execute(stmt)).scalars())
+
+async def ingest_meters(db: AsyncSession, body: bytes, content_type: str) -> tuple[dict, list[uuid.UUID]]:
+    # Returns the response body and the ids of vehicles whose current meters moved.
+    now = datetime.now(timezone.utc)
+    rows, errors = parse_rows(body, content_type)
+    if len(rows) > MAX_ROWS:
+        raise ValueError(f"Batch too large: {len(rows)} rows (max {MAX_ROWS})")
+    good = []
+    for line, row in rows:
+        try:
+            good.append((line, validate_meter(row, now)))
+        except ValueError as e:
+            errors.append({"line": line, "error": str(e)})
+    ids = {r[1] for _, r in good}
+    known = set((await db.execute(select(Vehicle.id).where(Vehicle.id == any_(
+        bindparam('ids', list(ids), type_=ARRAY(UUID(as_uuid=True))))))).scalars()) if ids else set()
+    records = []
+    for line, r in good:
+        if r[1] in known:
+            records.append(r)
+        else:
+            errors.append({"line": line, "error": "Vehicle not found"})
+    updated = []
+    if records:
+        await _write(db, records)
+        updated = await _roll_up_current(db, records)
+    errors.sort(key=lambda e: e["line"])
+    return {"accepted": len(records), "rejected": len(errors), "vehicles_updated": len(updated), "errors": errors}, updated
@@ -0,0 +1,61 @@
+import uuid
+from collections import Counter
+from datetime import datetime, timezone
+from sqlalchemy import select, update, insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from .models import Inspection, Defect, WorkOrder
+from . import counters, events, wo_analytics
+
+# An inspection, its defects and the single work order raised for them are
+# written in one transaction: ids and timestamps are generated here so nothing
+# has to be read back, defects go in as one multi-row INSERT, and the dashboard
+# counters take one upsert. A crash can no longer leave a failed inspection
+# without its work order.
+
+SEVERITIES = ('minor', 'major')
+DEFECT_STATUS_FOR_WO = {'closed': 'resolved', 'canceled': 'open'}  # otherwise in_wo
+
+def wo_priority(severities) -> str:
+    return 'high' if 'major' in severities else 'normal'
+
+async def record_inspection(db: AsyncSession, vehicle_id: str, checklist_key: str, driver_id: str | None,
+                            failed_items: list[dict], now: datetime | None = None) -> dict:
+    # failed_items: [{"item", "severity", "note"}]; an empty list is a passed inspection.
+    now = now or datetime.now(timezone.utc)
+    inspection = {"id": uuid.uuid4(), "vehicle_id": vehicle_id, "driver_id": driver_id, "checklist_key": checklist_key,
+                  "result": 'fail' if failed_items else 'pass', "submitted_at": now}
+    await db.execute(insert(Inspection).values(inspection))
+    work_order, defects = None, []
+    if failed_items:
+        work_order = {"id": uuid.uuid4(), "vehicle_id": vehicle_id, "title": f"Repair from inspection {checklist_key}",
+                      "status": 'open', "priority": wo_priority(i["severity"] for i in failed_items),
+                      "opened_at": now}
+        defects = [{"id": uuid.uuid4(), "inspection_id": inspection["id"], "vehicle_id": vehicle_id,
+                    "description": f"{i['item']}: {i['note']}" if i.get("note") else f"Failed {i['item']}",
+                    "severity": i["severity"], "status": 'in_wo', "work_order_id": work_order["id"]}
+                   for i in failed_items]
+        await db.execute(insert(WorkOrder).values(work_order))
+        await db.execute(insert(Defect).values(defects))
+        deltas = {(counters.OPEN_DEFECTS, sev): n for sev, n in Counter(d["severity"] for d in defects).items()}
+        deltas[(counters.OPEN_WOS, work_order["priority"])] = 1
+        await counters.bump_many(db, deltas)
+        await wo_analytics.bump(db, wo_analytics.opened(work_order["priority"], now))
+        events.stage(db, 'work_order.created', work_order)
+    await events.commit(db)
+    return {**inspection, "defects": defects, "work_order": work_order}
+
+async def sync_wo_defects(db: AsyncSession, work_order_id, wo_status: str) -> None:
+    # A WO's defects follow its status: resolved when it closes, open again when
+    # it is canceled, in_wo while it is open; the open-defect counter moves with them.
+    target = DEFECT_STATUS_FOR_WO.get(wo_status, 'in_wo')
+    rows = (await db.execute(select(Defect.severity, Defect.status).where(
+        Defect.work_order_id == work_order_id, Defect.status != target).with_for_update())).all()
+    if not rows:
+        return
+    await db.execute(update(Defect).where(Defect.work_order_id == work_order_id, Defect.status != target)
+                     .values(status=target))
+    deltas = Counter()
+    for r in rows:
+        deltas[(counters.OPEN_DEFECTS, r.severity)] += (target in counters.OPEN_DEFECT) - (r.status in counters.OPEN_DEFECT)
+    await counters.bump_many(db, deltas)
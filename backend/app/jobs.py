@@ -0,0 +1,162 @@
+import logging
+import uuid
+from datetime import datetime, timedelta, timezone
+from sqlalchemy import select, update, func
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from .settings import settings
+from .models import Vehicle, Driver, JobRun, JobChunk
+from .pm import run_pm_scan
+from .forecast import refresh_rates
+from .alerts import raise_alerts, resolve_cleared
+from . import analytics, counters, events, wo_analytics
+
+log = logging.getLogger(__name__)
+
+# The nightly job is split into chunks recorded in job_chunks: one PM scan and
+# forecast rate refresh per vehicle-id range plus one license-expiry check. Each
+# chunk commits its alerts and its own "done" mark in the same transaction, so a
+# retried or resumed chunk never double-counts, and whichever chunk finishes
+# last finalizes the job. Functions take a session factory so the API (inline
+# runs) and the Celery worker (one event loop per task) can both drive them.
+
+NIGHTLY = 'nightly'
+CHUNK_PM = 'pm'
+CHUNK_LICENSE = 'license'
+
+def _job_uuid(job_id) -> uuid.UUID:
+    return job_id if isinstance(job_id, uuid.UUID) else uuid.UUID(str(job_id))
+
+async def check_license_expiry(db: AsyncSession, now: datetime) -> dict:
+    horizon = now + timedelta(days=settings.license_expiry_warn_days)
+    expiring = select(Driver.id).where(Driver.license_expires_on < horizon)
+    created = await raise_alerts(db, 'LICENSE_EXPIRING', 'driver', expiring, now)
+    resolved = await resolve_cleared(db, 'LICENSE_EXPIRING', 'driver', expiring, now)
+    return {"alerts_created": created, "alerts_resolved": resolved}
+
+async def create_job(Session: async_sessionmaker, kind: str = NIGHTLY) -> str:
+    async with Session() as db:
+        job = JobRun(kind=kind, status='queued', created_at=datetime.now(timezone.utc))
+        db.add(job); await db.commit()
+        return str(job.id)
+
+async def plan_nightly(Session: async_sessionmaker, job_id: str, chunk_size: int | None = None) -> list[int]:
+    job_id = _job_uuid(job_id)
+    size = chunk_size or settings.nightly_chunk_size
+    async with Session() as db:
+        numbered = select(Vehicle.id, (func.row_number().over(order_by=Vehicle.id) - 1).label('rn')).subquery()
+        starts = list((await db.execute(
+            select(numbered.c.id).where(numbered.c.rn % size == 0).order_by(numbered.c.id))).scalars())
+        bounds = [None] + starts[1:]
+        ranges = list(zip(bounds, bounds[1:] + [None]))
+        rows = [JobChunk(job_id=job_id, chunk_no=n, kind=CHUNK_PM, lo_id=lo, hi_id=hi)
+                for n, (lo, hi) in enumerate(ranges)]
+        rows.append(JobChunk(job_id=job_id, chunk_no=len(rows), kind=CHUNK_LICENSE))
+        db.add_all(rows)
+        await db.execute(update(JobRun).where(JobRun.id == job_id).values(
+            status='running', total_chunks=len(rows), started_at=datetime.now(timezone.utc)))
+        await db.commit()
+        return [r.chunk_no for r in rows]
+
+async def pending_chunks(Session: async_sessionmaker, job_id: str) -> list[int]:
+    # Chunks to re-dispatch when resuming: anything not done. Failed ones are
+    # taken back out of the job's failure count.
+    job_id = _job_uuid(job_id)
+    async with Session() as db:
+        failed = (await db.execute(
+            update(JobChunk).where(JobChunk.job_id == job_id, JobChunk.status == 'failed')
+            .values(status='pending', error=None).returning(JobChunk.chunk_no))).scalars().all()
+        await db.execute(update(JobRun).where(JobRun.id == job_id).values(
+            status='running', failed_chunks=JobRun.failed_chunks - len(failed), finished_at=None))
+        chunks = (await db.execute(select(JobChunk.chunk_no).where(
+            JobChunk.job_id == job_id, JobChunk.status != 'done').order_by(JobChunk.chunk_no))).scalars().all()
+        await db.commit()
+        return list(chunks)
+
+async def _finish_chunk(db: AsyncSession, job: JobRun, done: int, failed: int) -> None:
+    row = (await db.execute(
+        update(JobRun).where(JobRun.id == job.id)
+        .values(done_chunks=JobRun.done_chunks + done, failed_chunks=JobRun.failed_chunks + failed)
+        .returning(JobRun.done_chunks, JobRun.failed_chunks, JobRun.total_chunks))).one()
+    if row.done_chunks + row.failed_chunks < row.total_chunks:
+        return
+    # Last chunk in: roll up chunk stats and rebuild the dashboard counters, WO rollups and recent fuel totals.
+    chunk_stats = (await db.execute(select(JobChunk.stats).where(
+        JobChunk.job_id == job.id, JobChunk.status == 'done'))).scalars().all()
+    totals = {k: sum((s or {}).get(k, 0) for s in chunk_stats) for k in ('alerts_created', 'alerts_resolved')}
+    await counters.recount(db, job.created_at)
+    await wo_analytics.rebuild(db)
+    await analytics.refresh_daily(db, datetime.now(timezone.utc))
+    await db.execute(update(JobRun).where(JobRun.id == job.id).values(
+        status='failed' if row.failed_chunks else 'succeeded', stats=totals,
+        finished_at=datetime.now(timezone.utc)))
+    log.info("job %s finished: %s", job.id, totals)
+
+async def run_chunk(Session: async_sessionmaker, job_id: str, chunk_no: int) -> dict:
+    job_id = _job_uuid(job_id)
+    async with Session() as db:
+        chunk = await db.get(JobChunk, (job_id, chunk_no), with_for_update=True)
+        if chunk is None or chunk.status == 'done':
+            return chunk.stats if chunk else {}
+        chunk.status = 'running'
+        chunk.attempts += 1
+        chunk.updated_at = datetime.now(timezone.utc)
+        await db.commit()
+    async with Session() as db:
+        chunk = await db.get(JobChunk, (job_id, chunk_no), with_for_update=True)
+        if chunk.status == 'done':
+            return chunk.stats
+        job = await db.get(JobRun, job_id)
+        if chunk.kind == CHUNK_PM:
+            stats = await run_pm_scan(db, job.created_at, (chunk.lo_id, chunk.hi_id))
+            stats.update(await refresh_rates(db, job.created_at, (chunk.lo_id, chunk.hi_id)))
+        else:
+            stats = await check_license_expiry(db, job.created_at)
+        chunk.status = 'done'
+        chunk.stats = stats
+        chunk.updated_at = datetime.now(timezone.utc)
+        await _finish_chunk(db, job, done=1, failed=0)
+        await events.commit(db)
+        return stats
+
+async def fail_chunk(Session: async_sessionmaker, job_id: str, chunk_no: int, error: str) -> None:
+    job_id = _job_uuid(job_id)
+    async with Session() as db:
+        chunk = await db.get(JobChunk, (job_id, chunk_no), with_for_update=True)
+        if chunk is None or chunk.status in ('done', 'failed'):
+            return
+        chunk.status = 'failed'
+        chunk.error = error[:2000]
+        chunk.updated_at = datetime.now(timezone.utc)
+        await _finish_chunk(db, await db.get(JobRun, job_id), done=0, failed=1)
+        await db.commit()
+
+async def run_nightly_inline(Session: async_sessionmaker) -> str:
+    # Runs every chunk in-process; for development and for deployments without a worker.
+    job_id = await create_job(Session)
+    for n in await plan_nightly(Session, job_id):
+        try:
+            await run_chunk(Session, job_id, n)
+        except Exception as e:
+            log.exception("nightly chunk %s/%s failed", job_id, n)
+            await fail_chunk(Session, job_id, n, repr(e))
+    return job_id
+
+async def job_status(db: AsyncSession, job_id: str) -> dict | None:
+    try:
+        job_id = _job_uuid(job_id)
+    except ValueError:
+        return None
+    job = await db.get(JobRun, job_id)
+    if job is None:
+        return None
+    chunks = (await db.execute(select(JobChunk).where(JobChunk.job_id == job_id)
+                               .order_by(JobChunk.chunk_no))).scalars().all()
+    return {
+        "id": str(job.id), "kind": job.kind, "status": job.status,
+        "total_chunks": job.total_chunks, "done_chunks": job.done_chunks, "failed_chunks": job.failed_chunks,
+        "stats": job.stats, "created_at": job.created_at, "started_at": job.started_at,
+        "finished_at": job.finished_at,
+        "chunks": [{"chunk_no": c.chunk_no, "kind": c.kind, "status": c.status, "attempts": c.attempts,
+                    "stats": c.stats, "error": c.error} for c in chunks],
+    }
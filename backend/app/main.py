@@ -1,18 +1,40 @@
-from fastapi import FastAPI, HTTPException, Depends, Header
+from fastapi import FastAPI, HTTPException, Depends, Header, Query, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import StreamingResponse, JSONResponse
+from fastapi.encoders import jsonable_encoder
+from fastapi.concurrency import run_in_threadpool
 from pydantic import BaseModel
 from typing import Optional
-from sqlalchemy import select
+import asyncio
+import re
+from sqlalchemy import select, update, func, text
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.ext.asyncio import AsyncSession
-from jose import jwt, JWTError
-from datetime import datetime, timezone, timedelta
+from datetime import datetime, timedelta, timezone
 
 from .settings import settings
-from .db import SessionLocal, Base, engine
-from .models import (User, Driver, Vehicle, VehicleAssignment, MeterReading,
+from .db import SessionLocal, ReadSessionLocal, Base, engine, read_engine, pool_stats
+from .models import (User, Driver, Vehicle, MeterReading,
                      MaintenanceSchedule, WorkOrder, WorkOrderTask,
-                     Inspection, Defect, FuelLog, Alert)
-from .auth import hash_password, verify_password, create_token, ALGO
+                     FuelLog, Alert)
+from .auth import hash_password, verify_password, create_token, verify_token, password_pool, token_cache, Principal
+from .jobs import create_job, run_nightly_inline, job_status
+from .pagination import keyset_page, MAX_LIMIT, CURSOR_HEADER
+from . import counters, events
+from .ingest import ingest_meters, check_recorded_at
+from .importer import IMPORTERS, import_stream
+from .assignments import assign, unassign, invalidate as invalidate_assignments
+from .partitions import ensure_partitions, compact_meter_readings
+from .cache import cache
+from .analytics import vehicle_fuel_analytics, fleet_fuel_analytics, record_fill
+from . import wo_analytics
+from .metrics import MetricsMiddleware, instrument_engine, render as render_metrics
+from .inspections import record_inspection, sync_wo_defects, SEVERITIES
+from .schemas import (VehicleOut, DriverOut, AssignmentOut, MeterReadingOut, ScheduleOut, WorkOrderOut, TaskOut,
+                      InspectionResultOut, FuelLogOut, AlertOut, JobOut, RowsResponse, dumps)
+from .timeline import vehicle_timeline
+from .forecast import pm_forecast
+from .export import DATASETS, MEDIA_TYPES, ENCODERS, export_query, stream_export, gzipped
 
 app = FastAPI(title=settings.project_name)
 app.add_middleware(
@@ -21,16 +43,62 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=[CURSOR_HEADER],
 )
+app.add_middleware(MetricsMiddleware)
+instrument_engine(engine)
+if read_engine is not engine:
+    instrument_engine(read_engine)
 
 async def get_db():
     async with SessionLocal() as s:
         yield s
 
+async def get_read_db():
+    async with ReadSessionLocal() as s:
+        yield s
+
+# Cached reads: single rows by id, and list pages by their normalized query string.
+async def cached_row(db: AsyncSession, model, namespace: str, row_id: str) -> Optional[dict]:
+    async def load():
+        row = (await db.execute(select(model.__table__).where(model.id == row_id))).mappings().one_or_none()
+        return jsonable_encoder(dict(row)) if row else None
+    return await cache.read_through(namespace, str(row_id), load)
+
+# Pages are cached as their encoded JSON body, so a hit is served without serializing anything.
+async def cached_page(namespace: str, request: Request, response: Response, load) -> Response:
+    async def fill():
+        rows = await load()
+        return {"body": dumps(rows).decode(), "next": response.headers.get(CURSOR_HEADER)}
+    key = "&".join(f"{k}={v}" for k, v in sorted(request.query_params.multi_items()))
+    page = await cache.read_through(namespace, key, fill, versioned=True)
+    return Response(page["body"], media_type="application/json",
+                    headers={CURSOR_HEADER: page["next"]} if page["next"] else None)
+
+def rows_response(rows: list[dict], response: Response) -> RowsResponse:
+    # Returning a Response skips FastAPI's encoder; carry over the cursor header set on `response`.
+    cursor = response.headers.get(CURSOR_HEADER)
+    return RowsResponse(rows, headers={CURSOR_HEADER: cursor} if cursor else None)
+
+def row_dict(row) -> dict:
+    return {c.key: getattr(row, c.key) for c in row.__mapper__.column_attrs}
+
+# Schema is managed by Alembic (`alembic upgrade head` before rollout); AUTO_CREATE_SCHEMA is for
+# throwaway databases. Workers booting together serialize on an advisory lock so partition DDL cannot race.
+STARTUP_LOCK = 0x666d7301
+
 @app.on_event("startup")
 async def on_startup():
     async with engine.begin() as conn:
-        await conn.run_sync(Base.metadata.create_all)
+        await conn.execute(text("SELECT pg_advisory_xact_lock(:k)"), {"k": STARTUP_LOCK})
+        if settings.auto_create_schema:
+            await conn.execute(text("CREATE EXTENSION IF NOT EXISTS btree_gist"))
+            await conn.run_sync(Base.metadata.create_all)
+        await ensure_partitions(conn, datetime.now(timezone.utc))
+
+@app.on_event("shutdown")
+async def on_shutdown():
+    await events.hub.close()
 
 # Auth
 class SignupIn(BaseModel):
@@ -43,7 +111,7 @@ async def signup(data: SignupIn, db: AsyncSession = Depends(get_db)):
     exists = (await db.execute(select(User).where(User.email == data.email))).scalar_one_or_none()
     if exists:
         raise HTTPException(status_code=400, detail="Email already registered")
-    u = User(email=data.email, password_hash=hash_password(data.password), role=data.role)
+    u = User(email=data.email, password_hash=await hash_password(data.password), role=data.role)
     db.add(u); await db.commit()
     return {"ok": True}
 
@@ -54,22 +122,24 @@ class LoginIn(BaseModel):
 @app.post("/auth/login")
 async def login(data: LoginIn, db: AsyncSession = Depends(get_db)):
     user = (await db.execute(select(User).where(User.email == data.email))).scalar_one_or_none()
-    if not user or not verify_password(data.password, user.password_hash):
+    if not user:
+        raise HTTPException(status_code=401, detail="Invalid credentials")
+    ok, new_hash = await verify_password(data.password, user.password_hash)
+    if not ok:
         raise HTTPException(status_code=401, detail="Invalid credentials")
+    if new_hash:
+        user.password_hash = new_hash; await db.commit()
     return {"access_token": create_token(str(user.id), user.role), "token_type": "bearer"}
 
-async def require_user(authorization: Optional[str] = Header(default=None)) -> dict:
+async def require_user(request: Request, authorization: Optional[str] = Header(default=None)) -> Principal:
     if not authorization or not authorization.startswith("Bearer "):
         raise HTTPException(status_code=401, detail="Missing token")
-    token = authorization.split()[1]
-    try:
-        payload = jwt.decode(token, settings.api_jwt_secret, algorithms=[ALGO])
-        return payload
-    except JWTError:
-        raise HTTPException(status_code=401, detail="Invalid token")
+    principal = verify_token(authorization[7:].strip())
+    request.state.principal = principal
+    return principal
 
-def require_role(payload: dict, roles: list[str]):
-    if payload.get("role") not in roles:
+def require_role(principal: Principal, roles: list[str]):
+    if principal.role not in roles:
         raise HTTPException(status_code=403, detail="Forbidden")
 
 # Vehicles
@@ -81,21 +151,49 @@ class VehicleIn(BaseModel):
     year: Optional[int] = None
     class_: Optional[str] = None
     meter_type: Optional[str] = "odometer"
-
-@app.get("/vehicles")
-async def list_vehicles(db: AsyncSession = Depends(get_db), user=Depends(require_user)):
-    return (await db.execute(select(Vehicle))).scalars().all()
-
-@app.post("/vehicles")
+    tank_capacity_gal: Optional[float] = None
+
+@app.get("/vehicles", response_model=list[VehicleOut])
+async def list_vehicles(request: Request, response: Response, status: Optional[str] = None, make: Optional[str] = None,
+                        class_: Optional[str] = None, since: Optional[datetime] = None, until: Optional[datetime] = None,
+                        cursor: Optional[str] = None, limit: int = Query(100, ge=1, le=MAX_LIMIT), fields: Optional[str] = None,
+                        db: AsyncSession = Depends(get_read_db), user=Depends(require_user)):
+    where = []
+    if status: where.append(Vehicle.status == status)
+    if make: where.append(Vehicle.make == make)
+    if class_: where.append(Vehicle.class_ == class_)
+    if since: where.append(Vehicle.created_at >= since)
+    if until: where.append(Vehicle.created_at < until)
+    return await cached_page("vehicles", request, response, lambda: keyset_page(
+        db, response, Vehicle, where, [Vehicle.unit_no], cursor, limit, fields))
+
+@app.post("/vehicles", response_model=VehicleOut)
 async def create_vehicle(v: VehicleIn, db: AsyncSession = Depends(get_db), user=Depends(require_user)):
     require_role(user, ["admin","manager"])
     obj = Vehicle(**v.model_dump())
-    db.add(obj); await db.commit(); await db.refresh(obj)
+    db.add(obj)
+    try:
+        await db.flush()
+    except IntegrityError:
+        raise HTTPException(status_code=409, detail="A vehicle with this unit_no or VIN already exists")
+    await counters.bump(db, counters.VEHICLES, obj.status)
+    await db.commit(); await db.refresh(obj)
+    await cache.invalidate_namespace("vehicles")
     return obj
 
-@app.get("/vehicles/{veh_id}")
-async def get_vehicle(veh_id: str, db: AsyncSession = Depends(get_db), user=Depends(require_user)):
-    row = (await db.execute(select(Vehicle).where(Vehicle.id == veh_id))).scalar_one_or_none()
+@app.get("/vehicles/available", response_model=list[VehicleOut])
+async def available_vehicles(response: Response, class_: Optional[str] = None, cursor: Optional[str] = None,
+                             limit: int = Query(100, ge=1, le=MAX_LIMIT), fields: Optional[str] = None,
+                             db: AsyncSession = Depends(get_read_db), user=Depends(require_user)):
+    # In service with no current driver: a walk of the ix_vehicles_available partial index, whatever the history.
+    where = [Vehicle.status == 'in_service', Vehicle.current_driver_id.is_(None)]
+    if class_: where.append(Vehicle.class_ == class_)
+    return rows_response(await keyset_page(db, response, Vehicle, where, [Vehicle.unit_no], cursor, limit, fields),
+                         response)
+
+@app.get("/vehicles/{veh_id}", response_model=VehicleOut)
+async def get_vehicle(veh_id: str, db: AsyncSession = Depends(get_read_db), user=Depends(require_user)):
+    row = await cached_row(db, Vehicle, "vehicle", veh_id)
     if not row: raise HTTPException(status_code=404, detail="Not found")
     return row
 
@@ -106,21 +204,73 @@ class MeterIn(BaseModel):
     recorded_at: Optional[datetime] = None
     source: Optional[str] = "manual"
 
-@app.get("/vehicles/{veh_id}/meters")
-async def list_meters(veh_id: str, db: AsyncSession = Depends(get_db), user=Depends(require_user)):
-    return (await db.execute(select(MeterReading).where(MeterReading.vehicle_id == veh_id).order_by(MeterReading.recorded_at.desc()))).scalars().all()
-
-@app.post("/vehicles/{veh_id}/meters")
+@app.get("/vehicles/{veh_id}/meters", response_model=list[MeterReadingOut])
+async def list_meters(veh_id: str, response: Response, type: Optional[str] = None,
+                      since: Optional[datetime] = None, until: Optional[datetime] = None,
+                      cursor: Optional[str] = None, limit: int = Query(100, ge=1, le=MAX_LIMIT), fields: Optional[str] = None,
+                      db: AsyncSession = Depends(get_read_db), user=Depends(require_user)):
+    where = [MeterReading.vehicle_id == veh_id]
+    if type: where.append(MeterReading.type == type)
+    if since: where.append(MeterReading.recorded_at >= since)
+    if until: where.append(MeterReading.recorded_at < until)
+    return rows_response(await keyset_page(db, response, MeterReading, where, [MeterReading.recorded_at, MeterReading.id],
+                                           cursor, limit, fields, desc=True), response)
+
+@app.get("/vehicles/{veh_id}/timeline")
+async def get_timeline(veh_id: str, response: Response, kinds: Optional[str] = None, cursor: Optional[str] = None,
+                       limit: int = Query(100, ge=1, le=MAX_LIMIT),
+                       db: AsyncSession = Depends(get_read_db), user=Depends(require_user)):
+    # Meters, fuel, inspections, work orders and assignments newest first; ?kinds=fuel,work_order narrows it.
+    if not await cached_row(db, Vehicle, "vehicle", veh_id):
+        raise HTTPException(status_code=404, detail="Vehicle not found")
+    return rows_response(await vehicle_timeline(db, response, veh_id, kinds, cursor, limit), response)
+
+@app.post("/vehicles/{veh_id}/meters", response_model=MeterReadingOut)
 async def add_meter(veh_id: str, m: MeterIn, db: AsyncSession = Depends(get_db), user=Depends(require_user)):
-    v = (await db.execute(select(Vehicle).where(Vehicle.id == veh_id))).scalar_one_or_none()
-    if not v: raise HTTPException(status_code=404, detail="Vehicle not found")
-    mr = MeterReading(vehicle_id=veh_id, type=m.type, reading=m.reading, recorded_at=m.recorded_at, source=m.source)
+    if not await cached_row(db, Vehicle, "vehicle", veh_id):
+        raise HTTPException(status_code=404, detail="Vehicle not found")
+    now = datetime.now(timezone.utc)
+    recorded_at = m.recorded_at or now
+    try:
+        recorded_at = check_recorded_at(recorded_at if recorded_at.tzinfo else recorded_at.replace(tzinfo=timezone.utc), now)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    mr = MeterReading(vehicle_id=veh_id, type=m.type, reading=m.reading, recorded_at=recorded_at, source=m.source)
     db.add(mr)
-    if m.type == 'odometer' and (v.current_meter is None or m.reading >= float(v.current_meter)):
-        v.current_meter = m.reading
+    col = {'odometer': Vehicle.current_meter, 'hours': Vehicle.current_hours}.get(m.type)
+    if col is not None:
+        await db.execute(update(Vehicle).where(Vehicle.id == veh_id).values({col: func.greatest(col, m.reading)}))
     await db.commit(); await db.refresh(mr)
+    await cache.invalidate("vehicle", veh_id)
+    await cache.invalidate_namespace("vehicles")
     return mr
 
+@app.post("/meters/bulk")
+async def add_meters_bulk(request: Request, db: AsyncSession = Depends(get_db), user=Depends(require_user)):
+    # Body is NDJSON (one reading per line) or CSV with a header row:
+    # vehicle_id,type,reading,recorded_at,source
+    try:
+        result, touched = await ingest_meters(db, await request.body(), request.headers.get("content-type", ""))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    await db.commit()
+    for veh_id in touched:
+        await cache.invalidate("vehicle", str(veh_id))
+    if touched:
+        await cache.invalidate_namespace("vehicles")
+    return result
+
+@app.post("/import/{kind}")
+async def bulk_import(kind: str, request: Request, user=Depends(require_user)):
+    # kind is vehicles, drivers or assignments; the body is CSV with a header row or NDJSON.
+    require_role(user, ["admin","manager"])
+    if kind not in IMPORTERS:
+        raise HTTPException(status_code=404, detail=f"Unknown import: {kind}")
+    try:
+        return await import_stream(SessionLocal, kind, request.stream(), "csv" in request.headers.get("content-type", ""))
+    except UnicodeDecodeError:
+        raise HTTPException(status_code=400, detail="Body must be UTF-8")
+
 # Drivers & Assignments
 class DriverIn(BaseModel):
     full_name: str
@@ -130,28 +280,89 @@ class DriverIn(BaseModel):
     license_class: Optional[str] = None
     license_expires_on: Optional[datetime] = None
 
-@app.get("/drivers")
-async def list_drivers(db: AsyncSession = Depends(get_db), user=Depends(require_user)):
-    return (await db.execute(select(Driver))).scalars().all()
+@app.get("/drivers", response_model=list[DriverOut])
+async def list_drivers(request: Request, response: Response, license_class: Optional[str] = None,
+                       license_expires_before: Optional[datetime] = None,
+                       cursor: Optional[str] = None, limit: int = Query(100, ge=1, le=MAX_LIMIT), fields: Optional[str] = None,
+                       db: AsyncSession = Depends(get_read_db), user=Depends(require_user)):
+    where = []
+    if license_class: where.append(Driver.license_class == license_class)
+    if license_expires_before: where.append(Driver.license_expires_on < license_expires_before)
+    return await cached_page("drivers", request, response, lambda: keyset_page(
+        db, response, Driver, where, [Driver.full_name, Driver.id], cursor, limit, fields))
+
+@app.get("/drivers/available", response_model=list[DriverOut])
+async def available_drivers(response: Response, license_class: Optional[str] = None, cursor: Optional[str] = None,
+                            limit: int = Query(100, ge=1, le=MAX_LIMIT), fields: Optional[str] = None,
+                            db: AsyncSession = Depends(get_read_db), user=Depends(require_user)):
+    where = [Driver.current_vehicle_id.is_(None)]
+    if license_class: where.append(Driver.license_class == license_class)
+    return rows_response(await keyset_page(db, response, Driver, where, [Driver.full_name, Driver.id], cursor, limit,
+                                           fields), response)
+
+@app.get("/drivers/{driver_id}", response_model=DriverOut)
+async def get_driver(driver_id: str, db: AsyncSession = Depends(get_read_db), user=Depends(require_user)):
+    row = await cached_row(db, Driver, "driver", driver_id)
+    if not row: raise HTTPException(status_code=404, detail="Not found")
+    return row
 
-@app.post("/drivers")
+@app.post("/drivers", response_model=DriverOut)
 async def create_driver(d: DriverIn, db: AsyncSession = Depends(get_db), user=Depends(require_user)):
     require_role(user, ["admin","manager"])
     row = Driver(**d.model_dump())
-    db.add(row); await db.commit(); await db.refresh(row)
+    db.add(row)
+    try:
+        await db.commit()
+    except IntegrityError:
+        raise HTTPException(status_code=409, detail="A driver with this license_no already exists")
+    await db.refresh(row)
+    await cache.invalidate_namespace("drivers")
     return row
 
 class AssignIn(BaseModel):
     driver_id: str
     start_at: Optional[datetime] = None
 
-@app.post("/vehicles/{veh_id}/assign")
+class UnassignIn(BaseModel):
+    end_at: Optional[datetime] = None
+
+def assignment_time(at: Optional[datetime]) -> datetime:
+    now = datetime.now(timezone.utc)
+    if at is None:
+        return now
+    at = at if at.tzinfo else at.replace(tzinfo=timezone.utc)
+    if at > now:
+        raise HTTPException(status_code=400, detail="Assignments cannot start or end in the future")
+    return at
+
+@app.post("/vehicles/{veh_id}/assign", response_model=AssignmentOut)
 async def assign_driver(veh_id: str, data: AssignIn, db: AsyncSession = Depends(get_db), user=Depends(require_user)):
     require_role(user, ["admin","manager"])
-    v = (await db.execute(select(Vehicle).where(Vehicle.id == veh_id))).scalar_one_or_none()
-    if not v: raise HTTPException(status_code=404, detail="Vehicle not found")
-    a = VehicleAssignment(vehicle_id=veh_id, driver_id=data.driver_id, start_at=data.start_at or datetime.now(timezone.utc))
-    db.add(a); await db.commit(); await db.refresh(a)
+    if not await cached_row(db, Vehicle, "vehicle", veh_id):
+        raise HTTPException(status_code=404, detail="Vehicle not found")
+    if not await cached_row(db, Driver, "driver", data.driver_id):
+        raise HTTPException(status_code=404, detail="Driver not found")
+    # Ends the vehicle's and the driver's current assignments at start_at.
+    try:
+        a, stale = await assign(db, veh_id, data.driver_id, assignment_time(data.start_at))
+        await db.commit()
+    except IntegrityError:
+        raise HTTPException(status_code=409, detail="Overlaps a later assignment of this vehicle or driver")
+    await db.refresh(a)
+    await invalidate_assignments(stale)
+    return a
+
+@app.post("/vehicles/{veh_id}/unassign", response_model=AssignmentOut)
+async def unassign_driver(veh_id: str, data: UnassignIn, db: AsyncSession = Depends(get_db), user=Depends(require_user)):
+    require_role(user, ["admin","manager"])
+    try:
+        a, stale = await unassign(db, veh_id, assignment_time(data.end_at))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if a is None:
+        raise HTTPException(status_code=404, detail="Vehicle has no current assignment")
+    await db.commit(); await db.refresh(a)
+    await invalidate_assignments(stale)
     return a
 
 # Maintenance & WOs
@@ -159,17 +370,23 @@ class ScheduleIn(BaseModel):
     rule_type: str
     interval_value: int
 
-@app.get("/vehicles/{veh_id}/schedules")
-async def list_schedules(veh_id: str, db: AsyncSession = Depends(get_db), user=Depends(require_user)):
+@app.get("/vehicles/{veh_id}/schedules", response_model=list[ScheduleOut])
+async def list_schedules(veh_id: str, db: AsyncSession = Depends(get_read_db), user=Depends(require_user)):
     return (await db.execute(select(MaintenanceSchedule).where(MaintenanceSchedule.vehicle_id == veh_id))).scalars().all()
 
-@app.post("/vehicles/{veh_id}/schedules")
+@app.post("/vehicles/{veh_id}/schedules", response_model=ScheduleOut)
 async def create_schedule(veh_id: str, s: ScheduleIn, db: AsyncSession = Depends(get_db), user=Depends(require_user)):
     require_role(user, ["admin","manager"])
     sc = MaintenanceSchedule(vehicle_id=veh_id, rule_type=s.rule_type, interval_value=s.interval_value)
     db.add(sc); await db.commit(); await db.refresh(sc)
     return sc
 
+@app.get("/maintenance/forecast")
+async def maintenance_forecast(days: int = Query(30, ge=1, le=365), db: AsyncSession = Depends(get_read_db),
+                               user=Depends(require_user)):
+    # Projected due dates for every schedule due within `days`; rates are refreshed by the nightly job.
+    return RowsResponse(await pm_forecast(db, days))
+
 class WorkOrderIn(BaseModel):
     vehicle_id: str
     title: str
@@ -179,37 +396,90 @@ class WorkOrderIn(BaseModel):
 class WorkOrderPatch(BaseModel):
     status: Optional[str] = None
 
-@app.get("/work-orders")
-async def list_work_orders(db: AsyncSession = Depends(get_db), user=Depends(require_user)):
-    return (await db.execute(select(WorkOrder))).scalars().all()
-
-@app.post("/work-orders")
+@app.get("/work-orders", response_model=list[WorkOrderOut])
+async def list_work_orders(response: Response, status: Optional[str] = None, priority: Optional[str] = None,
+                           vehicle_id: Optional[str] = None, since: Optional[datetime] = None, until: Optional[datetime] = None,
+                           due_before: Optional[datetime] = None,
+                           cursor: Optional[str] = None, limit: int = Query(100, ge=1, le=MAX_LIMIT), fields: Optional[str] = None,
+                           db: AsyncSession = Depends(get_read_db), user=Depends(require_user)):
+    where = []
+    if status: where.append(WorkOrder.status == status)
+    if priority: where.append(WorkOrder.priority == priority)
+    if vehicle_id: where.append(WorkOrder.vehicle_id == vehicle_id)
+    if since: where.append(WorkOrder.opened_at >= since)
+    if until: where.append(WorkOrder.opened_at < until)
+    if due_before: where.append(WorkOrder.due_at < due_before)
+    return rows_response(await keyset_page(db, response, WorkOrder, where, [WorkOrder.opened_at, WorkOrder.id],
+                                           cursor, limit, fields, desc=True), response)
+
+@app.post("/work-orders", response_model=WorkOrderOut)
 async def create_work_order(data: WorkOrderIn, db: AsyncSession = Depends(get_db), user=Depends(require_user)):
-    wo = WorkOrder(vehicle_id=data.vehicle_id, title=data.title, priority=data.priority, due_at=data.due_at)
-    db.add(wo); await db.commit(); await db.refresh(wo)
+    wo = WorkOrder(vehicle_id=data.vehicle_id, title=data.title, priority=data.priority, due_at=data.due_at,
+                   opened_at=datetime.now(timezone.utc))
+    db.add(wo); await db.flush()
+    await counters.bump(db, counters.OPEN_WOS, wo.priority)
+    await counters.bump_overdue(db, wo.priority, wo.due_at, 1)
+    await wo_analytics.bump(db, wo_analytics.opened(wo.priority, wo.opened_at))
+    events.stage(db, 'work_order.created', row_dict(wo))
+    await events.commit(db); await db.refresh(wo)
     return wo
 
-@app.patch("/work-orders/{wo_id}")
+@app.patch("/work-orders/{wo_id}", response_model=WorkOrderOut)
 async def update_work_order_status(wo_id: str, patch: WorkOrderPatch, db: AsyncSession = Depends(get_db), user=Depends(require_user)):
-    row = (await db.execute(select(WorkOrder).where(WorkOrder.id == wo_id))).scalar_one_or_none()
+    row = (await db.execute(select(WorkOrder).where(WorkOrder.id == wo_id).with_for_update())).scalar_one_or_none()
     if not row: raise HTTPException(status_code=404, detail="Not found")
-    if patch.status:
+    if patch.status and patch.status != row.status:
+        was_open = counters.wo_is_open(row.status)
+        # Take back the old resolution and record the new one; closed_at is when it left the backlog.
+        undo = wo_analytics.resolved(row, -1)
         row.status = patch.status
-        if patch.status == 'closed':
+        if counters.wo_is_open(row.status):
+            row.closed_at = None
+        elif was_open:
             row.closed_at = datetime.now(timezone.utc)
-    await db.commit(); await db.refresh(row)
+        opened = counters.wo_is_open(row.status) - was_open
+        await counters.bump(db, counters.OPEN_WOS, row.priority, opened)
+        await counters.bump_overdue(db, row.priority, row.due_at, opened)
+        await sync_wo_defects(db, row.id, row.status)
+        await wo_analytics.bump(db, wo_analytics.merge(undo, wo_analytics.resolved(row)))
+        events.stage(db, 'work_order.updated', row_dict(row))
+    await events.commit(db); await db.refresh(row)
     return row
 
 class TaskIn(BaseModel):
     title: str
     est_hours: Optional[float] = None
 
-@app.post("/work-orders/{wo_id}/tasks")
+class TaskPatch(BaseModel):
+    status: Optional[str] = None
+    actual_hours: Optional[float] = None
+
+@app.post("/work-orders/{wo_id}/tasks", response_model=TaskOut)
 async def add_task(wo_id: str, t: TaskIn, db: AsyncSession = Depends(get_db), user=Depends(require_user)):
-    row = (await db.execute(select(WorkOrder).where(WorkOrder.id == wo_id))).scalar_one_or_none()
+    row = (await db.execute(select(WorkOrder).where(WorkOrder.id == wo_id).with_for_update())).scalar_one_or_none()
     if not row: raise HTTPException(status_code=404, detail="WO not found")
     task = WorkOrderTask(work_order_id=wo_id, title=t.title, est_hours=t.est_hours)
-    db.add(task); await db.commit(); await db.refresh(task)
+    db.add(task)
+    await wo_analytics.add_labor(db, row, est=t.est_hours or 0)
+    await db.commit(); await db.refresh(task)
+    return task
+
+@app.patch("/work-orders/{wo_id}/tasks/{task_id}", response_model=TaskOut)
+async def update_task(wo_id: str, task_id: str, patch: TaskPatch, db: AsyncSession = Depends(get_db),
+                      user=Depends(require_user)):
+    if patch.actual_hours is not None and patch.actual_hours < 0:
+        raise HTTPException(status_code=400, detail="actual_hours must not be negative")
+    row = (await db.execute(select(WorkOrder).where(WorkOrder.id == wo_id).with_for_update())).scalar_one_or_none()
+    if not row: raise HTTPException(status_code=404, detail="WO not found")
+    task = (await db.execute(select(WorkOrderTask).where(
+        WorkOrderTask.id == task_id, WorkOrderTask.work_order_id == wo_id))).scalar_one_or_none()
+    if not task: raise HTTPException(status_code=404, detail="Task not found")
+    if patch.status:
+        task.status = patch.status
+    if patch.actual_hours is not None:
+        await wo_analytics.add_labor(db, row, actual=patch.actual_hours - float(task.actual_hours or 0))
+        task.actual_hours = patch.actual_hours
+    await db.commit(); await db.refresh(task)
     return task
 
 # Inspections & Defects
@@ -218,19 +488,35 @@ class InspectionIn(BaseModel):
     result: str
     driver_id: Optional[str] = None
 
-@app.post("/vehicles/{veh_id}/inspections")
+class ChecklistItemIn(BaseModel):
+    item: str
+    result: str
+    severity: str = 'minor'
+    note: Optional[str] = None
+
+class ChecklistIn(BaseModel):
+    checklist_key: str
+    driver_id: Optional[str] = None
+    items: list[ChecklistItemIn]
+
+@app.post("/vehicles/{veh_id}/inspections", response_model=InspectionResultOut)
 async def submit_inspection(veh_id: str, data: InspectionIn, db: AsyncSession = Depends(get_db), user=Depends(require_user)):
-    v = (await db.execute(select(Vehicle).where(Vehicle.id == veh_id))).scalar_one_or_none()
-    if not v: raise HTTPException(status_code=404, detail="Vehicle not found")
-    ins = Inspection(vehicle_id=veh_id, driver_id=data.driver_id, checklist_key=data.checklist_key, result=data.result)
-    db.add(ins); await db.commit(); await db.refresh(ins)
-    if data.result == 'fail':
-        defect = Defect(inspection_id=ins.id, vehicle_id=veh_id, description=f"Failed {data.checklist_key}", severity='major')
-        db.add(defect)
-        wo = WorkOrder(vehicle_id=veh_id, title=f"Repair from inspection {data.checklist_key}", priority='high')
-        db.add(wo)
-        await db.commit()
-    return ins
+    if data.result not in ('pass', 'fail'): raise HTTPException(status_code=400, detail="result must be pass or fail")
+    if not await cached_row(db, Vehicle, "vehicle", veh_id):
+        raise HTTPException(status_code=404, detail="Vehicle not found")
+    failed = [{"item": data.checklist_key, "severity": 'major'}] if data.result == 'fail' else []
+    return await record_inspection(db, veh_id, data.checklist_key, data.driver_id, failed)
+
+@app.post("/vehicles/{veh_id}/inspections/checklist", response_model=InspectionResultOut)
+async def submit_checklist(veh_id: str, data: ChecklistIn, db: AsyncSession = Depends(get_db), user=Depends(require_user)):
+    if not data.items: raise HTTPException(status_code=400, detail="items must not be empty")
+    for i in data.items:
+        if i.result not in ('pass', 'fail'): raise HTTPException(status_code=400, detail=f"{i.item}: result must be pass or fail")
+        if i.severity not in SEVERITIES: raise HTTPException(status_code=400, detail=f"{i.item}: severity must be minor or major")
+    if not await cached_row(db, Vehicle, "vehicle", veh_id):
+        raise HTTPException(status_code=404, detail="Vehicle not found")
+    failed = [i.model_dump() for i in data.items if i.result == 'fail']
+    return await record_inspection(db, veh_id, data.checklist_key, data.driver_id, failed)
 
 # Fuel
 class FuelIn(BaseModel):
@@ -241,32 +527,159 @@ class FuelIn(BaseModel):
     odometer: Optional[float] = None
     vendor: Optional[str] = None
 
-@app.post("/vehicles/{veh_id}/fuel")
+@app.post("/vehicles/{veh_id}/fuel", response_model=FuelLogOut)
 async def add_fuel(veh_id: str, data: FuelIn, db: AsyncSession = Depends(get_db), user=Depends(require_user)):
-    v = (await db.execute(select(Vehicle).where(Vehicle.id == veh_id))).scalar_one_or_none()
-    if not v: raise HTTPException(status_code=404, detail="Vehicle not found")
+    veh = await cached_row(db, Vehicle, "vehicle", veh_id)
+    if not veh:
+        raise HTTPException(status_code=404, detail="Vehicle not found")
     row = FuelLog(vehicle_id=veh_id, driver_id=data.driver_id, qty_gal=data.qty_gal, price_per_gal=data.price_per_gal,
-                  total_cost=data.total_cost, odometer=data.odometer, vendor=data.vendor)
+                  total_cost=data.total_cost, odometer=data.odometer, vendor=data.vendor,
+                  transacted_at=datetime.now(timezone.utc))
+    await record_fill(db, row, veh.get("tank_capacity_gal"))
     db.add(row); await db.commit(); await db.refresh(row)
     return row
 
+def analytics_range(since: Optional[datetime], until: Optional[datetime]) -> tuple[datetime, datetime]:
+    until = until or datetime.now(timezone.utc)
+    since = since or until - timedelta(days=90)
+    if since >= until:
+        raise HTTPException(status_code=400, detail="since must be before until")
+    return since, until
+
+@app.get("/vehicles/{veh_id}/fuel/analytics")
+async def vehicle_fuel(veh_id: str, since: Optional[datetime] = None, until: Optional[datetime] = None,
+                       db: AsyncSession = Depends(get_read_db), user=Depends(require_user)):
+    if not await cached_row(db, Vehicle, "vehicle", veh_id):
+        raise HTTPException(status_code=404, detail="Vehicle not found")
+    return await vehicle_fuel_analytics(db, veh_id, *analytics_range(since, until))
+
+@app.get("/analytics/fuel")
+async def fleet_fuel(response: Response, since: Optional[datetime] = None, until: Optional[datetime] = None,
+                     cursor: Optional[str] = None, limit: int = Query(100, ge=1, le=MAX_LIMIT),
+                     db: AsyncSession = Depends(get_read_db), user=Depends(require_user)):
+    return await fleet_fuel_analytics(db, response, *analytics_range(since, until), limit, cursor)
+
+@app.get("/analytics/work-orders")
+async def fleet_work_orders(since: Optional[datetime] = None, until: Optional[datetime] = None,
+                            limit: int = Query(50, ge=1, le=MAX_LIMIT),
+                            db: AsyncSession = Depends(get_read_db), user=Depends(require_user)):
+    # Backlog aging, daily throughput and backlog size, MTTR and late closures by priority, labor estimates vs.
+    # actuals, and the `limit` vehicles with the most downtime in the range.
+    return RowsResponse(await wo_analytics.work_order_analytics(db, *analytics_range(since, until), limit))
+
 # Alerts & Nightly
-@app.get("/alerts")
-async def list_alerts(db: AsyncSession = Depends(get_db), user=Depends(require_user)):
-    return (await db.execute(select(Alert))).scalars().all()
+@app.get("/alerts", response_model=list[AlertOut])
+async def list_alerts(response: Response, status: Optional[str] = None, key: Optional[str] = None,
+                      entity_type: Optional[str] = None, entity_id: Optional[str] = None,
+                      since: Optional[datetime] = None, until: Optional[datetime] = None,
+                      cursor: Optional[str] = None, limit: int = Query(100, ge=1, le=MAX_LIMIT), fields: Optional[str] = None,
+                      db: AsyncSession = Depends(get_read_db), user=Depends(require_user)):
+    where = []
+    if status: where.append(Alert.status == status)
+    if key: where.append(Alert.key == key)
+    if entity_type: where.append(Alert.entity_type == entity_type)
+    if entity_id: where.append(Alert.entity_id == entity_id)
+    if since: where.append(Alert.triggered_at >= since)
+    if until: where.append(Alert.triggered_at < until)
+    return rows_response(await keyset_page(db, response, Alert, where, [Alert.triggered_at, Alert.id],
+                                           cursor, limit, fields, desc=True), response)
 
 @app.post("/internal/run-nightly")
-async def run_nightly(db: AsyncSession = Depends(get_db), user=Depends(require_user)):
+async def run_nightly(inline: bool = False, db: AsyncSession = Depends(get_db), user=Depends(require_user)):
+    # Queues the chunked nightly job on the Celery worker; ?inline=true runs it here instead.
+    if inline:
+        return await job_status(db, await run_nightly_inline(SessionLocal))
+    from .worker import start_nightly
+    job_id = await create_job(SessionLocal)
+    await run_in_threadpool(start_nightly.delay, job_id)
+    return {"job_id": job_id, "status": "queued"}
+
+@app.get("/jobs/{job_id}", response_model=JobOut)
+async def get_job(job_id: str, db: AsyncSession = Depends(get_db), user=Depends(require_user)):
+    job = await job_status(db, job_id)
+    if not job: raise HTTPException(status_code=404, detail="Not found")
+    return job
+
+@app.post("/jobs/{job_id}/resume")
+async def resume_job(job_id: str, db: AsyncSession = Depends(get_db), user=Depends(require_user)):
+    require_role(user, ["admin","manager"])
+    if not await job_status(db, job_id): raise HTTPException(status_code=404, detail="Not found")
+    from .worker import resume_job as resume_task
+    await run_in_threadpool(resume_task.delay, job_id)
+    return {"job_id": job_id, "status": "resuming"}
+
+@app.post("/internal/maintain-partitions")
+async def maintain_partitions(db: AsyncSession = Depends(get_db), user=Depends(require_user)):
+    require_role(user, ["admin"])
     now = datetime.now(timezone.utc)
-    vehicles = (await db.execute(select(Vehicle))).scalars().all()
-    for v in vehicles:
-        schedules = (await db.execute(select(MaintenanceSchedule).where(MaintenanceSchedule.vehicle_id == v.id))).scalars().all()
-        for sc in schedules:
-            if sc.rule_type == 'mileage' and v.current_meter and sc.last_meter is not None:
-                if float(v.current_meter) - float(sc.last_meter) >= sc.interval_value:
-                    db.add(Alert(key='PM_DUE', entity_type='vehicle', entity_id=v.id))
-            if sc.rule_type == 'date' and sc.last_completed_at:
-                if (now - sc.last_completed_at) >= timedelta(days=sc.interval_value):
-                    db.add(Alert(key='PM_DUE', entity_type='vehicle', entity_id=v.id))
+    created = await ensure_partitions(db, now)
+    compacted = await compact_meter_readings(db, now)
     await db.commit()
-    return {"ok": True}
+    return {"ok": True, "partitions_created": created, **compacted}
+
+@app.get("/internal/stats")
+async def internal_stats(user=Depends(require_user)):
+    require_role(user, ["admin"])
+    return {"cache": cache.stats(), "auth": {**password_pool.stats(), "token_cache": token_cache.stats()},
+            "db_pool": pool_stats(), "events": events.hub.stats()}
+
+# Liveness only says the process is serving; readiness also needs its backing services.
+@app.get("/healthz", include_in_schema=False)
+async def healthz():
+    return {"status": "ok"}
+
+async def _ping_db(e):
+    async with e.connect() as conn:
+        await conn.execute(text("SELECT 1"))
+
+@app.get("/readyz", include_in_schema=False)
+async def readyz():
+    checks = {"db": _ping_db(engine)}
+    if read_engine is not engine:
+        checks["db_replica"] = _ping_db(read_engine)
+    if settings.cache_backend == "redis":
+        checks["redis"] = cache.backend.client.ping()
+    results = await asyncio.gather(*(asyncio.wait_for(c, settings.readiness_timeout_s) for c in checks.values()),
+                                   return_exceptions=True)
+    status = {name: "ok" if not isinstance(r, BaseException) else f"error: {type(r).__name__}"
+              for name, r in zip(checks, results)}
+    ready = all(v == "ok" for v in status.values())
+    return JSONResponse({"status": "ok" if ready else "unavailable", "checks": status}, status_code=200 if ready else 503)
+
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    body, content_type = render_metrics()
+    return Response(body, media_type=content_type)
+
+# Change feed (SSE). EventSource cannot set headers, so the token may also come as ?access_token=.
+EVENT_ID = re.compile(r"^\d+-\d+$")
+
+@app.get("/events")
+async def event_stream(request: Request, types: Optional[str] = None, after: Optional[str] = None, access_token: Optional[str] = None,
+                       last_event_id: Optional[str] = Header(default=None), authorization: Optional[str] = Header(default=None)):
+    # Streams alert.* and work_order.* changes; ?types=alert,work_order filters. Resumes after
+    # Last-Event-ID (sent by the browser on reconnect) or ?after=; the stream ends when the token expires.
+    principal = await require_user(request, f"Bearer {access_token}" if access_token else authorization)
+    last_id = last_event_id or after
+    if last_id and not EVENT_ID.match(last_id):
+        raise HTTPException(status_code=400, detail="Invalid event id")
+    kinds = set(types.split(",")) if types else None
+    return StreamingResponse(events.sse(kinds, last_id, principal.exp), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+# Dashboard
+@app.get("/dashboard/summary")
+async def dashboard_summary(db: AsyncSession = Depends(get_db), user=Depends(require_user)):
+    return await counters.summary(db)
+
+# Export
+@app.get("/export/{dataset}")
+async def export(dataset: str, format: str = "csv", since: Optional[datetime] = None, until: Optional[datetime] = None,
+                 vehicle_id: Optional[str] = None, gzip: bool = False, user=Depends(require_user)):
+    if dataset not in DATASETS: raise HTTPException(status_code=404, detail="Unknown dataset")
+    if format not in ENCODERS: raise HTTPException(status_code=400, detail="format must be csv, ndjson or parquet")
+    body = stream_export(export_query(dataset, since, until, vehicle_id), ENCODERS[format](DATASETS[dataset][0].__table__))
+    filename = f"{dataset}.{format}" + (".gz" if gzip else "")
+    return StreamingResponse(gzipped(body) if gzip else body,
+                             media_type="application/gzip" if gzip else MEDIA_TYPES[format],
+                             headers={"Content-Disposition": f'attachment; filename="{filename}"'})
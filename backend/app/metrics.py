@@ -0,0 +1,103 @@
+import logging
+import os
+import time
+from contextvars import ContextVar
+from prometheus_client import Counter, Histogram, CONTENT_TYPE_LATEST, generate_latest
+from sqlalchemy import event
+
+from .settings import settings
+
+log = logging.getLogger(__name__)
+
+# Per-request instrumentation. MetricsMiddleware opens a RequestStats for each
+# HTTP request in a context variable; the cursor hooks on every engine add each
+# statement's count, time and rows to it (SQLAlchemy runs the driver in a
+# greenlet that shares the request's context). When the request finishes the
+# totals go into per-route Prometheus histograms, labelled by route template so
+# /vehicles/{veh_id} is one series. Requests issuing more than QUERY_COUNT_WARN
+# statements are logged, which is how N+1 loops show up. Under gunicorn each
+# worker writes its samples to PROMETHEUS_MULTIPROC_DIR and /metrics merges them.
+
+REQUEST_SECONDS = Histogram("http_request_duration_seconds", "Request latency", ["method", "route", "status"])
+REQUEST_QUERIES = Histogram("http_request_db_queries", "SQL statements per request", ["method", "route"],
+                            buckets=(0, 1, 2, 3, 5, 10, 20, 50, 100, 250, 1000))
+REQUEST_DB_SECONDS = Histogram("http_request_db_seconds", "Time in SQL per request", ["method", "route"])
+REQUEST_DB_ROWS = Histogram("http_request_db_rows", "Rows returned by SQL per request", ["method", "route"],
+                            buckets=(0, 1, 10, 100, 1000, 10000, 100000))
+SLOW_QUERIES = Counter("db_slow_queries_total", "Statements slower than SLOW_QUERY_MS", ["route"])
+
+class RequestStats:
+    __slots__ = ("scope", "queries", "db_seconds", "rows")
+
+    def __init__(self, scope):
+        self.scope = scope
+        self.queries = 0
+        self.db_seconds = 0.0
+        self.rows = 0
+
+    @property
+    def route(self) -> str:
+        # Set on the scope by the router once the request has been matched.
+        route = self.scope.get("route")
+        return route.path if route is not None else "unmatched"
+
+current: ContextVar[RequestStats | None] = ContextVar("request_stats", default=None)
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - conn.info["query_start"].pop()
+    stats = current.get()
+    if stats is None:
+        return
+    stats.queries += 1
+    stats.db_seconds += elapsed
+    if cursor.description is not None and cursor.rowcount > 0:
+        stats.rows += cursor.rowcount
+    if settings.slow_query_ms and elapsed * 1000 >= settings.slow_query_ms:
+        SLOW_QUERIES.labels(stats.route).inc()
+        log.warning("slow query %.0fms on %s: %s", elapsed * 1000, stats.route, " ".join(statement.split())[:500])
+
+def instrument_engine(engine) -> None:
+    event.listen(engine.sync_engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(engine.sync_engine, "after_cursor_execute", _after_cursor_execute)
+
+class MetricsMiddleware:
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        stats = RequestStats(scope)
+        token = current.set(stats)
+        status = 500
+
+        async def send_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        t0 = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_status)
+        finally:
+            current.reset(token)
+            method, route = scope["method"], stats.route
+            REQUEST_SECONDS.labels(method, route, str(status)).observe(time.perf_counter() - t0)
+            REQUEST_QUERIES.labels(method, route).observe(stats.queries)
+            REQUEST_DB_SECONDS.labels(method, route).observe(stats.db_seconds)
+            REQUEST_DB_ROWS.labels(method, route).observe(stats.rows)
+            if settings.query_count_warn and stats.queries > settings.query_count_warn:
+                log.warning("%s %s issued %d SQL statements (%.0fms in SQL)",
+                            method, route, stats.queries, stats.db_seconds * 1000)
+
+def render() -> tuple[bytes, str]:
+    if os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+        from prometheus_client import CollectorRegistry, multiprocess
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return generate_latest(registry), CONTENT_TYPE_LATEST
+    return generate_latest(), CONTENT_TYPE_LATEST
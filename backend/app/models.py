@@ -1,5 +1,5 @@
-from sqlalchemy import Column, String, DateTime, Text, Integer, ForeignKey, Numeric
-from sqlalchemy.dialects.postgresql import UUID
+from sqlalchemy import Column, String, DateTime, Date, Text, Integer, BigInteger, Float, ForeignKey, Numeric, Index, text
+from sqlalchemy.dialects.postgresql import UUID, JSONB, ExcludeConstraint
 from sqlalchemy.sql import func
 import uuid
 from .db import Base
@@ -21,7 +21,15 @@ class Driver(Base):
     license_no = Column(String(64))
     license_class = Column(String(32))
     license_expires_on = Column(DateTime(timezone=True))
+    # Denormalized from the driver's open assignment; see app/assignments.py.
+    current_vehicle_id = Column(UUID(as_uuid=True), ForeignKey('vehicles.id', ondelete='SET NULL', use_alter=True,
+                                                                     name='drivers_current_vehicle_id_fkey'))
     created_at = Column(DateTime(timezone=True), server_default=func.now())
+    __table_args__ = (
+        Index('ix_drivers_full_name_id', 'full_name', 'id'),
+        Index('ix_drivers_available', 'full_name', 'id', postgresql_where=text('current_vehicle_id IS NULL')),
+        Index('ux_drivers_license_no', 'license_no', unique=True, postgresql_where=text('license_no IS NOT NULL')),
+    )
 
 class Vehicle(Base):
     __tablename__ = "vehicles"
@@ -35,9 +43,18 @@ class Vehicle(Base):
     status = Column(String(32), default="in_service")
     meter_type = Column(String(16), default="odometer")
     current_meter = Column(Numeric(12,1), default=0)
+    current_hours = Column(Numeric(12,1))
+    tank_capacity_gal = Column(Numeric(8,3))
     in_service_on = Column(DateTime(timezone=True))
     out_service_on = Column(DateTime(timezone=True))
+    current_driver_id = Column(UUID(as_uuid=True), ForeignKey('drivers.id', ondelete='SET NULL'), index=True)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
+    __table_args__ = (
+        Index('ix_vehicles_status_unit_no', 'status', 'unit_no'),
+        Index('ix_vehicles_available', 'unit_no',
+              postgresql_where=text("current_driver_id IS NULL AND status = 'in_service'")),
+        Index('ux_vehicles_vin', 'vin', unique=True, postgresql_where=text('vin IS NOT NULL')),
+    )
 
 class VehicleAssignment(Base):
     __tablename__ = "vehicle_assignments"
@@ -45,7 +62,19 @@ class VehicleAssignment(Base):
     vehicle_id = Column(UUID(as_uuid=True), ForeignKey('vehicles.id', ondelete='CASCADE'))
     driver_id = Column(UUID(as_uuid=True), ForeignKey('drivers.id', ondelete='SET NULL'))
     start_at = Column(DateTime(timezone=True), server_default=func.now())
-    end_at = Column(DateTime(timezone=True))
+    end_at = Column(DateTime(timezone=True))  # NULL while the assignment is current
+    __table_args__ = (
+        Index('ix_vehicle_assignments_vehicle_start_at', 'vehicle_id', 'start_at', 'id'),
+        Index('ix_vehicle_assignments_driver_start_at', 'driver_id', 'start_at'),
+        Index('ux_vehicle_assignments_vehicle_driver_start', 'vehicle_id', 'driver_id', 'start_at', unique=True),
+        Index('ux_vehicle_assignments_open_vehicle', 'vehicle_id', unique=True, postgresql_where=text('end_at IS NULL')),
+        Index('ux_vehicle_assignments_open_driver', 'driver_id', unique=True, postgresql_where=text('end_at IS NULL')),
+        # No vehicle or driver is in two assignments at once (needs btree_gist).
+        ExcludeConstraint(('vehicle_id', '='), (text('tstzrange(start_at, end_at)'), '&&'),
+                          name='ex_vehicle_assignments_vehicle_overlap', using='gist'),
+        ExcludeConstraint(('driver_id', '='), (text('tstzrange(start_at, end_at)'), '&&'),
+                          name='ex_vehicle_assignments_driver_overlap', using='gist'),
+    )
 
 class MeterReading(Base):
     __tablename__ = "meter_readings"
@@ -53,13 +82,44 @@ class MeterReading(Base):
     vehicle_id = Column(UUID(as_uuid=True), ForeignKey('vehicles.id', ondelete='CASCADE'))
     type = Column(String(16), nullable=False)  # odometer|hours
     reading = Column(Numeric(12,1), nullable=False)
-    recorded_at = Column(DateTime(timezone=True), server_default=func.now())
+    recorded_at = Column(DateTime(timezone=True), primary_key=True, server_default=func.now())
     source = Column(String(32), default="manual")
+    # Range-partitioned by month; see app/partitions.py.
+    __table_args__ = (
+        Index('ix_meter_readings_vehicle_recorded', 'vehicle_id', 'recorded_at', 'id'),
+        Index('ix_meter_readings_recorded_id', 'recorded_at', 'id'),
+        {'postgresql_partition_by': 'RANGE (recorded_at)'},
+    )
+
+class MeterDaily(Base):
+    # Daily rollup of meter readings whose raw partitions have aged out.
+    __tablename__ = "meter_daily"
+    vehicle_id = Column(UUID(as_uuid=True), ForeignKey('vehicles.id', ondelete='CASCADE'), primary_key=True)
+    type = Column(String(16), primary_key=True)
+    day = Column(Date, primary_key=True)
+    min_reading = Column(Numeric(12,1), nullable=False)
+    max_reading = Column(Numeric(12,1), nullable=False)
+    readings = Column(Integer, nullable=False)
+
+class MeterRateState(Base):
+    # Running weighted least-squares sums of reading ~ day per vehicle and meter
+    # type, as of refreshed_at; see app/forecast.py.
+    __tablename__ = "meter_rate_state"
+    vehicle_id = Column(UUID(as_uuid=True), ForeignKey('vehicles.id', ondelete='CASCADE'), primary_key=True)
+    type = Column(String(16), primary_key=True)
+    w = Column(Float, nullable=False)
+    wx = Column(Float, nullable=False)
+    wy = Column(Float, nullable=False)
+    wxx = Column(Float, nullable=False)
+    wxy = Column(Float, nullable=False)
+    readings = Column(Integer, nullable=False)
+    last_recorded_at = Column(DateTime(timezone=True), nullable=False)
+    refreshed_at = Column(DateTime(timezone=True), nullable=False)
 
 class MaintenanceSchedule(Base):
     __tablename__ = "maintenance_schedules"
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
-    vehicle_id = Column(UUID(as_uuid=True), ForeignKey('vehicles.id', ondelete='CASCADE'))
+    vehicle_id = Column(UUID(as_uuid=True), ForeignKey('vehicles.id', ondelete='CASCADE'), index=True)
     rule_type = Column(String(16), nullable=False)  # mileage|hours|date
     interval_value = Column(Integer, nullable=False)
     last_meter = Column(Numeric(12,1))
@@ -74,7 +134,19 @@ class WorkOrder(Base):
     priority = Column(String(16), default='normal')
     opened_at = Column(DateTime(timezone=True), server_default=func.now())
     due_at = Column(DateTime(timezone=True))
-    closed_at = Column(DateTime(timezone=True))
+    closed_at = Column(DateTime(timezone=True))  # when closed or canceled
+    # Sums over the WO's tasks, kept by the task write paths.
+    est_hours = Column(Numeric(8,2))
+    actual_hours = Column(Numeric(8,2))
+    __table_args__ = (
+        Index('ix_work_orders_opened_at_id', 'opened_at', 'id'),
+        Index('ix_work_orders_status_opened_at', 'status', 'opened_at', 'id'),
+        Index('ix_work_orders_priority_opened_at', 'priority', 'opened_at', 'id'),
+        Index('ix_work_orders_vehicle_opened_at', 'vehicle_id', 'opened_at', 'id'),
+        Index('ix_work_orders_closed_at', 'closed_at'),
+        Index('ix_work_orders_backlog', 'priority', 'opened_at',
+              postgresql_where=text("status NOT IN ('closed', 'canceled')")),
+    )
 
 class WorkOrderTask(Base):
     __tablename__ = "wo_tasks"
@@ -84,6 +156,23 @@ class WorkOrderTask(Base):
     status = Column(String(32), default='pending')
     est_hours = Column(Numeric(6,2))
     actual_hours = Column(Numeric(6,2))
+    __table_args__ = (
+        Index('ix_wo_tasks_work_order_id', 'work_order_id'),
+    )
+
+class WorkOrderDaily(Base):
+    # Work orders opened and resolved per UTC day and priority, with repair time
+    # and labor of those closed; see app/wo_analytics.py.
+    __tablename__ = "wo_daily"
+    day = Column(Date, primary_key=True)
+    priority = Column(String(16), primary_key=True)
+    opened = Column(Integer, nullable=False, default=0)
+    closed = Column(Integer, nullable=False, default=0)
+    canceled = Column(Integer, nullable=False, default=0)
+    closed_late = Column(Integer, nullable=False, default=0)
+    repair_hours = Column(Float, nullable=False, default=0)
+    est_hours = Column(Float, nullable=False, default=0)
+    actual_hours = Column(Float, nullable=False, default=0)
 
 class Inspection(Base):
     __tablename__ = "inspections"
@@ -93,6 +182,10 @@ class Inspection(Base):
     checklist_key = Column(String(64), nullable=False)
     result = Column(String(16), nullable=False)  # pass|fail
     submitted_at = Column(DateTime(timezone=True), server_default=func.now())
+    __table_args__ = (
+        Index('ix_inspections_vehicle_submitted_at', 'vehicle_id', 'submitted_at', 'id'),
+        Index('ix_inspections_submitted_at_id', 'submitted_at', 'id'),
+    )
 
 class Defect(Base):
     __tablename__ = "defects"
@@ -114,7 +207,25 @@ class FuelLog(Base):
     total_cost = Column(Numeric(12,2))
     odometer = Column(Numeric(12,1))
     vendor = Column(String(64))
-    transacted_at = Column(DateTime(timezone=True), server_default=func.now())
+    transacted_at = Column(DateTime(timezone=True), primary_key=True, server_default=func.now())
+    __table_args__ = (
+        Index('ix_fuel_logs_vehicle_transacted', 'vehicle_id', 'transacted_at', 'id'),
+        Index('ix_fuel_logs_transacted_id', 'transacted_at', 'id'),
+        {'postgresql_partition_by': 'RANGE (transacted_at)'},
+    )
+
+class FuelDaily(Base):
+    # Fleet fuel totals per UTC day, kept by the fuel write path and refreshed
+    # nightly; see app/analytics.py.
+    __tablename__ = "fuel_daily"
+    day = Column(Date, primary_key=True)
+    fills = Column(Integer, nullable=False, default=0)
+    gallons = Column(Float, nullable=False, default=0)
+    cost = Column(Float, nullable=False, default=0)
+    miles = Column(Float, nullable=False, default=0)
+    metered_gallons = Column(Float, nullable=False, default=0)  # gallons behind a usable odometer delta
+    odometer_regressions = Column(Integer, nullable=False, default=0)
+    over_capacity = Column(Integer, nullable=False, default=0)
 
 class Alert(Base):
     __tablename__ = "alerts"
@@ -125,3 +236,42 @@ class Alert(Base):
     status = Column(String(16), default='open')
     triggered_at = Column(DateTime(timezone=True), server_default=func.now())
     resolved_at = Column(DateTime(timezone=True))
+    __table_args__ = (
+        Index('ux_alerts_open', 'key', 'entity_type', 'entity_id', unique=True, postgresql_where=text("status = 'open'")),
+        Index('ix_alerts_triggered_at_id', 'triggered_at', 'id'),
+        Index('ix_alerts_status_triggered_at', 'status', 'triggered_at', 'id'),
+        Index('ix_alerts_entity_triggered_at', 'entity_id', 'triggered_at'),
+    )
+
+class StatCounter(Base):
+    __tablename__ = "stat_counters"
+    name = Column(String(48), primary_key=True)
+    bucket = Column(String(64), primary_key=True)
+    value = Column(BigInteger, nullable=False, default=0)
+    updated_at = Column(DateTime(timezone=True), server_default=func.now())
+
+class JobRun(Base):
+    __tablename__ = "job_runs"
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    kind = Column(String(32), nullable=False)
+    status = Column(String(16), default='queued')  # queued|running|succeeded|failed
+    total_chunks = Column(Integer, default=0)
+    done_chunks = Column(Integer, default=0)
+    failed_chunks = Column(Integer, default=0)
+    stats = Column(JSONB)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    started_at = Column(DateTime(timezone=True))
+    finished_at = Column(DateTime(timezone=True))
+
+class JobChunk(Base):
+    __tablename__ = "job_chunks"
+    job_id = Column(UUID(as_uuid=True), ForeignKey('job_runs.id', ondelete='CASCADE'), primary_key=True)
+    chunk_no = Column(Integer, primary_key=True)
+    kind = Column(String(32), nullable=False)
+    lo_id = Column(UUID(as_uuid=True))
+    hi_id = Column(UUID(as_uuid=True))
+    status = Column(String(16), default='pending')  # pending|running|done|failed
+    attempts = Column(Integer, default=0)
+    stats = Column(JSONB)
+    error = Column(Text)
+    updated_at = Column(DateTime(timezone=True), server_default=func.now())
@@ -0,0 +1,75 @@
+import base64
+import binascii
+import json
+import uuid
+from datetime import datetime
+from typing import Optional
+from fastapi import HTTPException, Response
+from sqlalchemy import select, tuple_, literal, DateTime, Float, Numeric, String
+from sqlalchemy.dialects.postgresql import UUID
+from sqlalchemy.ext.asyncio import AsyncSession
+
+# Keyset pagination: rows are ordered by a unique key (e.g. opened_at, id) and the
+# cursor carries the key of the last row served, so every page is an index range
+# scan no matter how deep the client pages. The next cursor goes in X-Next-Cursor
+# and the body stays a plain JSON list. Pages are built from the selected column
+# tuples, never ORM instances; numeric and uuid columns come back as float8 and
+# text so rows are JSON-native and encode without per-value Python hooks.
+
+MAX_LIMIT = 500
+CURSOR_HEADER = "X-Next-Cursor"
+
+def _dump(v):
+    return v.isoformat() if isinstance(v, datetime) else str(v)
+
+def _load(col, v):
+    if isinstance(col.type, DateTime):
+        return datetime.fromisoformat(v)
+    if isinstance(col.type, UUID):
+        return uuid.UUID(v)
+    return v
+
+def encode_cursor(values) -> str:
+    raw = json.dumps([_dump(v) for v in values]).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+def decode_cursor(cursor: str, cols) -> tuple:
+    try:
+        raw = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+        return tuple(_load(c, v) for c, v in zip(cols, raw, strict=True))
+    except (ValueError, TypeError, binascii.Error):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+def parse_fields(model, fields: Optional[str]) -> list[str]:
+    names = model.__table__.columns.keys()
+    if not fields:
+        return list(names)
+    wanted = [f.strip() for f in fields.split(",") if f.strip()]
+    unknown = [f for f in wanted if f not in names]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown field(s): {', '.join(unknown)}")
+    return wanted
+
+def _json_column(c):
+    if isinstance(c.type, Numeric) and not isinstance(c.type, Float):
+        return c.cast(Float).label(c.name)
+    if isinstance(c.type, UUID):
+        return c.cast(String).label(c.name)
+    return c
+
+async def keyset_page(db: AsyncSession, response: Response, model, where: list, order_by: list,
+                      cursor: Optional[str], limit: int, fields: Optional[str], desc: bool = False) -> list[dict]:
+    names = parse_fields(model, fields)
+    table = model.__table__
+    stmt = select(*[_json_column(table.c[n]) for n in names], *[c.label(f"_k{i}") for i, c in enumerate(order_by)])
+    stmt = stmt.where(*where)
+    if cursor:
+        after = tuple_(*[literal(v, c.type) for c, v in zip(order_by, decode_cursor(cursor, order_by))])
+        stmt = stmt.where(tuple_(*order_by) < after if desc else tuple_(*order_by) > after)
+    stmt = stmt.order_by(*[c.desc() if desc else c for c in order_by]).limit(limit + 1)
+    rows = (await db.execute(stmt)).all()
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last = rows[-1]._mapping
+        response.headers[CURSOR_HEADER] = encode_cursor([last[f"_k{i}"] for i in range(len(order_by))])
+    return [dict(zip(names, r)) for r in rows]
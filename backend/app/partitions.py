@@ -0,0 +1,93 @@
+import re
+from datetime import date, datetime, timedelta, timezone
+from sqlalchemy import text
+
+from .settings import settings
+
+# meter_readings and fuel_logs are range-partitioned by calendar month (UTC) with
+# a DEFAULT partition catching anything outside the pre-created range. Dropping a
+# whole month of raw readings is then a metadata operation instead of a DELETE
+# plus vacuum, and per-vehicle history scans only touch the months they ask for.
+# Rows already sitting in the DEFAULT partition for a month about to be created
+# are moved into it, since Postgres refuses the new bound while they are there.
+
+PARTITIONED = {'meter_readings': 'recorded_at', 'fuel_logs': 'transacted_at'}
+
+def month_start(d: date) -> date:
+    return date(d.year, d.month, 1)
+
+def next_month(d: date) -> date:
+    return date(d.year + d.month // 12, d.month % 12 + 1, 1)
+
+def partition_name(table: str, month: date) -> str:
+    return f"{table}_y{month.year}m{month.month:02d}"
+
+def _month_of(table: str, name: str) -> date | None:
+    m = re.fullmatch(rf"{table}_y(\d{{4}})m(\d{{2}})", name)
+    return date(int(m.group(1)), int(m.group(2)), 1) if m else None
+
+async def _create_partition(db, table: str, name: str, month: date) -> None:
+    bounds = {"lo": month, "hi": next_month(month)}
+    in_month = f"{PARTITIONED[table]} >= :lo AND {PARTITIONED[table]} < :hi"
+    stray = (await db.execute(text(f"SELECT EXISTS (SELECT 1 FROM {table}_default WHERE {in_month})"), bounds)).scalar()
+    if stray:
+        await db.execute(text(f"CREATE TEMP TABLE {name}_moving AS SELECT * FROM {table}_default WHERE {in_month}"), bounds)
+        await db.execute(text(f"DELETE FROM {table}_default WHERE {in_month}"), bounds)
+    await db.execute(text(
+        f"CREATE TABLE {name} PARTITION OF {table} "
+        f"FOR VALUES FROM ('{month.isoformat()}') TO ('{next_month(month).isoformat()}')"))
+    if stray:
+        await db.execute(text(f"INSERT INTO {table} SELECT * FROM {name}_moving"))
+        await db.execute(text(f"DROP TABLE {name}_moving"))
+
+async def ensure_partitions(db, now: datetime, months_ahead: int | None = None) -> list[str]:
+    # Works with an AsyncSession or an AsyncConnection.
+    ahead = settings.partition_months_ahead if months_ahead is None else months_ahead
+    created = []
+    for table in PARTITIONED:
+        await db.execute(text(f"CREATE TABLE IF NOT EXISTS {table}_default PARTITION OF {table} DEFAULT"))
+        month = month_start(now.date())
+        for _ in range(ahead + 1):
+            name = partition_name(table, month)
+            exists = (await db.execute(text("SELECT to_regclass(:n)"), {"n": name})).scalar()
+            if not exists:
+                await _create_partition(db, table, name, month)
+                created.append(name)
+            month = next_month(month)
+    return created
+
+async def list_partitions(db, table: str) -> list[tuple[str, date]]:
+    rows = (await db.execute(text(
+        "SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid "
+        "WHERE i.inhparent = CAST(:t AS regclass)"), {"t": table})).scalars()
+    parts = [(name, _month_of(table, name)) for name in rows]
+    return sorted((p for p in parts if p[1]), key=lambda p: p[1])
+
+_ROLLUP = """
+    INSERT INTO meter_daily (vehicle_id, type, day, min_reading, max_reading, readings)
+    SELECT vehicle_id, type, (recorded_at AT TIME ZONE :tz)::date, min(reading), max(reading), count(*)
+    FROM {source} WHERE recorded_at < :cutoff
+    GROUP BY 1, 2, 3
+    ON CONFLICT (vehicle_id, type, day) DO UPDATE SET
+        min_reading = least(meter_daily.min_reading, excluded.min_reading),
+        max_reading = greatest(meter_daily.max_reading, excluded.max_reading),
+        readings = meter_daily.readings + excluded.readings
+"""
+
+async def compact_meter_readings(db, now: datetime, retention_days: int | None = None) -> dict:
+    # Roll raw readings older than the retention window into meter_daily, then
+    # drop the monthly partitions that lie entirely before the cutoff.
+    days = settings.meter_raw_retention_days if retention_days is None else retention_days
+    cutoff = month_start((now - timedelta(days=days)).date())
+    cutoff_ts = datetime(cutoff.year, cutoff.month, 1, tzinfo=timezone.utc)
+    params = {"tz": settings.timezone, "cutoff": cutoff_ts}
+    dropped, rolled = [], 0
+    for name, month in await list_partitions(db, 'meter_readings'):
+        if next_month(month) > cutoff:
+            break
+        rolled += (await db.execute(text(_ROLLUP.format(source=name)), params)).rowcount
+        await db.execute(text(f"DROP TABLE {name}"))
+        dropped.append(name)
+    rolled += (await db.execute(text(_ROLLUP.format(source='meter_readings_default')), params)).rowcount
+    await db.execute(text("DELETE FROM meter_readings_default WHERE recorded_at < :cutoff"), {"cutoff": cutoff_ts})
+    return {"cutoff": cutoff.isoformat(), "partitions_dropped": dropped, "daily_rows_upserted": rolled}
@@ -0,0 +1,49 @@
+import logging
+import time
+from datetime import datetime, timezone
+from sqlalchemy import select, func, and_, or_
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from .models import Vehicle, MaintenanceSchedule, Alert
+from .alerts import raise_alerts, resolve_cleared
+
+log = logging.getLogger(__name__)
+
+def id_range(col, vehicle_range: tuple | None) -> list:
+    # [lo, hi) bounds on a vehicle id column; either end may be None (unbounded).
+    lo, hi = vehicle_range or (None, None)
+    return ([col >= lo] if lo is not None else []) + ([col < hi] if hi is not None else [])
+
+def due_schedules(now: datetime, vehicle_range: tuple | None = None):
+    # One row per due schedule; mileage, hours and date rules are all decided in SQL.
+    S, V = MaintenanceSchedule, Vehicle
+    mileage = and_(S.rule_type == 'mileage', S.last_meter.isnot(None),
+                   V.current_meter - S.last_meter >= S.interval_value)
+    hours = and_(S.rule_type == 'hours', S.last_meter.isnot(None),
+                 V.current_hours - S.last_meter >= S.interval_value)
+    date = and_(S.rule_type == 'date', S.last_completed_at.isnot(None),
+                S.last_completed_at + func.make_interval(0, 0, 0, S.interval_value) <= now)
+    return (select(S.id, S.vehicle_id, S.rule_type)
+            .join(V, V.id == S.vehicle_id)
+            .where(or_(mileage, hours, date), *id_range(S.vehicle_id, vehicle_range)))
+
+async def run_pm_scan(db: AsyncSession, now: datetime | None = None, vehicle_range: tuple | None = None) -> dict:
+    now = now or datetime.now(timezone.utc)
+    t0 = time.perf_counter()
+    due = due_schedules(now, vehicle_range).subquery()
+    by_rule = dict((await db.execute(select(due.c.rule_type, func.count()).group_by(due.c.rule_type))).all())
+    t1 = time.perf_counter()
+    vehicles = select(due.c.vehicle_id).distinct()
+    created = await raise_alerts(db, 'PM_DUE', 'vehicle', vehicles, now)
+    resolved = await resolve_cleared(db, 'PM_DUE', 'vehicle', vehicles, now,
+                                     where=id_range(Alert.entity_id, vehicle_range))
+    t2 = time.perf_counter()
+    stats = {
+        "schedules_due": by_rule,
+        "alerts_created": created,
+        "alerts_resolved": resolved,
+        "timing_ms": {"evaluate": round((t1 - t0) * 1000, 1), "alerts": round((t2 - t1) * 1000, 1),
+                      "total": round((t2 - t0) * 1000, 1)},
+    }
+    log.info("pm scan: %s", stats)
+    return stats
@@ -0,0 +1,173 @@
+import uuid
+from datetime import datetime
+from decimal import Decimal
+from typing import Annotated, Any, Optional
+import orjson
+from fastapi import Response
+from pydantic import BaseModel, ConfigDict, PlainSerializer
+
+# Response models. Endpoints returning one object declare one of these as their
+# response_model, so FastAPI validates straight from the ORM attributes and has
+# pydantic-core write the JSON bytes, instead of walking the instance with
+# jsonable_encoder. Numeric columns are declared float, which is also how
+# jsonable_encoder rendered them. List endpoints (which support ?fields=
+# projections) bypass models: their rows are plain column tuples and go through
+# RowsResponse, which encodes with orjson.
+
+# pydantic writes UTC as "Z"; keep the "+00:00" offsets the API has always returned.
+Timestamp = Annotated[datetime, PlainSerializer(datetime.isoformat, when_used="json")]
+
+class Out(BaseModel):
+    model_config = ConfigDict(from_attributes=True)
+
+class VehicleOut(Out):
+    id: uuid.UUID
+    unit_no: str
+    vin: Optional[str] = None
+    make: Optional[str] = None
+    model: Optional[str] = None
+    year: Optional[int] = None
+    class_: Optional[str] = None
+    status: Optional[str] = None
+    meter_type: Optional[str] = None
+    current_meter: Optional[float] = None
+    current_hours: Optional[float] = None
+    tank_capacity_gal: Optional[float] = None
+    in_service_on: Optional[Timestamp] = None
+    out_service_on: Optional[Timestamp] = None
+    current_driver_id: Optional[uuid.UUID] = None
+    created_at: Optional[Timestamp] = None
+
+class DriverOut(Out):
+    id: uuid.UUID
+    full_name: str
+    email: Optional[str] = None
+    phone: Optional[str] = None
+    license_no: Optional[str] = None
+    license_class: Optional[str] = None
+    license_expires_on: Optional[Timestamp] = None
+    current_vehicle_id: Optional[uuid.UUID] = None
+    created_at: Optional[Timestamp] = None
+
+class AssignmentOut(Out):
+    id: uuid.UUID
+    vehicle_id: Optional[uuid.UUID] = None
+    driver_id: Optional[uuid.UUID] = None
+    start_at: Optional[Timestamp] = None
+    end_at: Optional[Timestamp] = None
+
+class MeterReadingOut(Out):
+    id: uuid.UUID
+    vehicle_id: Optional[uuid.UUID] = None
+    type: str
+    reading: float
+    recorded_at: Timestamp
+    source: Optional[str] = None
+
+class ScheduleOut(Out):
+    id: uuid.UUID
+    vehicle_id: Optional[uuid.UUID] = None
+    rule_type: str
+    interval_value: int
+    last_meter: Optional[float] = None
+    last_completed_at: Optional[Timestamp] = None
+
+class WorkOrderOut(Out):
+    id: uuid.UUID
+    vehicle_id: Optional[uuid.UUID] = None
+    title: str
+    status: Optional[str] = None
+    priority: Optional[str] = None
+    opened_at: Optional[Timestamp] = None
+    due_at: Optional[Timestamp] = None
+    closed_at: Optional[Timestamp] = None
+    est_hours: Optional[float] = None
+    actual_hours: Optional[float] = None
+
+class TaskOut(Out):
+    id: uuid.UUID
+    work_order_id: Optional[uuid.UUID] = None
+    title: str
+    status: Optional[str] = None
+    est_hours: Optional[float] = None
+    actual_hours: Optional[float] = None
+
+class DefectOut(Out):
+    id: uuid.UUID
+    inspection_id: Optional[uuid.UUID] = None
+    vehicle_id: Optional[uuid.UUID] = None
+    description: str
+    severity: Optional[str] = None
+    status: Optional[str] = None
+    work_order_id: Optional[uuid.UUID] = None
+
+class InspectionOut(Out):
+    id: uuid.UUID
+    vehicle_id: Optional[uuid.UUID] = None
+    driver_id: Optional[uuid.UUID] = None
+    checklist_key: str
+    result: str
+    submitted_at: Optional[Timestamp] = None
+
+class InspectionResultOut(InspectionOut):
+    defects: list[DefectOut] = []
+    work_order: Optional[WorkOrderOut] = None
+
+class FuelLogOut(Out):
+    id: uuid.UUID
+    vehicle_id: Optional[uuid.UUID] = None
+    driver_id: Optional[uuid.UUID] = None
+    qty_gal: float
+    price_per_gal: Optional[float] = None
+    total_cost: Optional[float] = None
+    odometer: Optional[float] = None
+    vendor: Optional[str] = None
+    transacted_at: Timestamp
+
+class AlertOut(Out):
+    id: uuid.UUID
+    key: str
+    entity_type: str
+    entity_id: uuid.UUID
+    status: Optional[str] = None
+    triggered_at: Optional[Timestamp] = None
+    resolved_at: Optional[Timestamp] = None
+
+class JobChunkOut(Out):
+    chunk_no: int
+    kind: str
+    status: Optional[str] = None
+    attempts: Optional[int] = None
+    stats: Optional[dict[str, Any]] = None
+    error: Optional[str] = None
+
+class JobOut(Out):
+    id: uuid.UUID
+    kind: str
+    status: Optional[str] = None
+    total_chunks: Optional[int] = None
+    done_chunks: Optional[int] = None
+    failed_chunks: Optional[int] = None
+    stats: Optional[dict[str, Any]] = None
+    created_at: Optional[Timestamp] = None
+    started_at: Optional[Timestamp] = None
+    finished_at: Optional[Timestamp] = None
+    chunks: list[JobChunkOut] = []
+
+def _default(v):
+    # orjson handles str/int/float/datetime and uuid.UUID natively, but not Decimal
+    # (rendered as jsonable_encoder does) or asyncpg's UUID subclass.
+    if isinstance(v, Decimal):
+        return int(v) if v.as_tuple().exponent >= 0 else float(v)
+    if isinstance(v, uuid.UUID):
+        return str(v)
+    raise TypeError
+
+def dumps(content) -> bytes:
+    return orjson.dumps(content, default=_default)
+
+class RowsResponse(Response):
+    media_type = "application/json"
+
+    def render(self, content) -> bytes:
+        return dumps(content)
@@ -8,13 +8,51 @@ class Settings(BaseSettings):
     postgres_password: str = "fleetpass"
     postgres_host: str = "db"
     postgres_port: int = 5432
+    postgres_replica_host: str = ""  # read replica for list/get handlers; empty = primary
+    db_pool_size: int = 10
+    db_max_overflow: int = 10
+    db_pool_timeout: int = 30
+    db_pool_recycle: int = 1800
+    db_pool_pre_ping: bool = True
+    db_statement_cache_size: int = 100  # asyncpg prepared statements per connection; 0 behind pgbouncer
     api_jwt_secret: str = "change_me"
     api_jwt_expires_min: int = 120
+    api_jwt_kid: str = "k1"
+    api_jwt_previous_keys: str = ""  # kid:secret,... still accepted for verification
+    auth_token_cache_size: int = 50000
     allowed_origins: str = "http://localhost:3000"
     redis_url: str = "redis://redis:6379/0"
+    auto_create_schema: bool = False  # create_all on startup; otherwise the schema comes from Alembic
+    readiness_timeout_s: float = 2.0
+    partition_months_ahead: int = 3
+    meter_raw_retention_days: int = 400
+    max_clock_skew_s: int = 300  # meter readings dated further ahead than this are rejected
+    cache_backend: str = "memory"  # memory|redis|none
+    cache_ttl_s: int = 60
+    cache_max_entries: int = 10000
+    import_chunk_size: int = 2000  # records per transaction in bulk imports
+    nightly_chunk_size: int = 2000
+    nightly_hour: int = 2
+    license_expiry_warn_days: int = 30
+    fuel_rolling_fills: int = 5
+    fuel_outlier_z: float = 3.0
+    forecast_half_life_days: float = 30.0  # weight of a meter reading in the utilization fit halves every N days
+    bcrypt_rounds: int = 12
+    password_hash_workers: int = 4
+    password_hash_queue: int = 200
+    events_stream_maxlen: int = 10000  # change-feed entries kept in Redis for resuming clients
+    events_client_buffer: int = 1000  # events queued per SSE client before it is disconnected
+    events_heartbeat_s: int = 15
+    events_retry_ms: int = 3000
+    slow_query_ms: int = 0  # log statements slower than this; 0 disables
+    query_count_warn: int = 50  # log requests issuing more statements than this
 
     @property
     def database_url(self):
         return f"postgresql+asyncpg://{self.postgres_user}:{self.postgres_password}@{self.postgres_host}:{self.postgres_port}/{self.postgres_db}"
 
+    @property
+    def read_database_url(self):
+        return f"postgresql+asyncpg://{self.postgres_user}:{self.postgres_password}@{self.postgres_replica_host}:{self.postgres_port}/{self.postgres_db}"
+
 settings = Settings()
@@ -0,0 +1,61 @@
+from typing import Optional
+from fastapi import HTTPException, Response
+from sqlalchemy import select, literal_column, column, func, and_, or_, union_all, DateTime, String
+from sqlalchemy.dialects.postgresql import JSONB, UUID
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from .models import MeterReading, FuelLog, Inspection, WorkOrder, VehicleAssignment
+from .pagination import encode_cursor, decode_cursor, CURSOR_HEADER
+
+# A vehicle's history as one stream, newest first, in one UNION ALL query. Each
+# branch is a keyset range scan on its (vehicle_id, <timestamp>, id) index,
+# limited to the page size, so a page costs at most limit+1 index entries per
+# source however deep the client pages. Entries are ordered by (at, kind, id),
+# which is also the cursor.
+
+SOURCES = {
+    'assignment': (VehicleAssignment, VehicleAssignment.start_at,
+                   ('driver_id', 'end_at')),
+    'fuel': (FuelLog, FuelLog.transacted_at,
+             ('qty_gal', 'price_per_gal', 'total_cost', 'odometer', 'vendor', 'driver_id')),
+    'inspection': (Inspection, Inspection.submitted_at,
+                   ('checklist_key', 'result', 'driver_id')),
+    'meter': (MeterReading, MeterReading.recorded_at,
+              ('type', 'reading', 'source')),
+    'work_order': (WorkOrder, WorkOrder.opened_at,
+                   ('title', 'status', 'priority', 'due_at', 'closed_at')),
+}
+KEY = [column('at', DateTime(timezone=True)), column('kind', String), column('id', UUID(as_uuid=True))]
+
+def _branch(kind: str, vehicle_id: str, after: Optional[tuple], limit: int):
+    model, ts, fields = SOURCES[kind]
+    data = func.jsonb_build_object(*[a for f in fields for a in (literal_column(f"'{f}'"), model.__table__.c[f])],
+                                 type_=JSONB)
+    where = [model.vehicle_id == vehicle_id]
+    if after:
+        # (ts, kind, id) < cursor, with this branch's constant kind folded in.
+        at, after_kind, after_id = after
+        if kind < after_kind:
+            where.append(ts <= at)
+        elif kind == after_kind:
+            where.append(or_(ts < at, and_(ts == at, model.id < after_id)))
+        else:
+            where.append(ts < at)
+    return (select(literal_column(f"'{kind}'", String).label('kind'), ts.label('at'), model.id.label('id'), data.label('data'))
+            .where(*where).order_by(ts.desc(), model.id.desc()).limit(limit))
+
+async def vehicle_timeline(db: AsyncSession, response: Response, vehicle_id: str, kinds: Optional[str],
+                           cursor: Optional[str], limit: int) -> list[dict]:
+    wanted = sorted(set(kinds.split(","))) if kinds else sorted(SOURCES)
+    unknown = [k for k in wanted if k not in SOURCES]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown kind(s): {', '.join(unknown)}")
+    after = decode_cursor(cursor, KEY) if cursor else None
+    u = union_all(*[_branch(k, vehicle_id, after, limit + 1) for k in wanted]).subquery()
+    stmt = select(u).order_by(u.c.at.desc(), u.c.kind.desc(), u.c.id.desc()).limit(limit + 1)
+    rows = (await db.execute(stmt)).all()
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last = rows[-1]
+        response.headers[CURSOR_HEADER] = encode_cursor([last.at, last.kind, last.id])
+    return [{"kind": r.kind, "at": r.at, "id": str(r.id), "data": r.data} for r in rows]
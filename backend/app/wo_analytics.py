@@ -0,0 +1,203 @@
+from datetime import date, datetime, timedelta, timezone
+from decimal import Decimal
+from sqlalchemy import select, insert, delete, func, case, cast, and_, or_, literal, literal_column, union_all, Date, Float, Numeric
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from .models import Vehicle, WorkOrder, WorkOrderDaily
+from .counters import CLOSED_WO, wo_is_open
+
+# Shop analytics over years of work orders without reading them back. Every
+# write that opens, resolves or reopens a WO, or changes a resolved WO's labor,
+# adds its delta to wo_daily, one row per UTC day and priority, in the same
+# transaction; rebuild() recomputes it from work_orders (nightly, and to repair
+# drift). Daily throughput, backlog size (a running sum of opened minus
+# resolved), MTTR, late closures and estimated vs. actual labor all come from
+# that table. The current backlog's age and overdue counts read the
+# ix_work_orders_backlog partial index, and per-vehicle downtime (the union of a
+# vehicle's WO intervals, overlaps merged with window functions) scans only
+# the WOs that overlap the requested range.
+
+COLUMNS = ('opened', 'closed', 'canceled', 'closed_late', 'repair_hours', 'est_hours', 'actual_hours')
+AGE_BUCKETS = (7, 30, 90)  # days; the open backlog is counted as 0-7, 7-30, 30-90 and 90+ days old
+MTTR_WINDOW_DAYS = 7
+
+def _priority(p) -> str:
+    return p or 'none'
+
+def _day(ts: datetime) -> date:
+    return ts.astimezone(timezone.utc).date()
+
+def opened(priority, opened_at: datetime) -> dict:
+    return {(_day(opened_at), _priority(priority)): {'opened': 1}}
+
+def resolved(wo, sign: int = 1) -> dict:
+    # A closed or canceled WO's share of its resolution day; sign=-1 takes it back.
+    # WOs canceled before closed_at was recorded for cancels count on the day they opened.
+    if wo_is_open(wo.status):
+        return {}
+    key = (_day(wo.closed_at or wo.opened_at), _priority(wo.priority))
+    if wo.status != 'closed':
+        return {key: {'canceled': sign}}
+    delta = {'closed': sign, 'est_hours': sign * float(wo.est_hours or 0),
+             'actual_hours': sign * float(wo.actual_hours or 0)}
+    if wo.closed_at:
+        delta['repair_hours'] = sign * (wo.closed_at - wo.opened_at).total_seconds() / 3600
+        if wo.due_at and wo.closed_at > wo.due_at:
+            delta['closed_late'] = sign
+    return {key: delta}
+
+def merge(*parts: dict) -> dict:
+    out: dict = {}
+    for part in parts:
+        for key, delta in part.items():
+            row = out.setdefault(key, {})
+            for c, v in delta.items():
+                row[c] = row.get(c, 0) + v
+    return out
+
+async def bump(db: AsyncSession, deltas: dict) -> None:
+    rows = [{'day': day, 'priority': p, **{c: d.get(c, 0) for c in COLUMNS}}
+            for (day, p), d in deltas.items() if any(d.values())]
+    if not rows:
+        return
+    D = WorkOrderDaily
+    stmt = pg_insert(D).values(rows)
+    await db.execute(stmt.on_conflict_do_update(
+        index_elements=['day', 'priority'], set_={c: D.__table__.c[c] + stmt.excluded[c] for c in COLUMNS}))
+
+async def add_labor(db: AsyncSession, wo, est: float = 0, actual: float = 0) -> None:
+    # Task hours roll up into the WO's totals, and into its resolution day if it is closed.
+    undo = resolved(wo, -1)
+    if est:
+        wo.est_hours = (wo.est_hours or 0) + Decimal(str(est))
+    if actual:
+        wo.actual_hours = (wo.actual_hours or 0) + Decimal(str(actual))
+    await bump(db, merge(undo, resolved(wo)))
+
+def _utc_day(ts):
+    return cast(func.timezone('UTC', ts), Date)
+
+async def rebuild(db: AsyncSession) -> None:
+    # The same deltas as opened() and resolved(), summed per day and priority.
+    W, D = WorkOrder, WorkOrderDaily
+    priority = func.coalesce(W.priority, 'none')
+    closed = W.status == 'closed'
+
+    def per_day(day, values: dict, *where):
+        return (select(day.label('day'), priority.label('priority'),
+                       *[func.coalesce(values.get(c), 0).label(c) for c in COLUMNS])
+                .where(*where).group_by(day, priority))
+
+    u = union_all(
+        per_day(_utc_day(W.opened_at), {'opened': func.count()}),
+        per_day(_utc_day(func.coalesce(W.closed_at, W.opened_at)), {
+            'closed': func.count().filter(closed), 'canceled': func.count().filter(~closed),
+            'closed_late': func.count().filter(closed, W.closed_at > W.due_at),
+            'repair_hours': func.sum(func.extract('epoch', W.closed_at - W.opened_at) / 3600).filter(closed),
+            'est_hours': func.sum(W.est_hours).filter(closed),
+            'actual_hours': func.sum(W.actual_hours).filter(closed)}, W.status.in_(CLOSED_WO)),
+    ).subquery()
+    await db.execute(delete(D))
+    await db.execute(insert(D).from_select(['day', 'priority', *COLUMNS], select(
+        u.c.day, u.c.priority, *[cast(func.sum(u.c[c]), D.__table__.c[c].type) for c in COLUMNS]
+    ).group_by(u.c.day, u.c.priority)))
+
+def _round(x, digits: int = 2):
+    return func.round(cast(x, Numeric), digits)
+
+def _ratio(num, den):
+    return _round(cast(num, Float) / func.nullif(cast(den, Float), 0))
+
+def _backlog():
+    # Spelled out so the planner can match ix_work_orders_backlog's predicate.
+    return WorkOrder.status.not_in([literal_column(f"'{s}'") for s in CLOSED_WO])
+
+async def _daily(db: AsyncSession, first: date, last: date) -> list[dict]:
+    D = WorkOrderDaily
+    fleet = (select(D.day, func.sum(D.opened).label('opened'), func.sum(D.closed).label('closed'),
+                    func.sum(D.canceled).label('canceled'), func.sum(D.closed_late).label('closed_late'),
+                    func.sum(D.repair_hours).label('repair_hours'))
+             .where(D.day >= first, D.day <= last).group_by(D.day).subquery())
+    before = select(func.coalesce(func.sum(D.opened - D.closed - D.canceled), 0)).where(D.day < first).scalar_subquery()
+    days = func.generate_series(first, last, timedelta(days=1)).table_valued('day').render_derived(name='days')
+    f = fleet.c
+    n = {c: func.coalesce(f[c], 0) for c in ('opened', 'closed', 'canceled', 'closed_late', 'repair_hours')}
+    by_day = dict(order_by=days.c.day)
+    trailing = dict(order_by=days.c.day, rows=(-(MTTR_WINDOW_DAYS - 1), 0))
+    rows = (await db.execute(
+        select(cast(days.c.day, Date).label('day'), n['opened'].label('opened'), n['closed'].label('closed'),
+               n['canceled'].label('canceled'), n['closed_late'].label('closed_late'),
+               (before + func.sum(n['opened'] - n['closed'] - n['canceled']).over(**by_day)).label('backlog'),
+               _ratio(func.sum(n['repair_hours']).over(**trailing), func.sum(n['closed']).over(**trailing))
+               .label('mttr_hours_7d'))
+        .outerjoin(fleet, f.day == days.c.day).order_by(days.c.day))).mappings().all()
+    return [dict(r) for r in rows]
+
+async def _priorities(db: AsyncSession, first: date, last: date) -> list[dict]:
+    D = WorkOrderDaily
+    est, actual = func.sum(D.est_hours), func.sum(D.actual_hours)
+    rows = (await db.execute(
+        select(D.priority, func.sum(D.opened).label('opened'), func.sum(D.closed).label('closed'),
+               func.sum(D.canceled).label('canceled'), func.sum(D.closed_late).label('closed_late'),
+               _ratio(func.sum(D.repair_hours), func.sum(D.closed)).label('mttr_hours'),
+               _ratio(100 * (func.sum(D.closed) - func.sum(D.closed_late)), func.sum(D.closed)).label('on_time_pct'),
+               _round(est).label('est_hours'), _round(actual).label('actual_hours'),
+               _ratio(100 * (actual - est), est).label('labor_variance_pct'))
+        .where(D.day >= first, D.day <= last).group_by(D.priority).order_by(D.priority))).mappings().all()
+    return [dict(r) for r in rows]
+
+async def _backlog_now(db: AsyncSession, now: datetime) -> list[dict]:
+    W = WorkOrder
+    age = func.extract('epoch', literal(now) - W.opened_at) / 86400
+    edges = (0, *AGE_BUCKETS)
+    buckets = {f"age_{lo}_{hi}d": func.count().filter(age >= lo, age < hi) for lo, hi in zip(edges, AGE_BUCKETS)}
+    buckets[f"age_{AGE_BUCKETS[-1]}d_plus"] = func.count().filter(age >= AGE_BUCKETS[-1])
+    priority = func.coalesce(W.priority, 'none')
+    rows = (await db.execute(
+        select(priority.label('priority'), func.count().label('open'),
+               func.count().filter(W.due_at < now).label('overdue'),
+               *[v.label(k) for k, v in buckets.items()],
+               _round(func.percentile_cont(0.5).within_group(age), 1).label('median_age_days'),
+               func.min(W.opened_at).label('oldest_opened_at'))
+        .where(_backlog()).group_by(priority).order_by(priority))).mappings().all()
+    return [dict(r) for r in rows]
+
+async def _vehicles(db: AsyncSession, since: datetime, until: datetime, now: datetime, limit: int) -> list[dict]:
+    # A vehicle is down while any of its WOs is open; overlapping WOs count once.
+    W = WorkOrder
+    start = func.greatest(W.opened_at, since)
+    end = func.least(func.coalesce(W.closed_at, now), until)
+    in_range = and_(W.closed_at >= since, W.closed_at < until, W.status == 'closed')
+    # Opened in range, or opened earlier and closed after since or still open. Swept per vehicle in
+    # opening order, each WO adds only the time past the latest end before it.
+    prev_end = func.max(end).over(partition_by=W.vehicle_id, order_by=W.opened_at, rows=(None, -1))
+    added = func.greatest(end - func.greatest(start, prev_end), timedelta(0))
+    swept = (select(W.vehicle_id, (func.date_part('epoch', added) / 3600).label('hours'),
+                    case((in_range, W.est_hours)).label('est'), case((in_range, W.actual_hours)).label('actual'))
+             .where(W.opened_at < until, W.vehicle_id.isnot(None), W.status.is_distinct_from('canceled'),
+                    or_(W.opened_at >= since, W.closed_at > since, and_(W.closed_at.is_(None), _backlog())))
+             .subquery())
+    w = swept.c
+    per_vehicle = (select(w.vehicle_id, func.sum(w.hours).label('hours'), func.count().label('wos'),
+                          func.sum(w.est).label('est'), func.sum(w.actual).label('actual'))
+                   .group_by(w.vehicle_id).subquery())
+    v = per_vehicle.c
+    period_hours = (min(until, now) - since).total_seconds() / 3600
+    rows = (await db.execute(
+        select(v.vehicle_id, Vehicle.unit_no, v.wos.label('work_orders'), _round(v.hours).label('downtime_hours'),
+               _round(100 - 100 * v.hours / period_hours).label('availability_pct'),
+               _round(v.est).label('est_hours'), _round(v.actual).label('actual_hours'))
+        .join(Vehicle, Vehicle.id == v.vehicle_id)
+        .order_by(v.hours.desc(), Vehicle.unit_no).limit(limit))).mappings().all()
+    return [dict(r) for r in rows]
+
+async def work_order_analytics(db: AsyncSession, since: datetime, until: datetime, limit: int,
+                               now: datetime | None = None) -> dict:
+    now = now or datetime.now(timezone.utc)
+    first, last = _day(since), _day(min(until, now))
+    return {"since": since, "until": until, "as_of": now,
+            "backlog": await _backlog_now(db, now),
+            "priorities": await _priorities(db, first, last),
+            "daily": await _daily(db, first, last),
+            "vehicles": await _vehicles(db, since, until, now, limit)}
@@ -1,6 +1,68 @@
-from celery import Celery
+import asyncio
 import os
+from datetime import datetime, timezone
+from celery import Celery, group
+from celery.schedules import crontab
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+from sqlalchemy.pool import NullPool
+
+from .settings import settings
+from . import jobs
+
 app = Celery("fleet", broker=os.environ.get("REDIS_URL", "redis://redis:6379/0"))
+app.conf.update(
+    timezone=settings.timezone,
+    task_acks_late=True,
+    worker_prefetch_multiplier=1,
+    beat_schedule={
+        "nightly": {"task": "app.worker.start_nightly", "schedule": crontab(hour=settings.nightly_hour, minute=0)},
+        "partitions": {"task": "app.worker.maintain_partitions",
+                       "schedule": crontab(hour=(settings.nightly_hour + 1) % 24, minute=0)},
+    },
+)
+
+# Every task runs its coroutine in a fresh event loop, so pooled asyncpg
+# connections cannot be shared between tasks.
+engine = create_async_engine(settings.database_url, poolclass=NullPool)
+Session = async_sessionmaker(engine, expire_on_commit=False)
+
 @app.task
 def ping():
     return "pong"
+
+@app.task
+def start_nightly(job_id: str | None = None):
+    async def plan():
+        jid = job_id or await jobs.create_job(Session)
+        return jid, await jobs.plan_nightly(Session, jid)
+    jid, chunks = asyncio.run(plan())
+    group(run_chunk.s(jid, n) for n in chunks).apply_async()
+    return jid
+
+@app.task
+def resume_job(job_id: str):
+    chunks = asyncio.run(jobs.pending_chunks(Session, job_id))
+    group(run_chunk.s(job_id, n) for n in chunks).apply_async()
+    return chunks
+
+@app.task(bind=True, max_retries=3)
+def run_chunk(self, job_id: str, chunk_no: int):
+    try:
+        return asyncio.run(jobs.run_chunk(Session, job_id, chunk_no))
+    except Exception as e:
+        if self.request.retries >= self.max_retries:
+            asyncio.run(jobs.fail_chunk(Session, job_id, chunk_no, repr(e)))
+            raise
+        raise self.retry(exc=e, countdown=10 * 2 ** self.request.retries)
+
+@app.task
+def maintain_partitions():
+    from .partitions import ensure_partitions, compact_meter_readings
+    async def go():
+        async with Session() as db:
+            now = datetime.now(timezone.utc)
+            created = await ensure_partitions(db, now)
+            compacted = await compact_meter_readings(db, now)
+            await db.commit()
+            return {"partitions_created": created, **compacted}
+    return asyncio.run(go())
@@ -0,0 +1,25 @@
+# Per-request auth cost: the old path (python-jose decode of every token) against
+# verify_token with a warm cache, plus the cold path with kid lookup.
+# Run from backend/: python -m bench.bench_auth
+import json
+import timeit
+from jose import jwt
+
+from app.settings import settings
+from app.auth import ALGO, create_token, decode_token, verify_token
+
+N = 20000
+
+def main():
+    token = create_token("00000000-0000-0000-0000-000000000001", "manager")
+    verify_token(token)
+    runs = {
+        "jose_decode": lambda: jwt.decode(token, settings.api_jwt_secret, algorithms=[ALGO]),
+        "decode_token_uncached": lambda: decode_token(token),
+        "verify_token_cached": lambda: verify_token(token),
+    }
+    out = {name: round(min(timeit.repeat(fn, number=N, repeat=3)) / N * 1e6, 2) for name, fn in runs.items()}
+    print(json.dumps({"unit": "us_per_call", **out}, indent=2))
+
+if __name__ == "__main__":
+    main()
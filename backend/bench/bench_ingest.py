@@ -0,0 +1,44 @@
+# Bulk meter ingest at the batch limit: MAX_ROWS readings, one per vehicle, so
+# the vehicle lookup and the current-meter roll-up each touch MAX_ROWS distinct
+# vehicles (well past asyncpg's 32767 bind parameters if they were sent one by
+# one). Runs in a transaction that is rolled back, against a local Postgres
+# (never production) with the schema created.
+# Run from backend/: python -m bench.bench_ingest
+import asyncio
+import json
+import time
+from datetime import datetime, timezone
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.db import engine
+from app.ingest import MAX_ROWS, ingest_meters
+from app.partitions import ensure_partitions
+
+async def run() -> dict:
+    now = datetime.now(timezone.utc)
+    async with engine.connect() as conn:
+        tx = await conn.begin()
+        try:
+            await ensure_partitions(conn, now)
+            ids = (await conn.execute(text("""
+                INSERT INTO vehicles (id, unit_no, status, meter_type, current_meter, created_at)
+                SELECT gen_random_uuid(), 'INGEST-' || lpad(g::text, 6, '0'), 'in_service', 'odometer', 0, now()
+                FROM generate_series(1, :n) g RETURNING id"""), {"n": MAX_ROWS})).scalars().all()
+            body = "\n".join(json.dumps({"vehicle_id": str(v), "type": "odometer" if i % 3 else "hours",
+                                         "reading": 1000 + i % 500, "recorded_at": now.isoformat()})
+                             for i, v in enumerate(ids)).encode()
+            db = AsyncSession(bind=conn)
+            t0 = time.perf_counter()
+            result, updated = await ingest_meters(db, body, "application/x-ndjson")
+            elapsed = time.perf_counter() - t0
+            assert result["accepted"] == MAX_ROWS and len(updated) == MAX_ROWS, result["errors"][:5]
+            return {"rows": MAX_ROWS, "vehicles": len(updated), "ingest_ms": round(elapsed * 1e3, 1)}
+        finally:
+            await tx.rollback()
+
+def main():
+    print(json.dumps(asyncio.run(run()), indent=2))
+
+if __name__ == "__main__":
+    main()
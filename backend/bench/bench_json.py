@@ -0,0 +1,44 @@
+# Response encoding cost for a 500-row page and a single row: the old path
+# (jsonable_encoder over rows as asyncpg returns them, then json.dumps as
+# JSONResponse does) against the orjson path for the float/text rows keyset_page
+# now selects, and an ORM instance through a response model.
+# Run from backend/: python -m bench.bench_json
+import json
+import timeit
+import uuid
+from datetime import datetime, timedelta, timezone
+from decimal import Decimal
+from fastapi.encoders import jsonable_encoder
+
+from app.models import Vehicle
+from app.schemas import VehicleOut, dumps
+
+N = 20
+
+def vehicle(i: int, native: bool) -> dict:
+    num = float if native else Decimal
+    vid = uuid.UUID(int=i)
+    return {"id": str(vid) if native else vid, "unit_no": f"UNIT-{i:06d}", "vin": "1FTWW3", "make": "Ford",
+            "model": "F-550", "year": 2020, "class_": "heavy", "status": "in_service", "meter_type": "odometer",
+            "current_meter": num("123456.7"), "current_hours": None, "tank_capacity_gal": num("40.000"),
+            "in_service_on": None, "out_service_on": None,
+            "created_at": datetime(2024, 1, 1, tzinfo=timezone.utc) + timedelta(minutes=i)}
+
+def json_response(content) -> bytes:
+    return json.dumps(content, ensure_ascii=False, allow_nan=False, indent=None, separators=(",", ":")).encode()
+
+def main():
+    old_rows = [vehicle(i, native=False) for i in range(500)]
+    new_rows = [vehicle(i, native=True) for i in range(500)]
+    orm = Vehicle(**{k: v for k, v in old_rows[0].items()})
+    runs = {
+        "page_jsonable_encoder": lambda: json_response(jsonable_encoder(old_rows)),
+        "page_orjson": lambda: dumps(new_rows),
+        "row_jsonable_encoder": lambda: json_response(jsonable_encoder(orm)),
+        "row_response_model": lambda: VehicleOut.model_validate(orm).model_dump_json(),
+    }
+    out = {name: round(min(timeit.repeat(fn, number=N, repeat=3)) / N * 1e3, 3) for name, fn in runs.items()}
+    print(json.dumps({"unit": "ms_per_call", **out}, indent=2))
+
+if __name__ == "__main__":
+    main()
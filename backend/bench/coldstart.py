@@ -0,0 +1,58 @@
+# Measures cold start: `import app.main` in a fresh interpreter, and the time from
+# spawning the server to its first 200 from /readyz. From backend/:
+#   python -m bench.coldstart --runs 5
+#   python -m bench.coldstart --cmd "gunicorn -c gunicorn.conf.py app.main:app" --port 8000
+import argparse
+import json
+import os
+import shlex
+import statistics
+import subprocess
+import sys
+import time
+import urllib.request
+
+def import_seconds() -> float:
+    code = "import time; t = time.perf_counter(); import app.main; print(time.perf_counter() - t)"
+    return float(subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True).stdout)
+
+def ready_seconds(cmd: list[str], port: int, timeout: float) -> float:
+    t0 = time.perf_counter()
+    proc = subprocess.Popen(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+                            env={**os.environ, "API_PORT": str(port)})
+    try:
+        while time.perf_counter() - t0 < timeout:
+            if proc.poll() is not None:
+                raise SystemExit(f"server exited with {proc.returncode}: {shlex.join(cmd)}")
+            try:
+                with urllib.request.urlopen(f"http://127.0.0.1:{port}/readyz", timeout=1) as r:
+                    if r.status == 200:
+                        return time.perf_counter() - t0
+            except OSError:
+                pass
+            time.sleep(0.02)
+        raise SystemExit(f"not ready after {timeout}s")
+    finally:
+        proc.terminate()
+        proc.wait()
+
+def summary(samples: list[float]) -> dict:
+    ms = [s * 1000 for s in samples]
+    return {"runs": len(ms), "p50_ms": round(statistics.median(ms), 1), "min_ms": round(min(ms), 1),
+            "max_ms": round(max(ms), 1)}
+
+def main():
+    p = argparse.ArgumentParser(description="Measure API import and time-to-ready")
+    p.add_argument("--runs", type=int, default=5)
+    p.add_argument("--port", type=int, default=8765)
+    p.add_argument("--cmd", help="server command; default a single uvicorn process on --port")
+    p.add_argument("--timeout", type=float, default=60)
+    a = p.parse_args()
+    cmd = shlex.split(a.cmd) if a.cmd else [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(a.port)]
+    out = {"cmd": shlex.join(cmd),
+           "import": summary([import_seconds() for _ in range(a.runs)]),
+           "ready": summary([ready_seconds(cmd, a.port, a.timeout) for _ in range(a.runs)])}
+    print(json.dumps(out, indent=2))
+
+if __name__ == "__main__":
+    main()
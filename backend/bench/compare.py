@@ -0,0 +1,32 @@
+# Compares two bench.load result files, e.g. the last release against a candidate:
+#   python -m bench.compare baseline.json candidate.json
+import argparse
+import json
+
+METRICS = ("rps", "p50_ms", "p95_ms", "p99_ms")
+
+def change(old, new) -> str:
+    if old in (None, 0) or new is None:
+        return "n/a"
+    return f"{(new - old) / old * 100:+.1f}%"
+
+def main():
+    p = argparse.ArgumentParser(description="Compare two benchmark results")
+    p.add_argument("baseline")
+    p.add_argument("candidate")
+    a = p.parse_args()
+    with open(a.baseline) as f:
+        base = json.load(f)
+    with open(a.candidate) as f:
+        cand = json.load(f)
+    rows = {**{k: (base["endpoints"].get(k), v) for k, v in cand["endpoints"].items()},
+            "TOTAL": (base["total"], cand["total"])}
+    if base.get("run_nightly") and cand.get("run_nightly"):
+        rows["run_nightly"] = (base["run_nightly"], cand["run_nightly"])
+    print(f"{'endpoint':38s} " + " ".join(f"{m:>18s}" for m in METRICS))
+    for name, (old, new) in rows.items():
+        cells = [f"{new.get(m) or 0:>9} {change(old.get(m) if old else None, new.get(m)):>8s}" for m in METRICS]
+        print(f"{name:38s} " + " ".join(cells))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,165 @@
+# Drives the API with concurrent clients for a fixed duration and reports
+# throughput and p50/p95/p99 latency per endpoint, then times run_nightly.
+# Without --url the app is served in-process over ASGI (no uvicorn); with --url
+# it targets a running server. Seed first with bench.seed, then from backend/:
+#   python -m bench.load --concurrency 20 --duration 30 --out results.json
+import argparse
+import asyncio
+import json
+import platform
+import random
+import subprocess
+import time
+from collections import defaultdict
+from datetime import datetime, timezone
+import httpx
+from sqlalchemy import text
+
+from app.db import engine
+from bench.seed import BENCH_USER
+
+# (name, weight, request builder). Builders get the per-client Random and the id pools.
+SCENARIOS = [
+    ("GET /vehicles", 10, lambda r, ids: ("GET", "/vehicles", {"limit": 100})),
+    ("GET /vehicles?status", 5, lambda r, ids: ("GET", "/vehicles", {"status": "in_service", "limit": 50})),
+    ("GET /vehicles/{id}", 15, lambda r, ids: ("GET", f"/vehicles/{r.choice(ids['vehicles'])}", None)),
+    ("GET /vehicles/{id}/meters", 8, lambda r, ids: ("GET", f"/vehicles/{r.choice(ids['vehicles'])}/meters", {"limit": 100})),
+    ("GET /vehicles/{id}/timeline", 6, lambda r, ids: ("GET", f"/vehicles/{r.choice(ids['vehicles'])}/timeline", {"limit": 50})),
+    ("GET /drivers", 5, lambda r, ids: ("GET", "/drivers", {"limit": 100})),
+    ("GET /work-orders?status=open", 10, lambda r, ids: ("GET", "/work-orders", {"status": "open", "limit": 100})),
+    ("GET /work-orders?vehicle_id", 8, lambda r, ids: ("GET", "/work-orders", {"vehicle_id": r.choice(ids['vehicles'])})),
+    ("GET /alerts?status=open", 6, lambda r, ids: ("GET", "/alerts", {"status": "open", "limit": 100})),
+    ("GET /dashboard/summary", 10, lambda r, ids: ("GET", "/dashboard/summary", None)),
+    ("GET /vehicles/{id}/fuel/analytics", 4, lambda r, ids: ("GET", f"/vehicles/{r.choice(ids['vehicles'])}/fuel/analytics", None)),
+    ("POST /vehicles/{id}/meters", 6, lambda r, ids: ("POST", f"/vehicles/{r.choice(ids['vehicles'])}/meters",
+                                                      {"type": "odometer", "reading": r.randint(1, 10_000_000)})),
+]
+
+def percentile(sorted_ms: list[float], q: float) -> float | None:
+    if not sorted_ms:
+        return None
+    return round(sorted_ms[min(len(sorted_ms) - 1, int(q * len(sorted_ms)))], 2)
+
+def summarize(samples: list[float], errors: int, seconds: float) -> dict:
+    s = sorted(samples)
+    return {"requests": len(s), "errors": errors, "rps": round(len(s) / seconds, 1) if seconds else None,
+            "p50_ms": percentile(s, .5), "p95_ms": percentile(s, .95), "p99_ms": percentile(s, .99),
+            "mean_ms": round(sum(s) / len(s), 2) if s else None, "max_ms": round(s[-1], 2) if s else None}
+
+async def make_client(url: str | None) -> httpx.AsyncClient:
+    if url:
+        client = httpx.AsyncClient(base_url=url, timeout=60)
+    else:
+        from app.main import app
+        client = httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench", timeout=60)
+    r = await client.post("/auth/login", json={"email": BENCH_USER[0], "password": BENCH_USER[1]})
+    r.raise_for_status()
+    client.headers["Authorization"] = f"Bearer {r.json()['access_token']}"
+    return client
+
+async def id_pools(client: httpx.AsyncClient) -> dict:
+    vehicles = (await client.get("/vehicles", params={"limit": 500, "fields": "id"})).json()
+    if not vehicles:
+        raise SystemExit("No vehicles; run python -m bench.seed first")
+    return {"vehicles": [v["id"] for v in vehicles]}
+
+async def run_load(client, ids, concurrency: int, duration: float, warmup: float, seed: int) -> dict:
+    names = [s[0] for s in SCENARIOS]
+    weights = [s[1] for s in SCENARIOS]
+    builders = {s[0]: s[2] for s in SCENARIOS}
+    samples: dict[str, list[float]] = defaultdict(list)
+    errors: dict[str, int] = defaultdict(int)
+    t_start = time.perf_counter()
+    measure_from, deadline = t_start + warmup, t_start + warmup + duration
+
+    async def worker(n: int):
+        r = random.Random(seed * 1000 + n)
+        while (now := time.perf_counter()) < deadline:
+            name = r.choices(names, weights)[0]
+            method, path, payload = builders[name](r, ids)
+            kw = {"params": payload} if method == "GET" else {"json": payload}
+            t0 = time.perf_counter()
+            try:
+                ok = (await client.request(method, path, **kw)).status_code < 400
+            except httpx.HTTPError:
+                ok = False
+            if t0 >= measure_from:
+                if ok:
+                    samples[name].append((time.perf_counter() - t0) * 1000)
+                else:
+                    errors[name] += 1
+
+    await asyncio.gather(*(worker(n) for n in range(concurrency)))
+    endpoints = {name: summarize(samples[name], errors[name], duration) for name in names}
+    total = summarize([ms for s in samples.values() for ms in s], sum(errors.values()), duration)
+    return {"endpoints": endpoints, "total": total}
+
+async def run_nightly(client, runs: int) -> dict:
+    # Inline mode so the measurement is the job itself rather than Celery queueing.
+    samples, last = [], None
+    for _ in range(runs):
+        t0 = time.perf_counter()
+        r = await client.post("/internal/run-nightly", params={"inline": "true"}, timeout=600)
+        r.raise_for_status()
+        samples.append((time.perf_counter() - t0) * 1000)
+        last = r.json()
+    out = summarize(samples, 0, sum(samples) / 1000)
+    out["last_job"] = {k: last.get(k) for k in ("status", "total_chunks", "stats")} if last else None
+    return out
+
+async def dataset_scale() -> dict:
+    async with engine.connect() as conn:
+        counts = {t: (await conn.execute(text(f"SELECT count(*) FROM {t}"))).scalar()
+                  for t in ("vehicles", "drivers", "meter_readings", "fuel_logs", "work_orders", "inspections")}
+        counts["postgres"] = (await conn.execute(text("SHOW server_version"))).scalar()
+    return counts
+
+def git_revision() -> str | None:
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+async def main_async(a) -> dict:
+    started_at = datetime.now(timezone.utc).isoformat()
+    client = await make_client(a.url)
+    try:
+        ids = await id_pools(client)
+        load = await run_load(client, ids, a.concurrency, a.duration, a.warmup, a.seed)
+        nightly = await run_nightly(client, a.nightly_runs) if a.nightly_runs else None
+    finally:
+        await client.aclose()
+    return {
+        "meta": {"started_at": started_at, "git": git_revision(),
+                 "target": a.url or "in-process ASGI", "python": platform.python_version(),
+                 "concurrency": a.concurrency, "duration_s": a.duration, "warmup_s": a.warmup, "seed": a.seed,
+                 "dataset": await dataset_scale()},
+        **load,
+        "run_nightly": nightly,
+    }
+
+def main():
+    p = argparse.ArgumentParser(description="Load-test the fleet API")
+    p.add_argument("--url", help="base URL of a running API; default serves the app in-process")
+    p.add_argument("--concurrency", type=int, default=20)
+    p.add_argument("--duration", type=float, default=30, help="measured seconds")
+    p.add_argument("--warmup", type=float, default=5, help="unmeasured seconds before the run")
+    p.add_argument("--nightly-runs", type=int, default=3)
+    p.add_argument("--seed", type=int, default=1)
+    p.add_argument("--out", help="write results JSON here (default: stdout only)")
+    a = p.parse_args()
+    result = asyncio.run(main_async(a))
+    for name, r in {**result["endpoints"], "TOTAL": result["total"]}.items():
+        print(f"{name:38s} {r['requests']:>7d} req {r['rps'] or 0:>8.1f}/s  "
+              f"p50 {r['p50_ms'] or 0:>8.1f}  p95 {r['p95_ms'] or 0:>8.1f}  p99 {r['p99_ms'] or 0:>8.1f} ms  err {r['errors']}")
+    if result["run_nightly"]:
+        n = result["run_nightly"]
+        print(f"{'run_nightly':38s} {n['requests']:>7d} runs  p50 {n['p50_ms']:.0f} ms  max {n['max_ms']:.0f} ms")
+    if a.out:
+        with open(a.out, "w") as f:
+            json.dump(result, f, indent=2)
+    else:
+        print(json.dumps(result))
+
+if __name__ == "__main__":
+    main()
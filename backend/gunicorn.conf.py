@@ -0,0 +1,34 @@
+# Production serving: gunicorn supervises uvicorn workers (uvloop + httptools via
+# uvicorn[standard]). From backend/: gunicorn -c gunicorn.conf.py app.main:app
+# The app is imported once in the master and forked, so workers start without
+# re-importing it. Each worker has its own DB pool (DB_POOL_SIZE + DB_MAX_OVERFLOW).
+import multiprocessing
+import os
+import shutil
+
+bind = f"0.0.0.0:{os.environ.get('API_PORT', '8000')}"
+workers = int(os.environ.get("WEB_CONCURRENCY", multiprocessing.cpu_count() * 2))
+worker_class = "uvicorn_worker.UvicornWorker"
+# Invalidations only reach the process that made the write, so other workers would serve stale rows for CACHE_TTL_S.
+if workers > 1 and os.environ.get("CACHE_BACKEND", "memory") == "memory":
+    raise SystemExit("CACHE_BACKEND=memory is per process; use redis (or none) with more than one worker")
+preload_app = True
+timeout = 60
+graceful_timeout = 30
+keepalive = 5
+# Recycle workers now and then so slow leaks cannot accumulate; jitter keeps them from restarting together.
+max_requests = 20000
+max_requests_jitter = 2000
+accesslog = None
+errorlog = "-"
+
+# Prometheus multiprocess mode: samples of workers from a previous run are stale.
+multiproc_dir = os.environ.get("PROMETHEUS_MULTIPROC_DIR")
+if multiproc_dir:
+    shutil.rmtree(multiproc_dir, ignore_errors=True)
+    os.makedirs(multiproc_dir)
+
+def child_exit(server, worker):
+    if multiproc_dir:
+        from prometheus_client import multiprocess
+        multiprocess.mark_process_dead(worker.pid)
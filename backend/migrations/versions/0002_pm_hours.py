@@ -0,0 +1,21 @@
+from alembic import op
+import sqlalchemy as sa
+
+revision = '0002_pm_hours'
+down_revision = '0001_init_full'
+branch_labels = None
+depends_on = None
+
+def upgrade() -> None:
+    op.add_column('vehicles', sa.Column('current_hours', sa.Numeric(12,1)))
+    op.execute("""
+        UPDATE vehicles v SET current_hours = m.reading
+        FROM (SELECT vehicle_id, max(reading) AS reading FROM meter_readings
+              WHERE type = 'hours' GROUP BY vehicle_id) m
+        WHERE m.vehicle_id = v.id
+    """)
+    op.create_index('ix_maintenance_schedules_vehicle_id', 'maintenance_schedules', ['vehicle_id'])
+
+def downgrade() -> None:
+    op.drop_index('ix_maintenance_schedules_vehicle_id', table_name='maintenance_schedules')
+    op.drop_column('vehicles', 'current_hours')
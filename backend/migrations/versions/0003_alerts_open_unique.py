@@ -0,0 +1,22 @@
+from alembic import op
+import sqlalchemy as sa
+
+revision = '0003_alerts_open_unique'
+down_revision = '0002_pm_hours'
+branch_labels = None
+depends_on = None
+
+def upgrade() -> None:
+    # Collapse duplicate open alerts onto the earliest one before enforcing uniqueness.
+    op.execute("""
+        UPDATE alerts a SET status = 'resolved', resolved_at = now()
+        FROM (SELECT id, row_number() OVER (PARTITION BY key, entity_type, entity_id
+                                            ORDER BY triggered_at, id) AS rn
+              FROM alerts WHERE status = 'open') d
+        WHERE d.id = a.id AND d.rn > 1
+    """)
+    op.create_index('ux_alerts_open', 'alerts', ['key', 'entity_type', 'entity_id'], unique=True,
+                    postgresql_where=sa.text("status = 'open'"))
+
+def downgrade() -> None:
+    op.drop_index('ux_alerts_open', table_name='alerts')
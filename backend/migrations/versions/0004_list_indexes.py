@@ -0,0 +1,29 @@
+from alembic import op
+
+revision = '0004_list_indexes'
+down_revision = '0003_alerts_open_unique'
+branch_labels = None
+depends_on = None
+
+# Composite indexes backing the keyset-paginated list endpoints: each one leads
+# with the equality filter (if any) and ends with the (sort key, id) cursor.
+INDEXES = [
+    ('ix_vehicles_status_unit_no', 'vehicles', ['status', 'unit_no']),
+    ('ix_drivers_full_name_id', 'drivers', ['full_name', 'id']),
+    ('ix_meter_readings_vehicle_recorded', 'meter_readings', ['vehicle_id', 'recorded_at', 'id']),
+    ('ix_work_orders_opened_at_id', 'work_orders', ['opened_at', 'id']),
+    ('ix_work_orders_status_opened_at', 'work_orders', ['status', 'opened_at', 'id']),
+    ('ix_work_orders_priority_opened_at', 'work_orders', ['priority', 'opened_at', 'id']),
+    ('ix_work_orders_vehicle_opened_at', 'work_orders', ['vehicle_id', 'opened_at', 'id']),
+    ('ix_alerts_triggered_at_id', 'alerts', ['triggered_at', 'id']),
+    ('ix_alerts_status_triggered_at', 'alerts', ['status', 'triggered_at', 'id']),
+    ('ix_alerts_entity_triggered_at', 'alerts', ['entity_id', 'triggered_at']),
+]
+
+def upgrade() -> None:
+    for name, table, cols in INDEXES:
+        op.create_index(name, table, cols)
+
+def downgrade() -> None:
+    for name, table, _ in reversed(INDEXES):
+        op.drop_index(name, table_name=table)
@@ -0,0 +1,36 @@
+from alembic import op
+import sqlalchemy as sa
+
+revision = '0005_stat_counters'
+down_revision = '0004_list_indexes'
+branch_labels = None
+depends_on = None
+
+def upgrade() -> None:
+    op.create_table('stat_counters',
+        sa.Column('name', sa.String(length=48), primary_key=True),
+        sa.Column('bucket', sa.String(length=64), primary_key=True),
+        sa.Column('value', sa.BigInteger(), nullable=False, server_default='0'),
+        sa.Column('updated_at', sa.DateTime(timezone=True), server_default=sa.text('now()'))
+    )
+    op.execute("""
+        INSERT INTO stat_counters (name, bucket, value)
+        SELECT 'vehicles_by_status', coalesce(status, 'none'), count(*) FROM vehicles GROUP BY status
+        UNION ALL
+        SELECT 'open_wos_by_priority', coalesce(priority, 'none'), count(*) FROM work_orders
+        WHERE status NOT IN ('closed', 'canceled') GROUP BY priority
+        UNION ALL
+        SELECT 'overdue_wos_by_priority', coalesce(priority, 'none'), count(*) FROM work_orders
+        WHERE status NOT IN ('closed', 'canceled') AND due_at < now() GROUP BY priority
+        UNION ALL
+        -- Cutoff of the overdue counts above (app.counters.OVERDUE_AS_OF), in epoch microseconds.
+        SELECT 'overdue_wos_as_of', 'epoch', floor(extract(epoch FROM now()) * 1e6)::bigint
+        UNION ALL
+        SELECT 'open_alerts_by_key', key, count(*) FROM alerts WHERE status = 'open' GROUP BY key
+        UNION ALL
+        SELECT 'open_defects_by_severity', coalesce(severity, 'none'), count(*) FROM defects
+        WHERE status IN ('open', 'in_wo') GROUP BY severity
+    """)
+
+def downgrade() -> None:
+    op.drop_table('stat_counters')
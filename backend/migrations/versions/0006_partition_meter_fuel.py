@@ -0,0 +1,92 @@
+from datetime import date, datetime, timezone
+from alembic import op
+import sqlalchemy as sa
+
+revision = '0006_partition_meter_fuel'
+down_revision = '0005_stat_counters'
+branch_labels = None
+depends_on = None
+
+MONTHS_AHEAD = 3
+
+# (table, partition column, column DDL, index name)
+TABLES = [
+    ('meter_readings', 'recorded_at', """
+        id uuid NOT NULL,
+        vehicle_id uuid REFERENCES vehicles(id) ON DELETE CASCADE,
+        type varchar(16) NOT NULL,
+        reading numeric(12,1) NOT NULL,
+        recorded_at timestamptz NOT NULL DEFAULT now(),
+        source varchar(32) DEFAULT 'manual'
+    """, 'ix_meter_readings_vehicle_recorded'),
+    ('fuel_logs', 'transacted_at', """
+        id uuid NOT NULL,
+        vehicle_id uuid REFERENCES vehicles(id) ON DELETE CASCADE,
+        driver_id uuid REFERENCES drivers(id) ON DELETE SET NULL,
+        qty_gal numeric(8,3) NOT NULL,
+        price_per_gal numeric(8,3),
+        total_cost numeric(12,2),
+        odometer numeric(12,1),
+        vendor varchar(64),
+        transacted_at timestamptz NOT NULL DEFAULT now()
+    """, 'ix_fuel_logs_vehicle_transacted'),
+]
+
+def _next(d: date) -> date:
+    return date(d.year + d.month // 12, d.month % 12 + 1, 1)
+
+def _months(first: date, last: date):
+    while first <= last:
+        yield first
+        first = _next(first)
+
+def upgrade() -> None:
+    conn = op.get_bind()
+    today = datetime.now(timezone.utc).date()
+    horizon = date(today.year, today.month, 1)
+    for _ in range(MONTHS_AHEAD):
+        horizon = _next(horizon)
+    for table, col, ddl, index in TABLES:
+        op.execute(f"ALTER TABLE {table} RENAME TO {table}_old")
+        op.execute(f"ALTER TABLE {table}_old RENAME CONSTRAINT {table}_pkey TO {table}_old_pkey")
+        op.execute(f"DROP INDEX IF EXISTS {index}")
+        op.execute(f"CREATE TABLE {table} ({ddl}, PRIMARY KEY (id, {col})) PARTITION BY RANGE ({col})")
+        op.execute(f"CREATE TABLE {table}_default PARTITION OF {table} DEFAULT")
+        oldest = conn.execute(sa.text(f"SELECT min({col}) FROM {table}_old")).scalar()
+        first = date(oldest.year, oldest.month, 1) if oldest else date(today.year, today.month, 1)
+        for m in _months(first, horizon):
+            op.execute(f"CREATE TABLE {table}_y{m.year}m{m.month:02d} PARTITION OF {table} "
+                       f"FOR VALUES FROM ('{m.isoformat()}') TO ('{_next(m).isoformat()}')")
+        cols = [c.strip().split()[0] for c in ddl.strip().split(',\n')]
+        select = ', '.join(f"coalesce({c}, now())" if c == col else c for c in cols)
+        op.execute(f"INSERT INTO {table} ({', '.join(cols)}) SELECT {select} FROM {table}_old")
+        op.execute(f"DROP TABLE {table}_old")
+        # The new FKs were created while the old ones still held the default names.
+        for (name,) in conn.execute(sa.text("SELECT conname FROM pg_constraint WHERE conrelid = CAST(:t AS regclass) "
+                                            "AND conname LIKE '%_fkey1'"), {"t": table}):
+            op.execute(f"ALTER TABLE {table} RENAME CONSTRAINT {name} TO {name[:-1]}")
+        op.create_index(index, table, ['vehicle_id', col, 'id'])
+
+    op.create_table('meter_daily',
+        sa.Column('vehicle_id', sa.dialects.postgresql.UUID(as_uuid=True), sa.ForeignKey('vehicles.id', ondelete='CASCADE'), primary_key=True),
+        sa.Column('type', sa.String(length=16), primary_key=True),
+        sa.Column('day', sa.Date(), primary_key=True),
+        sa.Column('min_reading', sa.Numeric(12,1), nullable=False),
+        sa.Column('max_reading', sa.Numeric(12,1), nullable=False),
+        sa.Column('readings', sa.Integer(), nullable=False)
+    )
+
+def downgrade() -> None:
+    conn = op.get_bind()
+    op.drop_table('meter_daily')
+    for table, col, ddl, index in TABLES:
+        plain = ddl.replace(f"{col} timestamptz NOT NULL", f"{col} timestamptz")
+        op.execute(f"CREATE TABLE {table}_flat ({plain}, PRIMARY KEY (id))")
+        op.execute(f"INSERT INTO {table}_flat SELECT * FROM {table}")
+        op.execute(f"DROP TABLE {table} CASCADE")
+        op.execute(f"ALTER TABLE {table}_flat RENAME TO {table}")
+        for (name,) in conn.execute(sa.text("SELECT conname FROM pg_constraint WHERE conrelid = CAST(:t AS regclass)"),
+                                    {"t": table}):
+            op.execute(f"ALTER TABLE {table} RENAME CONSTRAINT {name} TO {name.replace('_flat', '', 1)}")
+        if table == 'meter_readings':
+            op.create_index(index, table, ['vehicle_id', col, 'id'])
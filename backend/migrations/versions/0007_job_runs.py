@@ -0,0 +1,38 @@
+from alembic import op
+import sqlalchemy as sa
+import sqlalchemy.dialects.postgresql as psql
+
+revision = '0007_job_runs'
+down_revision = '0006_partition_meter_fuel'
+branch_labels = None
+depends_on = None
+
+def upgrade() -> None:
+    op.create_table('job_runs',
+        sa.Column('id', psql.UUID(as_uuid=True), primary_key=True),
+        sa.Column('kind', sa.String(length=32), nullable=False),
+        sa.Column('status', sa.String(length=16), server_default='queued'),
+        sa.Column('total_chunks', sa.Integer(), server_default='0'),
+        sa.Column('done_chunks', sa.Integer(), server_default='0'),
+        sa.Column('failed_chunks', sa.Integer(), server_default='0'),
+        sa.Column('stats', psql.JSONB()),
+        sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('now()')),
+        sa.Column('started_at', sa.DateTime(timezone=True)),
+        sa.Column('finished_at', sa.DateTime(timezone=True))
+    )
+    op.create_table('job_chunks',
+        sa.Column('job_id', psql.UUID(as_uuid=True), sa.ForeignKey('job_runs.id', ondelete='CASCADE'), primary_key=True),
+        sa.Column('chunk_no', sa.Integer(), primary_key=True),
+        sa.Column('kind', sa.String(length=32), nullable=False),
+        sa.Column('lo_id', psql.UUID(as_uuid=True)),
+        sa.Column('hi_id', psql.UUID(as_uuid=True)),
+        sa.Column('status', sa.String(length=16), server_default='pending'),
+        sa.Column('attempts', sa.Integer(), server_default='0'),
+        sa.Column('stats', psql.JSONB()),
+        sa.Column('error', sa.Text()),
+        sa.Column('updated_at', sa.DateTime(timezone=True), server_default=sa.text('now()'))
+    )
+
+def downgrade() -> None:
+    op.drop_table('job_chunks')
+    op.drop_table('job_runs')
@@ -0,0 +1,13 @@
+from alembic import op
+import sqlalchemy as sa
+
+revision = '0008_tank_capacity'
+down_revision = '0007_job_runs'
+branch_labels = None
+depends_on = None
+
+def upgrade() -> None:
+    op.add_column('vehicles', sa.Column('tank_capacity_gal', sa.Numeric(8,3)))
+
+def downgrade() -> None:
+    op.drop_column('vehicles', 'tank_capacity_gal')
@@ -0,0 +1,21 @@
+from alembic import op
+
+revision = '0009_timeline_indexes'
+down_revision = '0008_tank_capacity'
+branch_labels = None
+depends_on = None
+
+# (vehicle_id, timestamp, id) indexes for the timeline branches that had none;
+# meter_readings, fuel_logs and work_orders are already covered.
+INDEXES = [
+    ('ix_inspections_vehicle_submitted_at', 'inspections', ['vehicle_id', 'submitted_at', 'id']),
+    ('ix_vehicle_assignments_vehicle_start_at', 'vehicle_assignments', ['vehicle_id', 'start_at', 'id']),
+]
+
+def upgrade() -> None:
+    for name, table, cols in INDEXES:
+        op.create_index(name, table, cols)
+
+def downgrade() -> None:
+    for name, table, _ in reversed(INDEXES):
+        op.drop_index(name, table_name=table)
@@ -0,0 +1,25 @@
+from alembic import op
+import sqlalchemy as sa
+import sqlalchemy.dialects.postgresql as psql
+
+revision = '0010_meter_rate_state'
+down_revision = '0009_timeline_indexes'
+branch_labels = None
+depends_on = None
+
+def upgrade() -> None:
+    op.create_table('meter_rate_state',
+        sa.Column('vehicle_id', psql.UUID(as_uuid=True), sa.ForeignKey('vehicles.id', ondelete='CASCADE'), primary_key=True),
+        sa.Column('type', sa.String(length=16), primary_key=True),
+        sa.Column('w', sa.Float(), nullable=False),
+        sa.Column('wx', sa.Float(), nullable=False),
+        sa.Column('wy', sa.Float(), nullable=False),
+        sa.Column('wxx', sa.Float(), nullable=False),
+        sa.Column('wxy', sa.Float(), nullable=False),
+        sa.Column('readings', sa.Integer(), nullable=False),
+        sa.Column('last_recorded_at', sa.DateTime(timezone=True), nullable=False),
+        sa.Column('refreshed_at', sa.DateTime(timezone=True), nullable=False)
+    )
+
+def downgrade() -> None:
+    op.drop_table('meter_rate_state')
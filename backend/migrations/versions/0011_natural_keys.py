@@ -0,0 +1,38 @@
+from alembic import op
+import sqlalchemy as sa
+
+revision = '0011_natural_keys'
+down_revision = '0010_meter_rate_state'
+branch_labels = None
+depends_on = None
+
+# Natural keys the bulk importer upserts on. Duplicate assignments are exact
+# repeats and are dropped; duplicate VINs or license numbers belong to distinct
+# rows, so they must be fixed by hand before this migration can run.
+
+def _refuse_duplicates(table: str, column: str) -> None:
+    dupes = op.get_bind().execute(sa.text(
+        f"SELECT {column} FROM {table} WHERE {column} IS NOT NULL GROUP BY {column} HAVING count(*) > 1 LIMIT 10"
+    )).scalars().all()
+    if dupes:
+        raise RuntimeError(f"duplicate {table}.{column} values must be resolved first: {', '.join(dupes)}")
+
+def upgrade() -> None:
+    _refuse_duplicates('vehicles', 'vin')
+    _refuse_duplicates('drivers', 'license_no')
+    op.execute("""
+        DELETE FROM vehicle_assignments a
+        USING (SELECT id, row_number() OVER (PARTITION BY vehicle_id, driver_id, start_at ORDER BY id) AS rn
+               FROM vehicle_assignments) d
+        WHERE d.id = a.id AND d.rn > 1
+    """)
+    op.create_index('ux_vehicles_vin', 'vehicles', ['vin'], unique=True, postgresql_where=sa.text('vin IS NOT NULL'))
+    op.create_index('ux_drivers_license_no', 'drivers', ['license_no'], unique=True,
+                    postgresql_where=sa.text('license_no IS NOT NULL'))
+    op.create_index('ux_vehicle_assignments_vehicle_driver_start', 'vehicle_assignments',
+                    ['vehicle_id', 'driver_id', 'start_at'], unique=True)
+
+def downgrade() -> None:
+    op.drop_index('ux_vehicle_assignments_vehicle_driver_start', table_name='vehicle_assignments')
+    op.drop_index('ux_drivers_license_no', table_name='drivers')
+    op.drop_index('ux_vehicles_vin', table_name='vehicles')
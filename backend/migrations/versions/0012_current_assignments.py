@@ -0,0 +1,62 @@
+from alembic import op
+import sqlalchemy as sa
+import sqlalchemy.dialects.postgresql as psql
+
+revision = '0012_current_assignments'
+down_revision = '0011_natural_keys'
+branch_labels = None
+depends_on = None
+
+def upgrade() -> None:
+    # Assignments were only ever appended: end each one where the next one for the
+    # same vehicle or driver starts, so at most one per vehicle and driver is open.
+    op.execute("""
+        UPDATE vehicle_assignments a SET end_at = n.next_start
+        FROM (SELECT id, least(lead(start_at) OVER (PARTITION BY vehicle_id ORDER BY start_at, id),
+                               CASE WHEN driver_id IS NOT NULL
+                                    THEN lead(start_at) OVER (PARTITION BY driver_id ORDER BY start_at, id) END
+                              ) AS next_start
+              FROM vehicle_assignments) n
+        WHERE n.id = a.id AND a.end_at IS NULL AND n.next_start IS NOT NULL
+    """)
+    op.execute("CREATE EXTENSION IF NOT EXISTS btree_gist")
+    op.create_exclude_constraint('ex_vehicle_assignments_vehicle_overlap', 'vehicle_assignments',
+                                 ('vehicle_id', '='), (sa.text('tstzrange(start_at, end_at)'), '&&'), using='gist')
+    op.create_exclude_constraint('ex_vehicle_assignments_driver_overlap', 'vehicle_assignments',
+                                 ('driver_id', '='), (sa.text('tstzrange(start_at, end_at)'), '&&'), using='gist')
+    op.create_index('ix_vehicle_assignments_driver_start_at', 'vehicle_assignments', ['driver_id', 'start_at'])
+    op.create_index('ux_vehicle_assignments_open_vehicle', 'vehicle_assignments', ['vehicle_id'], unique=True,
+                    postgresql_where=sa.text('end_at IS NULL'))
+    op.create_index('ux_vehicle_assignments_open_driver', 'vehicle_assignments', ['driver_id'], unique=True,
+                    postgresql_where=sa.text('end_at IS NULL'))
+
+    op.add_column('vehicles', sa.Column('current_driver_id', psql.UUID(as_uuid=True),
+                                        sa.ForeignKey('drivers.id', ondelete='SET NULL')))
+    op.add_column('drivers', sa.Column('current_vehicle_id', psql.UUID(as_uuid=True),
+                                       sa.ForeignKey('vehicles.id', ondelete='SET NULL',
+                                                     name='drivers_current_vehicle_id_fkey')))
+    op.execute("""
+        UPDATE vehicles v SET current_driver_id = a.driver_id
+        FROM vehicle_assignments a WHERE a.vehicle_id = v.id AND a.end_at IS NULL
+    """)
+    op.execute("""
+        UPDATE drivers d SET current_vehicle_id = a.vehicle_id
+        FROM vehicle_assignments a WHERE a.driver_id = d.id AND a.end_at IS NULL
+    """)
+    op.create_index('ix_vehicles_current_driver_id', 'vehicles', ['current_driver_id'])
+    op.create_index('ix_vehicles_available', 'vehicles', ['unit_no'],
+                    postgresql_where=sa.text("current_driver_id IS NULL AND status = 'in_service'"))
+    op.create_index('ix_drivers_available', 'drivers', ['full_name', 'id'],
+                    postgresql_where=sa.text('current_vehicle_id IS NULL'))
+
+def downgrade() -> None:
+    op.drop_index('ix_drivers_available', table_name='drivers')
+    op.drop_index('ix_vehicles_available', table_name='vehicles')
+    op.drop_index('ix_vehicles_current_driver_id', table_name='vehicles')
+    op.drop_column('drivers', 'current_vehicle_id')
+    op.drop_column('vehicles', 'current_driver_id')
+    op.drop_index('ux_vehicle_assignments_open_driver', table_name='vehicle_assignments')
+    op.drop_index('ux_vehicle_assignments_open_vehicle', table_name='vehicle_assignments')
+    op.drop_index('ix_vehicle_assignments_driver_start_at', table_name='vehicle_assignments')
+    op.drop_constraint('ex_vehicle_assignments_driver_overlap', 'vehicle_assignments')
+    op.drop_constraint('ex_vehicle_assignments_vehicle_overlap', 'vehicle_assignments')
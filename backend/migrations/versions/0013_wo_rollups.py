@@ -0,0 +1,61 @@
+from alembic import op
+import sqlalchemy as sa
+
+revision = '0013_wo_rollups'
+down_revision = '0012_current_assignments'
+branch_labels = None
+depends_on = None
+
+def upgrade() -> None:
+    op.add_column('work_orders', sa.Column('est_hours', sa.Numeric(8, 2)))
+    op.add_column('work_orders', sa.Column('actual_hours', sa.Numeric(8, 2)))
+    op.create_index('ix_wo_tasks_work_order_id', 'wo_tasks', ['work_order_id'])
+    op.execute("""
+        UPDATE work_orders w SET est_hours = t.est, actual_hours = t.actual
+        FROM (SELECT work_order_id, sum(est_hours) AS est, sum(actual_hours) AS actual
+              FROM wo_tasks GROUP BY work_order_id) t
+        WHERE t.work_order_id = w.id
+    """)
+    op.create_index('ix_work_orders_closed_at', 'work_orders', ['closed_at'])
+    op.create_index('ix_work_orders_backlog', 'work_orders', ['priority', 'opened_at'],
+                    postgresql_where=sa.text("status NOT IN ('closed', 'canceled')"))
+    op.create_table('wo_daily',
+        sa.Column('day', sa.Date(), primary_key=True),
+        sa.Column('priority', sa.String(length=16), primary_key=True),
+        sa.Column('opened', sa.Integer(), nullable=False),
+        sa.Column('closed', sa.Integer(), nullable=False),
+        sa.Column('canceled', sa.Integer(), nullable=False),
+        sa.Column('closed_late', sa.Integer(), nullable=False),
+        sa.Column('repair_hours', sa.Float(), nullable=False),
+        sa.Column('est_hours', sa.Float(), nullable=False),
+        sa.Column('actual_hours', sa.Float(), nullable=False)
+    )
+    # Backfill; app.wo_analytics.rebuild() computes the same thing.
+    op.execute("""
+        INSERT INTO wo_daily (day, priority, opened, closed, canceled, closed_late, repair_hours, est_hours, actual_hours)
+        SELECT day, priority, sum(opened), sum(closed), sum(canceled), sum(closed_late),
+               sum(repair_hours), sum(est_hours), sum(actual_hours)
+        FROM (
+            SELECT CAST(timezone('UTC', opened_at) AS date) AS day, coalesce(priority, 'none') AS priority,
+                   count(*) AS opened, 0 AS closed, 0 AS canceled, 0 AS closed_late,
+                   0 AS repair_hours, 0 AS est_hours, 0 AS actual_hours
+            FROM work_orders GROUP BY 1, 2
+            UNION ALL
+            SELECT CAST(timezone('UTC', coalesce(closed_at, opened_at)) AS date), coalesce(priority, 'none'), 0,
+                   count(*) FILTER (WHERE status = 'closed'), count(*) FILTER (WHERE status <> 'closed'),
+                   count(*) FILTER (WHERE status = 'closed' AND closed_at > due_at),
+                   coalesce(sum(extract(epoch FROM closed_at - opened_at) / 3600) FILTER (WHERE status = 'closed'), 0),
+                   coalesce(sum(est_hours) FILTER (WHERE status = 'closed'), 0),
+                   coalesce(sum(actual_hours) FILTER (WHERE status = 'closed'), 0)
+            FROM work_orders WHERE status IN ('closed', 'canceled') GROUP BY 1, 2
+        ) u
+        GROUP BY day, priority
+    """)
+
+def downgrade() -> None:
+    op.drop_table('wo_daily')
+    op.drop_index('ix_work_orders_backlog', table_name='work_orders')
+    op.drop_index('ix_work_orders_closed_at', table_name='work_orders')
+    op.drop_index('ix_wo_tasks_work_order_id', table_name='wo_tasks')
+    op.drop_column('work_orders', 'actual_hours')
+    op.drop_column('work_orders', 'est_hours')
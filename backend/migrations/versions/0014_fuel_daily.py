@@ -0,0 +1,23 @@
+from alembic import op
+import sqlalchemy as sa
+
+revision = '0014_fuel_daily'
+down_revision = '0013_wo_rollups'
+branch_labels = None
+depends_on = None
+
+def upgrade() -> None:
+    # Left empty: the next nightly run (app.analytics.refresh_daily) fills it from the whole fuel history.
+    op.create_table('fuel_daily',
+        sa.Column('day', sa.Date(), primary_key=True),
+        sa.Column('fills', sa.Integer(), nullable=False),
+        sa.Column('gallons', sa.Float(), nullable=False),
+        sa.Column('cost', sa.Float(), nullable=False),
+        sa.Column('miles', sa.Float(), nullable=False),
+        sa.Column('metered_gallons', sa.Float(), nullable=False),
+        sa.Column('odometer_regressions', sa.Integer(), nullable=False),
+        sa.Column('over_capacity', sa.Integer(), nullable=False)
+    )
+
+def downgrade() -> None:
+    op.drop_table('fuel_daily')
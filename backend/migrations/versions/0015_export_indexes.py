@@ -0,0 +1,47 @@
+from alembic import op
+import sqlalchemy as sa
+
+revision = '0015_export_indexes'
+down_revision = '0014_fuel_daily'
+branch_labels = None
+depends_on = None
+
+# (timestamp, id) indexes so an unfiltered export streams in index order instead
+# of sorting the whole table first. Built CONCURRENTLY so ingest keeps running;
+# a partitioned parent cannot be, so its index is created ON ONLY the parent and
+# each partition's index is built concurrently and attached. Partitions created
+# later (app.partitions) inherit it.
+INDEXES = [
+    ('ix_meter_readings_recorded_id', 'meter_readings', ['recorded_at', 'id']),
+    ('ix_fuel_logs_transacted_id', 'fuel_logs', ['transacted_at', 'id']),
+    ('ix_inspections_submitted_at_id', 'inspections', ['submitted_at', 'id']),
+]
+
+def _partitions(conn, table):
+    # None for a plain table, else the names of its partitions.
+    if conn.execute(sa.text("SELECT relkind FROM pg_class WHERE oid = CAST(:t AS regclass)"), {"t": table}).scalar() != 'p':
+        return None
+    return conn.execute(sa.text(
+        "SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid "
+        "WHERE i.inhparent = CAST(:t AS regclass) ORDER BY c.relname"), {"t": table}).scalars().all()
+
+def upgrade() -> None:
+    conn = op.get_bind()
+    parts = {table: _partitions(conn, table) for _, table, _ in INDEXES}
+    for name, table, cols in INDEXES:
+        if parts[table] is not None:
+            op.execute(f"CREATE INDEX {name} ON ONLY {table} ({', '.join(cols)})")
+    with op.get_context().autocommit_block():
+        for name, table, cols in INDEXES:
+            if parts[table] is None:
+                op.create_index(name, table, cols, postgresql_concurrently=True)
+                continue
+            for part in parts[table]:
+                index = f"{part}_{'_'.join(cols)}_idx"
+                op.create_index(index, part, cols, postgresql_concurrently=True)
+                op.execute(f"ALTER INDEX {name} ATTACH PARTITION {index}")
+
+def downgrade() -> None:
+    # Dropping the parent index drops the attached partition indexes with it.
+    for name, table, _ in reversed(INDEXES):
+        op.drop_index(name, table_name=table)
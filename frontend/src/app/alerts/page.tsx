@@ -6,11 +6,36 @@ export default function Alerts(){
   const token = typeof window !== "undefined" ? localStorage.getItem("token") : null;
   const H = { Authorization: `Bearer ${token}`, "Content-Type":"application/json" } as any;
   const [rows, setRows] = useState<Alert[]>([]);
+  const [cursor, setCursor] = useState<string|null>(null);
   const load = async () => {
     const r = await fetch(`${API}/alerts`, { headers: H });
-    if (r.ok) setRows(await r.json());
+    if (!r.ok) return;
+    setRows(await r.json());
+    setCursor(r.headers.get("X-Next-Cursor"));
   };
-  useEffect(()=>{ if (token) load(); }, [token]);
+  const loadMore = async () => {
+    if (!cursor) return;
+    const r = await fetch(`${API}/alerts?cursor=${encodeURIComponent(cursor)}`, { headers: H });
+    if (!r.ok) return;
+    const more:Alert[] = await r.json();
+    // Rows pushed by the change feed may already be on the page.
+    setRows(xs => [...xs, ...more.filter(m => !xs.some(x=>x.id===m.id))]);
+    setCursor(r.headers.get("X-Next-Cursor"));
+  };
+  useEffect(()=>{
+    if (!token) return;
+    // Live deltas from the API change feed; the browser resumes from the last event id on reconnect.
+    const es = new EventSource(`${API}/events?types=alert&access_token=${encodeURIComponent(token)}`);
+    const apply = (e:MessageEvent) => {
+      const a:Alert = JSON.parse(e.data);
+      setRows(rs => rs.some(x=>x.id===a.id) ? rs.map(x=>x.id===a.id ? {...x, ...a} : x) : [a, ...rs]);
+    };
+    es.addEventListener("alert.created", apply);
+    es.addEventListener("alert.resolved", apply);
+    es.addEventListener("reset", () => load());
+    load();
+    return () => es.close();
+  }, [token]);
   return (
     <main style={{padding:24}}>
       <h1 style={{fontSize:24, fontWeight:'bold'}}>Alerts</h1>
@@ -21,6 +46,7 @@ export default function Alerts(){
           </li>
         ))}
       </ul>
+      {cursor && <button onClick={loadMore} style={{padding:'6px 10px', border:'1px solid #333', marginTop:8}}>Load more</button>}
     </main>
   );
 }
@@ -8,16 +8,14 @@ export default function Page(){
   useEffect(()=>{
     async function load(){
       const headers = { Authorization: `Bearer ${token}` };
-      const [v, w, a] = await Promise.all([
-        fetch(`${API}/vehicles`, {headers}),
-        fetch(`${API}/work-orders`, {headers}),
-        fetch(`${API}/alerts`, {headers})
-      ]);
-      const [vj, wj, aj] = await Promise.all([v.json(), w.json(), a.json()]);
+      const r = await fetch(`${API}/dashboard/summary`, {headers});
+      const s = await r.json();
       setStats({
-        vehicles: vj.length,
-        openWOs: wj.filter((x:any)=>x.status!=="closed").length,
-        alerts: aj.length
+        vehicles: s.vehicles_total,
+        openWOs: s.open_wos_total,
+        overdueWOs: s.overdue_wos_total,
+        alerts: s.open_alerts_total,
+        defects: s.open_defects_total
       });
     }
     if (token) load();
@@ -29,7 +27,9 @@ export default function Page(){
       <div style={{display:'flex', gap:16, marginTop:12}}>
         <Card label="Vehicles" value={stats.vehicles ?? '-'} />
         <Card label="Open WOs" value={stats.openWOs ?? '-'} />
+        <Card label="Overdue WOs" value={stats.overdueWOs ?? '-'} />
         <Card label="Alerts" value={stats.alerts ?? '-'} />
+        <Card label="Open Defects" value={stats.defects ?? '-'} />
       </div>
       <p style={{marginTop:24, color:'#666'}}>Tip: Sign up / login on first run from the Vehicles page.</p>
     </main>
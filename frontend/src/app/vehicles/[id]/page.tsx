@@ -6,7 +6,8 @@ export default function VehicleDetail({ params }: any){
   const token = typeof window !== "undefined" ? localStorage.getItem("token") : null;
   const H = { Authorization: `Bearer ${token}`, "Content-Type":"application/json" } as any;
   const [veh, setVeh] = useState<any>(null);
-  const [meters, setMeters] = useState<any[]>([]);
+  const [history, setHistory] = useState<any[]>([]);
+  const [cursor, setCursor] = useState<string|null>(null);
   const [schedules, setSchedules] = useState<any[]>([]);
   const [wo, setWo] = useState<any[]>([]);
   const [meterType, setMeterType] = useState("odometer");
@@ -15,17 +16,37 @@ export default function VehicleDetail({ params }: any){
   const load = async () => {
     const [a,b,c,d] = await Promise.all([
       fetch(`${API}/vehicles/${id}`, { headers: H }),
-      fetch(`${API}/vehicles/${id}/meters`, { headers: H }),
+      fetch(`${API}/vehicles/${id}/timeline?limit=50`, { headers: H }),
       fetch(`${API}/vehicles/${id}/schedules`, { headers: H }),
-      fetch(`${API}/work-orders`, { headers: H }),
+      fetch(`${API}/work-orders?vehicle_id=${id}`, { headers: H }),
     ]);
     const [aj,bj,cj,dj] = await Promise.all([a.json(), b.json(), c.json(), d.json()]);
     setVeh(aj);
-    setMeters(bj);
+    setHistory(bj);
+    setCursor(b.headers.get("X-Next-Cursor"));
     setSchedules(cj.filter((x:any)=>x.vehicle_id===id));
     setWo(dj.filter((x:any)=>x.vehicle_id===id));
   };
   useEffect(()=>{ if (token) load(); }, [token, id]);
+  const loadMore = async () => {
+    if (!cursor) return;
+    const r = await fetch(`${API}/vehicles/${id}/timeline?limit=50&cursor=${encodeURIComponent(cursor)}`, { headers: H });
+    if (!r.ok) return;
+    const more = await r.json();
+    setHistory(h => [...h, ...more]);
+    setCursor(r.headers.get("X-Next-Cursor"));
+  };
+  const describe = (e:any) => {
+    const d = e.data;
+    switch (e.kind) {
+      case "meter": return `${d.type}: ${d.reading}`;
+      case "fuel": return `Fuel ${d.qty_gal} gal${d.vendor ? ` at ${d.vendor}` : ''}`;
+      case "inspection": return `Inspection ${d.checklist_key}: ${d.result}`;
+      case "work_order": return `Work order: ${d.title} — ${d.status}`;
+      case "assignment": return `Assigned to driver ${d.driver_id}${d.end_at ? ' (ended)' : ''}`;
+      default: return e.kind;
+    }
+  };
   const addMeter = async () => {
     if (!meterVal) return;
     const r = await fetch(`${API}/vehicles/${id}/meters`, { method:"POST", headers: H, body: JSON.stringify({ type: meterType, reading: parseFloat(meterVal) }) });
@@ -58,9 +79,6 @@ export default function VehicleDetail({ params }: any){
           <input placeholder="Reading" value={meterVal} onChange={e=>setMeterVal(e.target.value)} style={{padding:8, border:'1px solid #ccc'}} />
           <button onClick={addMeter} style={{padding:'8px 12px', border:'1px solid #333'}}>Save</button>
         </div>
-        <ul style={{marginTop:8}}>
-          {meters.map(m => <li key={m.id}>{m.type}: {m.reading} at {new Date(m.recorded_at).toLocaleString()}</li>)}
-        </ul>
       </section>
       <section style={{marginTop:16}}>
         <h2 style={{fontWeight:'bold'}}>Maintenance</h2>
@@ -79,6 +97,13 @@ export default function VehicleDetail({ params }: any){
           {wo.map((x:any) => <li key={x.id}>{x.title} — {x.status}</li>)}
         </ul>
       </section>
+      <section style={{marginTop:16}}>
+        <h2 style={{fontWeight:'bold'}}>History</h2>
+        <ul>
+          {history.map(e => <li key={`${e.kind}:${e.id}`}>{new Date(e.at).toLocaleString()} — {describe(e)}</li>)}
+        </ul>
+        {cursor && <button onClick={loadMore} style={{padding:'6px 10px', border:'1px solid #333', marginTop:8}}>Load more</button>}
+      </section>
     </main>
   );
 }
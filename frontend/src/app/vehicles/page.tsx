@@ -8,6 +8,7 @@ export default function Vehicles() {
   const [password, setPassword] = useState("");
   const [unit, setUnit] = useState("");
   const [rows, setRows] = useState<Vehicle[]>([]);
+  const [cursor, setCursor] = useState<string | null>(null);
   useEffect(() => {
     setToken(localStorage.getItem("token"));
   }, []);
@@ -35,11 +36,24 @@ export default function Vehicles() {
     const r = await fetch(`${API}/vehicles`, {
       headers: { Authorization: `Bearer ${token}` },
     });
-    if (r.ok) setRows(await r.json());
+    if (!r.ok) return;
+    setRows(await r.json());
+    setCursor(r.headers.get("X-Next-Cursor"));
   };
   useEffect(() => {
     if (token) load();
   }, [token]);
+  const loadMore = async () => {
+    if (!cursor) return;
+    const r = await fetch(
+      `${API}/vehicles?cursor=${encodeURIComponent(cursor)}`,
+      { headers: { Authorization: `Bearer ${token}` } },
+    );
+    if (!r.ok) return;
+    const more: Vehicle[] = await r.json();
+    setRows((vs) => [...vs, ...more]);
+    setCursor(r.headers.get("X-Next-Cursor"));
+  };
   const createV = async () => {
     const r = await fetch(`${API}/vehicles`, {
       method: "POST",
@@ -117,6 +131,14 @@ export default function Vehicles() {
           </li>
         ))}
       </ul>
+      {cursor && (
+        <button
+          onClick={loadMore}
+          style={{ padding: "6px 10px", border: "1px solid #333", marginTop: 8 }}
+        >
+          Load more
+        </button>
+      )}
     </main>
   );
 }
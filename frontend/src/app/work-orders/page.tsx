@@ -6,14 +6,39 @@ export default function WorkOrders(){
   const token = typeof window !== "undefined" ? localStorage.getItem("token") : null;
   const H = { Authorization: `Bearer ${token}`, "Content-Type":"application/json" } as any;
   const [items, setItems] = useState<WO[]>([]);
+  const [cursor, setCursor] = useState<string|null>(null);
   const load = async () => {
     const r = await fetch(`${API}/work-orders`, { headers: H });
-    if (r.ok) setItems(await r.json());
+    if (!r.ok) return;
+    setItems(await r.json());
+    setCursor(r.headers.get("X-Next-Cursor"));
   };
-  useEffect(()=>{ if (token) load(); }, [token]);
-  const setStatus = async (id:string, status:string) => {
-    await fetch(`${API}/work-orders/${id}`, { method:"PATCH", headers: H, body: JSON.stringify({ status }) });
+  const loadMore = async () => {
+    if (!cursor) return;
+    const r = await fetch(`${API}/work-orders?cursor=${encodeURIComponent(cursor)}`, { headers: H });
+    if (!r.ok) return;
+    const more:WO[] = await r.json();
+    // Rows pushed by the change feed may already be on the page.
+    setItems(xs => [...xs, ...more.filter(m => !xs.some(x=>x.id===m.id))]);
+    setCursor(r.headers.get("X-Next-Cursor"));
+  };
+  useEffect(()=>{
+    if (!token) return;
+    // Live deltas from the API change feed; the browser resumes from the last event id on reconnect.
+    const es = new EventSource(`${API}/events?types=work_order&access_token=${encodeURIComponent(token)}`);
+    const apply = (e:MessageEvent) => {
+      const w:WO = JSON.parse(e.data);
+      setItems(ws => ws.some(x=>x.id===w.id) ? ws.map(x=>x.id===w.id ? {...x, ...w} : x) : [w, ...ws]);
+    };
+    es.addEventListener("work_order.created", apply);
+    es.addEventListener("work_order.updated", apply);
+    es.addEventListener("reset", () => load());
     load();
+    return () => es.close();
+  }, [token]);
+  const setStatus = async (id:string, status:string) => {
+    const r = await fetch(`${API}/work-orders/${id}`, { method:"PATCH", headers: H, body: JSON.stringify({ status }) });
+    if (r.ok) { const w:WO = await r.json(); setItems(ws => ws.map(x=>x.id===w.id ? {...x, ...w} : x)); }
   };
   const col = (s:string) => items.filter(x=>x.status===s);
   const name = (s:string) => s.replace("_"," ");
@@ -40,6 +65,7 @@ export default function WorkOrders(){
           </div>
         ))}
       </div>
+      {cursor && <button onClick={loadMore} style={{padding:'6px 10px', border:'1px solid #333', marginTop:12}}>Load more</button>}
     </main>
   );
 }